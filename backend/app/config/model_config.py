@@ -1,4 +1,6 @@
 """Model configuration and path resolution."""
+import os
+import cv2
 from pathlib import Path
 from fastapi import HTTPException
 import logging
@@ -16,11 +18,55 @@ class ModelConfig:
         'yolo11l': 'yolo11l.pt'
     }
 
+    # Models loaded and warmed when the server starts (comma separated names)
+    PRELOAD_MODELS = [
+        name.strip()
+        for name in os.getenv("VCOUNT_PRELOAD_MODELS", "").split(",")
+        if name.strip()
+    ]
+
+    # Memory budget for loaded weights kept in the model registry
+    CACHE_BUDGET_MB = int(os.getenv("VCOUNT_MODEL_CACHE_MB", "2048"))
+
+    WARMUP_IMGSZ = 640
+
+    # Inference backends: torch runs the .pt weights; the exported ones run
+    # an export of them (CPU only), created on first use and kept next to
+    # them; scripted replays a trajectory script instead of running a model
+    EXPORT_BACKENDS = ('onnx', 'onnx-int8', 'openvino')
+    BACKENDS = ('torch', *EXPORT_BACKENDS, 'scripted')
+
+    # Trajectory scripts of the scripted backend; the model name of a
+    # scripted job is a script's path in here, without .json
+    SCRIPTED_DIR = Path(os.getenv(
+        "VCOUNT_SCRIPTED_DIR", Path(__file__).resolve().parent.parent / "models" / "scripted"
+    ))
+
+    # Input size exports are traced at (their input shapes stay dynamic)
+    EXPORT_IMGSZ = 640
+
     @classmethod
     def get_models_dir(cls) -> Path:
         """Get the base models directory."""
         return Path(__file__).resolve().parent.parent / "models"
 
+    @classmethod
+    def detect_device(cls) -> str:
+        """Return 'cuda' when OpenCV reports a CUDA device, otherwise 'cpu'."""
+        return "cuda" if cv2.cuda.getCudaEnabledDeviceCount() > 0 else "cpu"
+
+    @classmethod
+    def export_path(cls, model_path: str, backend: str) -> Path:
+        """Where the export of a .pt model for a backend is cached."""
+        path = Path(model_path)
+        if backend == 'onnx':
+            return path.with_suffix('.onnx')
+        if backend == 'onnx-int8':
+            return path.with_suffix('.int8.onnx')
+        if backend == 'openvino':
+            return path.with_name(f"{path.stem}_openvino_model")
+        raise ValueError(f"No export for backend: {backend}")
+
     @classmethod
     def resolve_model_path(cls, model_name: str) -> str:
         """
@@ -47,3 +93,25 @@ class ModelConfig:
             
         else:
             raise HTTPException(400, f"Unknown model: {model_name}")
+
+    @classmethod
+    def resolve_script_path(cls, script_name: str) -> str:
+        """
+        Resolve the model name of a scripted job to its trajectory script.
+        
+        Args:
+            script_name: Script path relative to SCRIPTED_DIR, without .json
+            
+        Returns:
+            str: Path to the script
+            
+        Raises:
+            HTTPException: If the script is outside SCRIPTED_DIR or not found
+        """
+        folder = cls.SCRIPTED_DIR.resolve()
+        path = (folder / f"{script_name}.json").resolve()
+        if folder not in path.parents:
+            raise HTTPException(400, f"Unknown trajectory script: {script_name}")
+        if not path.exists():
+            raise HTTPException(404, f"Trajectory script not found: {path}")
+        return str(path)
@@ -0,0 +1,195 @@
+"""Per-job processing options."""
+from dataclasses import asdict, dataclass
+
+from app.config.model_config import ModelConfig
+
+
+@dataclass
+class ProcessingOptions:
+    """Tunable settings for a single vehicle counting job."""
+
+    MAX_BATCH_SIZE = 32
+    MAX_QUEUE_SIZE = 256
+    MAX_STRIDE = 30
+    MAX_SEGMENTS = 16
+    MIN_DECODE_WIDTH = 64
+
+    # full: annotate and encode every frame
+    # counts_only: no annotated video
+    # every_nth: annotate and encode every output_stride-th frame
+    # preview: annotated video downscaled by preview_scale
+    OUTPUT_MODES = ('full', 'counts_only', 'every_nth', 'preview')
+
+    # opencv: cv2.VideoCapture in the worker process
+    # ffmpeg: ffmpeg subprocess scaling (and cropping) frames while decoding
+    DECODERS = ('opencv', 'ffmpeg')
+
+    # Options that only change speed, not counts or output files
+    PERFORMANCE_ONLY = {'batch_size', 'queue_size', 'realtime_pacing', 'use_cache', 'profile'}
+
+    batch_size: int = 1
+    # Frames buffered between pipeline stages
+    queue_size: int = 8
+    # Throttle processing to the source frame rate
+    realtime_pacing: bool = False
+    # Reuse results of an identical earlier job
+    use_cache: bool = True
+    output_mode: str = 'full'
+    output_stride: int = 5
+    preview_scale: float = 0.5
+    # Detect only inside a padded region around the counting lines
+    roi: bool = False
+    # ROI margin as a fraction of the frame size
+    roi_padding: float = 0.1
+    # Skip detection on frames without motion around the counting lines
+    motion_gate: bool = False
+    # Skip source frames while no vehicle is close to a line
+    adaptive_stride: bool = False
+    max_stride: int = 4
+    # Split the video into this many overlapping segments processed in
+    # parallel (counts only)
+    segments: int = 1
+    decoder: str = 'opencv'
+    # Scale frames to this width while decoding (0 keeps the source size)
+    decode_width: int = 0
+    # Inference backend, one of ModelConfig.BACKENDS
+    backend: str = 'torch'
+    # Sample call stacks and record per-frame stage timings (see
+    # app.services.profiling); never served from the result cache
+    profile: bool = False
+
+    def validate(self) -> None:
+        """
+        Validate option ranges.
+        
+        Raises:
+            ValueError: If an option is out of range
+        """
+        if not 1 <= self.batch_size <= self.MAX_BATCH_SIZE:
+            raise ValueError(
+                f"batch_size must be between 1 and {self.MAX_BATCH_SIZE}"
+            )
+        if not 1 <= self.queue_size <= self.MAX_QUEUE_SIZE:
+            raise ValueError(
+                f"queue_size must be between 1 and {self.MAX_QUEUE_SIZE}"
+            )
+        if self.output_mode not in self.OUTPUT_MODES:
+            raise ValueError(
+                f"output_mode must be one of {', '.join(self.OUTPUT_MODES)}"
+            )
+        if self.output_stride < 1:
+            raise ValueError("output_stride must be at least 1")
+        if not 0 < self.preview_scale <= 1:
+            raise ValueError("preview_scale must be in (0, 1]")
+        if not 1 <= self.max_stride <= self.MAX_STRIDE:
+            raise ValueError(
+                f"max_stride must be between 1 and {self.MAX_STRIDE}"
+            )
+        if not 0 <= self.roi_padding <= 1:
+            raise ValueError("roi_padding must be between 0 and 1")
+        if not 1 <= self.segments <= self.MAX_SEGMENTS:
+            raise ValueError(
+                f"segments must be between 1 and {self.MAX_SEGMENTS}"
+            )
+        if self.segments > 1 and self.writes_video:
+            raise ValueError("segments > 1 requires output_mode 'counts_only'")
+        if self.decoder not in self.DECODERS:
+            raise ValueError(
+                f"decoder must be one of {', '.join(self.DECODERS)}"
+            )
+        if self.decode_width and self.decode_width < self.MIN_DECODE_WIDTH:
+            raise ValueError(
+                f"decode_width must be 0 or at least {self.MIN_DECODE_WIDTH}"
+            )
+        if self.backend not in ModelConfig.BACKENDS:
+            raise ValueError(
+                f"backend must be one of {', '.join(ModelConfig.BACKENDS)}"
+            )
+
+    @property
+    def writes_video(self) -> bool:
+        return self.output_mode != 'counts_only'
+
+    @property
+    def decoder_crops_roi(self) -> bool:
+        """The decoder outputs only the ROI (no annotated video needs whole frames)."""
+        return self.decoder == 'ffmpeg' and self.roi and not self.writes_video
+
+    def output_size(self, frame_w: int, frame_h: int) -> tuple[int, int]:
+        """Size of the annotated video for a given source frame size."""
+        if self.output_mode != 'preview':
+            return frame_w, frame_h
+        # Even dimensions keep common encoders happy
+        return (
+            max(2, int(frame_w * self.preview_scale) // 2 * 2),
+            max(2, int(frame_h * self.preview_scale) // 2 * 2),
+        )
+
+    def output_fps(self, fps: float) -> float:
+        """Frame rate of the annotated video, so its duration matches the source."""
+        if self.output_mode == 'every_nth':
+            return fps / self.output_stride
+        return fps
+
+    def output_settings(self) -> dict:
+        """Options that affect job results, for result cache keys."""
+        settings = {
+            name: value for name, value in asdict(self).items()
+            if name not in self.PERFORMANCE_ONLY
+        }
+        # Mode parameters only matter in their own mode
+        if self.output_mode != 'every_nth':
+            settings.pop('output_stride')
+        if self.output_mode != 'preview':
+            settings.pop('preview_scale')
+        if not (self.roi or self.motion_gate):
+            settings.pop('roi_padding')
+        if not self.adaptive_stride:
+            settings.pop('max_stride')
+        if self.segments == 1:
+            settings.pop('segments')
+        if self.decoder == 'opencv':
+            settings.pop('decoder')
+        if not self.decode_width:
+            settings.pop('decode_width')
+        if self.backend == 'torch':
+            settings.pop('backend')
+        return settings
+
+
+@dataclass
+class StreamOptions:
+    """Settings of a continuous stream counting job."""
+
+    MAX_WINDOWS = 288
+    MAX_BUFFER_FRAMES = 1024
+
+    # Length of each counting window, in stream time
+    window_seconds: float = 300.0
+    # Closed windows kept in memory and in progress updates
+    max_windows: int = 12
+    # Frames buffered between ingestion and detection; the oldest are
+    # dropped when detection falls behind
+    buffer_frames: int = 32
+    # End the stream after this long without a new frame
+    idle_timeout: float = 30.0
+
+    def validate(self) -> None:
+        """
+        Validate option ranges.
+        
+        Raises:
+            ValueError: If an option is out of range
+        """
+        if self.window_seconds < 1:
+            raise ValueError("window_seconds must be at least 1")
+        if not 1 <= self.max_windows <= self.MAX_WINDOWS:
+            raise ValueError(
+                f"max_windows must be between 1 and {self.MAX_WINDOWS}"
+            )
+        if not 1 <= self.buffer_frames <= self.MAX_BUFFER_FRAMES:
+            raise ValueError(
+                f"buffer_frames must be between 1 and {self.MAX_BUFFER_FRAMES}"
+            )
+        if self.idle_timeout <= 0:
+            raise ValueError("idle_timeout must be positive")
@@ -1,3 +1,5 @@
+# Handlers write from a listener thread (see app.logging.queue_logging);
+# loggers on hot paths are rate limited per message template.
 LOGGING_CONFIG = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -8,14 +10,24 @@ LOGGING_CONFIG = {
         "access": {
             "format": "%(levelname)s | ACCESS | %(message)s",
         },
+        "job": {
+            "format": "%(asctime)s | %(levelname)s | %(processName)s/%(threadName)s | %(name)s | %(message)s",
+        },
+    },
+    "filters": {
+        "rate_limit": {
+            "()": "app.logging.queue_logging.RateLimitFilter",
+            "burst": 5,
+            "interval": 10.0,
+        },
     },
     "handlers": {
         "default": {
-            "class": "logging.StreamHandler",
+            "class": "app.logging.queue_logging.QueuedStreamHandler",
             "formatter": "default",
         },
         "access": {
-            "class": "logging.StreamHandler",
+            "class": "app.logging.queue_logging.QueuedStreamHandler",
             "formatter": "access",
         },
     },
@@ -24,5 +36,9 @@ LOGGING_CONFIG = {
         "uvicorn.error": {"handlers": ["default"], "level": "INFO"},
         "uvicorn.access": {"handlers": ["access"], "level": "INFO"},
         "app": {"handlers": ["default"], "level": "INFO"},
+        # Per-frame and per-vehicle messages
+        "app.pipeline": {"level": "INFO", "filters": ["rate_limit"]},
+        "vehicle_counter": {"handlers": ["default"], "level": "INFO", "filters": ["rate_limit"]},
+        "yolo_tracker": {"handlers": ["default"], "level": "INFO"},
     },
 }
@@ -0,0 +1,191 @@
+"""
+Non-blocking log handlers, hot-path rate limiting and per-job log files.
+
+Handlers configured with the Queued* classes do not write in the thread
+that logs: the record goes on an in-process queue and a listener thread
+formats and writes it, so a slow terminal or log collector never stalls
+the pipeline threads. As with logging.handlers.QueueHandler, the message
+is merged with its arguments before the record is queued, so arguments
+mutated after the logging call are logged as they were.
+"""
+import os
+import copy
+import queue
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueListener
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from app.logging.logging_config import LOGGING_CONFIG
+
+JOB_LOG_DIR = Path(os.getenv("VCOUNT_LOG_DIR", "logs"))
+# Job log files kept, 0 for all; older ones are deleted when a job starts
+JOB_LOGS_KEPT = int(os.getenv("VCOUNT_JOB_LOGS_KEPT", "500"))
+
+_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+_stopped = False
+
+
+class _Listener(QueueListener):
+    """Hands each (handler, record) to its handler; events mark a flush."""
+
+    def handle(self, item) -> None:
+        if isinstance(item, threading.Event):
+            item.set()
+            return
+        handler, record = item
+        handler.handle_now(record)
+
+
+class QueuedHandlerMixin:
+    """Defers a handler's filtering, formatting and writing to the listener thread."""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        if _stopped:
+            # Interpreter shutdown: nobody drains the queue any more
+            return self.handle_now(record)
+        if _listener is None:
+            _start_listener()
+        _queue.put((self, self.prepare(record)))
+        return True
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Copy of the record with its message merged with the arguments and
+        any traceback rendered, as QueueHandler.prepare does; other handlers
+        still get the original.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = (self.formatter or logging.Formatter()).formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def handle_now(self, record: logging.LogRecord) -> bool:
+        return super().handle(record)
+
+
+class QueuedStreamHandler(QueuedHandlerMixin, logging.StreamHandler):
+    """logging.StreamHandler writing from the listener thread."""
+
+
+class QueuedFileHandler(QueuedHandlerMixin, logging.FileHandler):
+    """logging.FileHandler writing from the listener thread."""
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most burst records of one message template through per interval
+    seconds, for loggers on hot paths. Warnings and errors always pass. The
+    first record of the next interval reports how many were dropped.
+
+    Templates are the unformatted messages, so callers must log with
+    %-style arguments rather than pre-formatted strings.
+    """
+
+    def __init__(self, burst: int = 5, interval: float = 10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        # (logger, template) -> [interval start, passed, dropped]
+        self._windows: Dict[tuple, List] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            dropped = window[2] if window is not None else 0
+            window = self._windows[key] = [now, 0, 0]
+            if dropped:
+                record.msg = f"{record.msg} [{dropped} similar messages suppressed]"
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+def flush_logs(timeout: float = 5.0) -> None:
+    """Wait until the records queued so far have been written."""
+    if _listener is None or _stopped:
+        return
+    done = threading.Event()
+    _queue.put(done)
+    done.wait(timeout)
+
+
+@contextmanager
+def job_log(job_id: str) -> Iterator[Path]:
+    """
+    Also write this process's log records to the job's log file while the
+    block runs. Worker processes run one job at a time, so every record
+    logged meanwhile belongs to the job; segment processes append to the
+    same file. Opening a new job's log deletes the oldest ones beyond
+    JOB_LOGS_KEPT.
+
+    Yields:
+        Path of the job's log file
+    """
+    JOB_LOG_DIR.mkdir(parents=True, exist_ok=True)
+    path = JOB_LOG_DIR / f"job_{job_id}.log"
+    if JOB_LOGS_KEPT and not path.exists():
+        _prune_job_logs()
+    handler = QueuedFileHandler(path, encoding="utf-8", delay=True)
+    handler.setFormatter(logging.Formatter(LOGGING_CONFIG["formatters"]["job"]["format"]))
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        yield path
+    finally:
+        root.removeHandler(handler)
+        flush_logs()
+        handler.close()
+
+
+def _prune_job_logs() -> None:
+    """Delete the oldest job log files, leaving room for one more within JOB_LOGS_KEPT."""
+    paths = []
+    for path in JOB_LOG_DIR.glob("job_*.log"):
+        try:
+            paths.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    paths.sort()
+    for _, path in paths[:max(0, len(paths) - JOB_LOGS_KEPT + 1)]:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            # Still open elsewhere (Windows); retried by the next job
+            continue
+
+
+def _start_listener() -> None:
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        listener = _Listener(_queue)
+        listener.start()
+        atexit.register(_stop_listener)
+        _listener = listener
+
+
+def _stop_listener() -> None:
+    """Write what is still queued; later records are written synchronously."""
+    global _stopped
+    _stopped = True
+    if _listener is not None:
+        _listener.stop()
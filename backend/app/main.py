@@ -1,21 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import logging.config
 from app.logging.logging_config import LOGGING_CONFIG
-from app.routers import frames, results, processing
+from app.routers import frames, metrics, results, processing, streams, uploads
+from app.services.job_queue import job_queue
+from app.utils.uploads import purge_stale_partials
 
 logging.config.dictConfig(LOGGING_CONFIG)
 
 logger = logging.getLogger("app")
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models are loaded by the job worker processes, not the API process
+    purge_stale_partials()
+    job_queue.start()
+    yield
+    job_queue.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    logger.info("%s %s", request.method, request.url.path)
     response = await call_next(request)
-    logger.info("→ %d", response.status_code)
+    logger.info("%s %s → %d", request.method, request.url.path, response.status_code)
     return response
 
 
@@ -29,4 +41,7 @@ app.add_middleware(
 
 app.include_router(frames.router)
 app.include_router(results.router)
-app.include_router(processing.router)
\ No newline at end of file
+app.include_router(processing.router)
+app.include_router(streams.router)
+app.include_router(uploads.router)
+app.include_router(metrics.router)
\ No newline at end of file
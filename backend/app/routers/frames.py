@@ -3,31 +3,36 @@ import os
 import cv2
 import logging
 from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import FileResponse
 
+from app.utils.uploads import resolve_video
+
 logger = logging.getLogger("app")
 
 router = APIRouter(prefix="", tags=["frames"])
 
-UPLOAD_FOLDER = Path("videos")
 FRAME_FOLDER = Path("frames")
 
-UPLOAD_FOLDER.mkdir(exist_ok=True)
 FRAME_FOLDER.mkdir(exist_ok=True)
 
 
 @router.post("/upload_frame")
-async def upload_frame(video: UploadFile = File(...)):
-    """Upload video and extract thumbnail frame at 1 second mark."""
-    logger.info("upload_frame: filename=%s", video.filename)
+async def upload_frame(
+    video: Optional[UploadFile] = File(None),
+    video_id: str = Form(""),
+):
+    """
+    Upload video (or reference an earlier upload by video_id) and extract
+    thumbnail frame at 1 second mark.
+    """
+    logger.info("upload_frame: filename=%s video_id=%s", video and video.filename, video_id)
 
-    video_path = os.path.join(UPLOAD_FOLDER, video.filename)
-    with open(video_path, "wb") as f:
-        f.write(await video.read())
+    video_id, video_path = await resolve_video(video, video_id)
 
     try:
-        cap = cv2.VideoCapture(video_path)
+        cap = cv2.VideoCapture(str(video_path))
         
         if not cap.isOpened():
             raise HTTPException(400, "Failed to open video file")
@@ -45,7 +50,7 @@ async def upload_frame(video: UploadFile = File(...)):
             logger.error("Failed to extract frame at index %d", frame_index)
             raise HTTPException(400, "Frame extraction failed")
 
-        name = Path(video.filename).stem + ".png"
+        name = (Path(video.filename).stem if video and video.filename else video_id) + ".png"
         path = os.path.join(FRAME_FOLDER, name)
         success = cv2.imwrite(path, frame)
         
@@ -54,7 +59,7 @@ async def upload_frame(video: UploadFile = File(...)):
             raise HTTPException(500, "Failed to save frame")
 
         logger.info("Thumbnail written: %s", path)
-        return {"thumbnail_url": f"/frames/{name}"}
+        return {"thumbnail_url": f"/frames/{name}", "video_id": video_id}
     
     except HTTPException:
         raise
@@ -0,0 +1,42 @@
+"""Prometheus metrics endpoint."""
+from typing import List
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from app.services import metrics
+from app.services.job_queue import job_queue
+from app.utils import job_store
+
+router = APIRouter(prefix="", tags=["metrics"])
+
+
+@router.get("/metrics")
+def get_metrics():
+    """
+    Metrics in the Prometheus text format: counters and histograms recorded
+    by this process and the job workers, plus queue and per-job gauges read
+    from the job store at scrape time.
+    """
+    body = metrics.render(
+        [metrics.local_values(), *job_queue.metric_arrays()],
+        _gauges(),
+    )
+    return Response(body, media_type=metrics.CONTENT_TYPE)
+
+
+def _gauges() -> List[metrics.Gauge]:
+    counts = job_store.count_by_status()
+    stats = job_queue.stats()
+    gauges: List[metrics.Gauge] = [
+        ("vcount_queue_depth", "Jobs waiting for a worker", {}, counts.get(job_store.QUEUED, 0)),
+        ("vcount_active_jobs", "Jobs being processed", {}, counts.get(job_store.RUNNING, 0)),
+        ("vcount_workers", "Configured job worker processes", {}, stats["workers"]),
+        ("vcount_workers_alive", "Job worker processes running", {}, stats["workers_alive"]),
+    ]
+    for job in job_store.list_jobs((job_store.RUNNING,)):
+        fps = (job["progress"] or {}).get("fps")
+        if fps is not None:
+            gauges.append((
+                "vcount_job_fps", "Frames processed per second by a running job", {"job_id": job["id"]}, fps,
+            ))
+    return gauges
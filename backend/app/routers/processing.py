@@ -1,197 +1,246 @@
 """Vehicle counting processing endpoints."""
-import os
-import cv2
 import json
 import logging
 import asyncio
-from pathlib import Path
+from dataclasses import asdict
+from typing import Optional, Tuple
 from uuid import uuid4
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
 
-from app.config.model_config import ModelConfig
+from app.config.processing_config import ProcessingOptions
 from app.utils.direction_validator import validate_directions
-from app.services.vehicle_counter import VehicleCounter
-from app.services.yolo_tracker import YOLOVehicleTracker
-from app.services.video_processor import VideoProcessor
-from app.utils import cancellation
+from app.services.job_queue import job_queue, status_view
+from app.services.progress import progress_hub
+from app.services.count_job import recount
+from app.utils import cancellation, job_store
+from app.utils.uploads import resolve_video
 
 logger = logging.getLogger("app")
 
 router = APIRouter(prefix="", tags=["processing"])
 
-executor = ThreadPoolExecutor(max_workers=2)
+# How often /count_vehicles checks whether its job has finished
+WAIT_INTERVAL = 0.5
 
-UPLOAD_FOLDER = Path("videos")
-RESULTS_FOLDER = Path("results")
 
-UPLOAD_FOLDER.mkdir(exist_ok=True)
-RESULTS_FOLDER.mkdir(exist_ok=True)
-
-
-@router.post("/count_vehicles")
-async def count_vehicles(
-    video: UploadFile = File(...),
+async def count_job_params(
+    video: Optional[UploadFile] = File(None),
     directions: str = Form(...),
     model_name: str = Form("yolo11n-best.pt"),
     intersection_name: str = Form(""),
     processing_id: str = Form(""),
-):
-    """Process video for vehicle counting with directional tracking."""
-    try:
-        logger.warning("count_vehicles called")
-        logger.warning("   processing_id: %s", processing_id)
-        logger.warning("   video.filename: %s", video.filename)
-        logger.warning("   model_name: %s", model_name)
-        logger.warning("   intersection_name: %s", intersection_name)
-        
-        # Register task for cancellation tracking
-        cancellation.register_task(processing_id) 
-        logger.warning("Registered task for processing_id: %s", processing_id)
+    batch_size: int = Form(1),
+    realtime_pacing: bool = Form(False),
+    video_id: str = Form(""),
+    use_cache: bool = Form(True),
+    priority: int = Form(0),
+    output_mode: str = Form("full"),
+    output_stride: int = Form(5),
+    preview_scale: float = Form(0.5),
+    roi: bool = Form(False),
+    roi_padding: float = Form(0.1),
+    motion_gate: bool = Form(False),
+    adaptive_stride: bool = Form(False),
+    max_stride: int = Form(4),
+    segments: int = Form(1),
+    decoder: str = Form("opencv"),
+    decode_width: int = Form(0),
+    backend: str = Form("torch"),
+    profile: bool = Form(False),
+) -> Tuple[str, dict, int]:
+    """Validate a counting request and store its video; returns (job_id, params, priority)."""
+    logger.info(
+        "Count job requested: processing_id=%s video=%s video_id=%s model=%s intersection=%s",
+        processing_id, video and video.filename, video_id, model_name, intersection_name,
+    )
 
+    try:
         directions_data = json.loads(directions)
         validate_directions(directions_data)
 
-        logger.info("Model: %s", model_name)
-        logger.info("Directions count: %d", len(directions_data))
+        options = ProcessingOptions(
+            batch_size=batch_size,
+            realtime_pacing=realtime_pacing,
+            use_cache=use_cache,
+            output_mode=output_mode,
+            output_stride=output_stride,
+            preview_scale=preview_scale,
+            roi=roi,
+            roi_padding=roi_padding,
+            motion_gate=motion_gate,
+            adaptive_stride=adaptive_stride,
+            max_stride=max_stride,
+            segments=segments,
+            decoder=decoder,
+            decode_width=decode_width,
+            backend=backend,
+            profile=profile,
+        )
+        options.validate()
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
+    if logger.isEnabledFor(logging.DEBUG):
         for d in directions_data:
-            logger.info(
+            logger.debug(
                 "Direction id=%s from=%s to=%s lines=%d",
                 d["id"], d["from"], d["to"], len(d.get("lines", []))
             )
 
-        # Save uploaded video
-        video_path = os.path.join(UPLOAD_FOLDER, f"{uuid4()}_{video.filename}")
-        with open(video_path, "wb") as f:
-            f.write(await video.read())
-
-        # Detect device
-        device = "cuda" if cv2.cuda.getCudaEnabledDeviceCount() > 0 else "cpu"
-        logger.info("Device selected: %s", device)
-
-        # Get video properties
-        cap = cv2.VideoCapture(video_path)
-        ret, frame = cap.read()
-        if not ret:
-            raise RuntimeError("Cannot read video")
-        h, w = frame.shape[:2]
-        fps = cap.get(cv2.CAP_PROP_FPS) or 30
-        cap.release()
-        
-        logger.info(f"Video dimensions: {w}x{h}")
-
-        # Resolve model path
-        model_path = ModelConfig.resolve_model_path(model_name)
-        
-        # Initialize tracker and counter
-        tracker = YOLOVehicleTracker(
-            model_path=model_path,
-            conf=0.45,
-            imgsz=640,
-            device=device,
-        )
+    # Save uploaded video, or reuse the one stored by an earlier upload
+    stored_id, _ = await resolve_video(video, video_id)
 
-        counter = VehicleCounter(
-            directions=directions_data,
-            frame_w=w,
-            frame_h=h,
-        )
+    params = {
+        "video_id": stored_id,
+        "video_file": video.filename if video and video.filename else stored_id,
+        "directions": directions_data,
+        "model_name": model_name,
+        "intersection_name": intersection_name,
+        "options": asdict(options),
+    }
+    return processing_id or uuid4().hex, params, priority
 
-        # Setup video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        annotated_filename = f"annotated_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid4().hex[:8]}.mp4"
-        annotated_path = os.path.join(RESULTS_FOLDER, annotated_filename)
-        writer = cv2.VideoWriter(annotated_path, fourcc, fps, (w, h))
-        
-        logger.info("Starting vehicle counting...")
-        start_time = datetime.now()
-
-        # Process video frames
-        processor = VideoProcessor(
-            tracker=tracker,
-            counter=counter,
-            directions_data=directions_data,
-            writer=writer,
-            video_path=video_path,
-            processing_id=processing_id
-        )
-        
-        loop = asyncio.get_event_loop()
-        frame_count = await loop.run_in_executor(
-            executor,
-            processor.process_frames
-        )
 
-        end_time = datetime.now()
-        processing_time = (end_time - start_time).total_seconds()
-        logger.info(f"Video processing complete: {frame_count} frames processed in {processing_time:.2f}s")
-        writer.release()
-        
-        # Check if cancelled
-        if cancellation.is_cancelled(processing_id):
-            logger.warning("Task was cancelled - skipping results save and deleting annotated video")
-            if os.path.exists(annotated_path):
-                os.remove(annotated_path)
-                logger.info(f"Deleted annotated video: {annotated_path}")
-            cancellation.mark_completed(processing_id)
-            return {"status": "cancelled", "processing_id": processing_id}
-    
-        # Generate results
-        results = counter.get_results()
-        
-        results_with_metadata = {
-            "results": results,
-            "metadata": {
-                "intersection_name": intersection_name,
-                "video_file": video.filename,
-                "model": model_name,
-                "start_time": start_time.isoformat(),
-                "end_time": end_time.isoformat(),
-                "processing_time_seconds": round(processing_time, 2),
-                "total_frames_processed": frame_count,
-                "video_dimensions": {"width": w, "height": h},
-                "directions_count": len(directions_data),
-                "annotated_video": f"/results/{annotated_filename}",
-                "input_fps": fps,
-                "processed_fps": fps,
-            }
-        }
-
-        # Save results to file
-        result_filename = f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid4().hex[:8]}.json"
-        result_path = os.path.join(RESULTS_FOLDER, result_filename)
-        with open(result_path, 'w') as f:
-            json.dump(results_with_metadata, f, indent=2)
-        
-        logger.info("Final results: %s", results)
-        logger.info(f"Results saved to: {result_path}")
-        
-        cancellation.mark_completed(processing_id)
-        return results_with_metadata
-
-    except Exception as e:
-        logger.exception("Vehicle counting failed")
-        cancellation.mark_completed(processing_id, error=str(e))
-        raise HTTPException(500, f"Vehicle counting failed: {str(e)}")
+def _submit(job_id: str, params: dict, priority: int) -> str:
+    try:
+        return job_queue.submit(job_id, params, priority=priority)
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+
+
+@router.post("/jobs")
+def submit_job(job: Tuple[str, dict, int] = Depends(count_job_params)):
+    """Queue a vehicle counting job and return its id immediately."""
+    job_id, params, priority = job
+    status = _submit(job_id, params, priority)
+    logger.info("Job %s submitted (%s, priority %d)", job_id, status, priority)
+    return {"job_id": job_id, "status": status}
+
+
+@router.get("/jobs")
+def list_active_jobs():
+    """Worker pool state and the running and queued jobs, in claim order."""
+    active = job_store.list_jobs((job_store.RUNNING, job_store.QUEUED))
+    return {
+        **job_queue.stats(),
+        "running": [status_view(j) for j in active if j["status"] == job_store.RUNNING],
+        "queued": [status_view(j) for j in active if j["status"] == job_store.QUEUED],
+    }
+
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    """Current status of a job, including its position in the queue."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        raise HTTPException(404, f"Job not found: {job_id}")
+    return status_view(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-Sent Events stream of a job's progress: frames processed, total
+    frames, fps, ETA and running counts. Ends once the job has finished.
+    """
+    if job_store.get_progress(job_id) is None:
+        raise HTTPException(404, f"Job not found: {job_id}")
+
+    async def stream():
+        async for event in progress_hub.subscribe(job_id):
+            yield f"event: {event['status']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _completed_job(job_id: str) -> dict:
+    """A completed job whose result files are still available."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        raise HTTPException(404, f"Job not found: {job_id}")
+    if job["status"] != job_store.COMPLETED:
+        raise HTTPException(409, f"Job is {job['status']}")
+    if job["expired_at"]:
+        raise HTTPException(410, f"Result of job {job_id} was evicted from the result cache; submit the job again")
+    return job
+
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """Results with metadata of a completed job."""
+    return _completed_job(job_id)["result"]
+
+
+@router.post("/jobs/{job_id}/recount")
+def recount_job(job_id: str, directions: str = Form(...), intersection_name: str = Form("")):
+    """
+    Count a finished job's video again with new directions, replaying its
+    recorded detections instead of running the detector.
+    """
+    job = _completed_job(job_id)
+
+    try:
+        directions_data = json.loads(directions)
+        validate_directions(directions_data)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    try:
+        return recount(job["result"], directions_data, intersection_name)
+    except FileNotFoundError as e:
+        raise HTTPException(404, str(e))
+
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Cancel a queued or running job."""
+    return cancel_processing(job_id)
+
+
+@router.post("/count_vehicles")
+async def count_vehicles(job: Tuple[str, dict, int] = Depends(count_job_params)):
+    """
+    Process video for vehicle counting with directional tracking.
+
+    Submits a job and waits for it; long-running clients should prefer
+    POST /jobs and poll GET /jobs/{job_id}.
+    """
+    processing_id, params, priority = job
+    status = _submit(processing_id, params, priority)
+    logger.warning("Registered task for processing_id: %s", processing_id)
+
+    while status not in job_store.FINISHED_STATUSES:
+        await asyncio.sleep(WAIT_INTERVAL)
+        status = job_store.get_job(processing_id)["status"]
+
+    job = job_store.get_job(processing_id)
+    if status == job_store.CANCELLED:
+        return {"status": "cancelled", "processing_id": processing_id}
+    if status == job_store.FAILED:
+        raise HTTPException(500, f"Vehicle counting failed: {job['error']}")
+    return job["result"]
 
 
 @router.post("/cancel_processing/{processing_id}")
 def cancel_processing(processing_id: str):
     """Cancel a running vehicle counting process."""
     logger.warning("Received cancellation request for processing_id: %s", processing_id)
-    
+
     task = cancellation.get_task_status(processing_id)
-    
+
     if not task:
         logger.error("Processing ID %s not found", processing_id)
         return {"status": "not_found", "processing_id": processing_id}
-    
+
     if task.get("completed"):
         logger.info("Processing_id %s already completed", processing_id)
         return {"status": "already_completed", "processing_id": processing_id}
-    
+
     cancellation.mark_cancelled(processing_id)
     logger.warning("Marked processing_id %s as cancelled", processing_id)
     return {"status": "cancelled", "processing_id": processing_id}
@@ -15,7 +15,7 @@ RESULTS_FOLDER.mkdir(exist_ok=True)
 
 @router.get("/{filename}")
 def get_result_file(filename: str):
-    """Serve result files (JSON, videos, images)."""
+    """Serve result files (JSON, videos, images, profiles)."""
     logger.info("Serving result file: %s", filename)
 
     path = os.path.join(RESULTS_FOLDER, filename)
@@ -29,5 +29,8 @@ def get_result_file(filename: str):
         media_type = "video/mp4"
     elif filename.endswith('.png'):
         media_type = "image/png"
+    elif filename.endswith('.folded'):
+        # Collapsed stacks for flamegraph tools
+        media_type = "text/plain"
 
     return FileResponse(path, media_type=media_type)
@@ -0,0 +1,118 @@
+"""Live stream counting endpoints."""
+import json
+import logging
+from dataclasses import asdict
+from uuid import uuid4
+from fastapi import APIRouter, Form, HTTPException
+
+from app.config.processing_config import ProcessingOptions, StreamOptions
+from app.utils.direction_validator import validate_directions
+from app.services.job_queue import job_queue
+from app.services.stream_job import resolve_source
+from app.utils import cancellation, job_store
+
+logger = logging.getLogger("app")
+
+router = APIRouter(prefix="/streams", tags=["streams"])
+
+
+@router.post("")
+def start_stream(
+    source: str = Form(...),
+    directions: str = Form(...),
+    model_name: str = Form("yolo11n-best.pt"),
+    intersection_name: str = Form(""),
+    stream_id: str = Form(""),
+    priority: int = Form(0),
+    batch_size: int = Form(1),
+    roi: bool = Form(False),
+    roi_padding: float = Form(0.1),
+    motion_gate: bool = Form(False),
+    backend: str = Form("torch"),
+    window_seconds: float = Form(300.0),
+    max_windows: int = Form(12),
+    buffer_frames: int = Form(32),
+    idle_timeout: float = Form(30.0),
+):
+    """
+    Start counting a live stream. It runs as a job on one worker until the
+    source ends or POST /streams/{stream_id}/stop is called; per-window
+    counts are published through the job progress.
+    """
+    try:
+        directions_data = json.loads(directions)
+        validate_directions(directions_data)
+        resolved = resolve_source(source)
+
+        options = ProcessingOptions(
+            batch_size=batch_size,
+            use_cache=False,
+            output_mode="counts_only",
+            roi=roi,
+            roi_padding=roi_padding,
+            motion_gate=motion_gate,
+            backend=backend,
+        )
+        options.validate()
+        stream_options = StreamOptions(
+            window_seconds=window_seconds,
+            max_windows=max_windows,
+            buffer_frames=buffer_frames,
+            idle_timeout=idle_timeout,
+        )
+        stream_options.validate()
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    job_id = stream_id or uuid4().hex
+    params = {
+        "kind": "stream",
+        "source": resolved,
+        "directions": directions_data,
+        "model_name": model_name,
+        "intersection_name": intersection_name,
+        "options": asdict(options),
+        "stream": asdict(stream_options),
+    }
+    try:
+        status = job_queue.submit(job_id, params, priority=priority)
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+
+    logger.info("Stream %s submitted for %s (%s)", job_id, source, status)
+    return {"job_id": job_id, "status": status}
+
+
+@router.get("/{stream_id}/windows")
+def get_stream_windows(stream_id: str):
+    """Closed counting windows of a stream (the most recent ones) and the current window."""
+    job = job_store.get_job(stream_id)
+    if job is None or job["params"].get("kind") != "stream":
+        raise HTTPException(404, f"Stream not found: {stream_id}")
+
+    if job["result"] is not None:
+        metadata = job["result"]["metadata"]
+        return {
+            "status": job["status"],
+            "windows": metadata["windows"],
+            "current_window": None,
+            "frames_dropped": metadata["frames_dropped"],
+        }
+
+    progress = job["progress"] or {}
+    return {
+        "status": job["status"],
+        "windows": progress.get("windows", []),
+        "current_window": progress.get("current_window"),
+        "frames_dropped": progress.get("frames_dropped", 0),
+    }
+
+
+@router.post("/{stream_id}/stop")
+def stop_stream(stream_id: str):
+    """Stop a stream; it completes with the counts gathered so far."""
+    job = job_store.get_job(stream_id)
+    if job is None or job["params"].get("kind") != "stream":
+        raise HTTPException(404, f"Stream not found: {stream_id}")
+    cancellation.mark_cancelled(stream_id)
+    return {"status": "stopping", "job_id": stream_id}
@@ -0,0 +1,37 @@
+"""Resumable multi-part video upload endpoints."""
+import logging
+from fastapi import APIRouter, Form, Request
+
+from app.utils import uploads
+
+logger = logging.getLogger("app")
+
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+
+@router.post("")
+def create_upload(filename: str = Form("")):
+    """Start a resumable upload; send chunks with PUT, then call complete."""
+    upload_id = uploads.create_resumable(filename)
+    logger.info("Resumable upload started: %s (%s)", upload_id, filename)
+    return {"upload_id": upload_id, "offset": 0, "chunk_size": uploads.CHUNK_SIZE}
+
+
+@router.get("/{upload_id}")
+def get_upload(upload_id: str):
+    """Report how many bytes were received, so a client can resume."""
+    return {"upload_id": upload_id, "offset": uploads.resumable_offset(upload_id)}
+
+
+@router.put("/{upload_id}")
+async def put_chunk(upload_id: str, request: Request, offset: int = 0):
+    """Append the raw request body at the given byte offset."""
+    received = await uploads.append_resumable(upload_id, offset, request.stream())
+    return {"upload_id": upload_id, "offset": received}
+
+
+@router.post("/{upload_id}/complete")
+def complete_upload(upload_id: str):
+    """Finish the upload and return the content-addressed video_id."""
+    video_id, path = uploads.complete_resumable(upload_id)
+    return {"video_id": video_id, "size": path.stat().st_size}
@@ -0,0 +1,489 @@
+"""Execution of a single vehicle counting job."""
+import os
+import cv2
+import json
+import logging
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+from datetime import datetime
+
+from app.config.model_config import ModelConfig
+from app.config.processing_config import ProcessingOptions
+from app.services.vehicle_counter import VehicleCounter
+from app.services.yolo_tracker import YOLOVehicleTracker
+from app.services.video_processor import VideoProcessor
+from app.services.model_registry import model_registry
+from app.services.result_cache import ResultCache
+from app.services.progress import ProgressReporter
+from app.services.motion_gate import MotionGate
+from app.services.stride_controller import StrideController
+from app.services.detection_trace import DetectionTrace, DetectionTraceWriter
+from app.services.decoders import create_decoder, decoded_size
+from app.services.detectors import ScriptedDetector
+from app.services.profiling import JobProfiler
+from app.services import metrics
+from app.services.segmented_job import (
+    motion_gate_stats,
+    plan_segments,
+    run_segments,
+    stage_stats,
+    stride_stats,
+    throughput_stats,
+)
+from app.utils import cancellation, job_store
+from app.utils.uploads import find_video
+
+logger = logging.getLogger("app")
+
+RESULTS_FOLDER = Path("results")
+
+RESULTS_FOLDER.mkdir(exist_ok=True)
+
+DEFAULT_CONF = 0.45
+DEFAULT_IMGSZ = 640
+
+result_cache = ResultCache(RESULTS_FOLDER, on_delete=job_store.expire_results)
+
+# Label of each result file on the vcount_result_file_bytes metric, by filename prefix
+_RESULT_FILE_KINDS = {
+    "results": "results",
+    "annotated": "annotated_video",
+    "trace": "detection_trace",
+    "profile": "profile",
+    "timeline": "timeline",
+}
+
+
+def cache_key(params: dict) -> str:
+    """
+    Result cache key for job parameters.
+
+    Profiled jobs get keys of their own: they are never answered from the
+    cache, but registering their outputs there lets eviction delete them.
+    """
+    options = ProcessingOptions(**params["options"])
+    settings = {
+        **YOLOVehicleTracker.settings_fingerprint(DEFAULT_CONF, DEFAULT_IMGSZ),
+        **options.output_settings(),
+    }
+    if options.profile:
+        settings["profile"] = True
+    return ResultCache.make_key(params["video_id"], params["directions"], params["model_name"], settings)
+
+
+def cached_result(params: dict) -> Optional[dict]:
+    """Return a cached result for these parameters, unless caching is disabled."""
+    options = params["options"]
+    # Profiling a job means running it
+    if params.get("kind") == "stream" or not options.get("use_cache", True) or options.get("profile"):
+        return None
+    cached = result_cache.get(cache_key(params))
+    if cached is None:
+        metrics.RESULT_CACHE_MISSES.inc()
+        return None
+    metrics.RESULT_CACHE_HITS.inc()
+    cached["metadata"]["intersection_name"] = params["intersection_name"]
+    cached["metadata"]["cache_hit"] = True
+    return cached
+
+
+def create_components(params: dict, options: ProcessingOptions, frame_w: int, frame_h: int) -> tuple:
+    """
+    Build the tracker, counter and optional samplers of a job.
+
+    Returns:
+        (tracker, counter, roi, motion_gate, stride); the last three are
+        None when their option is off
+    """
+    model_name = params["model_name"]
+    # Exported backends are CPU runtimes
+    device = ModelConfig.detect_device() if options.backend == 'torch' else 'cpu'
+    logger.info("Device selected: %s (backend %s)", device, options.backend)
+
+    # Initialize tracker and counter (weights are shared via the registry,
+    # tracker state is private to this job). Scripted jobs replay the
+    # trajectory script named by model_name instead of running a model.
+    if options.backend == 'scripted':
+        model_path = ModelConfig.resolve_script_path(model_name)
+        model = None
+        detector = ScriptedDetector.load(model_path, (frame_w, frame_h))
+    else:
+        model_path = ModelConfig.resolve_model_path(model_name)
+        model = model_registry.acquire(model_name, options.backend)
+        detector = None
+
+    tracker = YOLOVehicleTracker(
+        model_path=model_path,
+        conf=DEFAULT_CONF,
+        imgsz=DEFAULT_IMGSZ,
+        device=device,
+        model=model,
+        backend=options.backend,
+        detector=detector,
+    )
+
+    counter = VehicleCounter(
+        directions=params["directions"],
+        frame_w=frame_w,
+        frame_h=frame_h,
+        max_age=tracker.tracker_params['max_age'],
+    )
+
+    roi = None
+    if options.roi:
+        roi = counter.roi_bounds(options.roi_padding)
+        tracker.set_roi(roi, precropped=options.decoder_crops_roi)
+
+    motion_gate = None
+    if options.motion_gate:
+        gate_roi = counter.roi_bounds(options.roi_padding)
+        if options.decoder_crops_roi:
+            # Frames are that region already
+            gate_roi = (0, 0, gate_roi[2] - gate_roi[0], gate_roi[3] - gate_roi[1])
+        motion_gate = MotionGate(gate_roi)
+
+    stride = StrideController(counter, options.max_stride) if options.adaptive_stride else None
+    return tracker, counter, roi, motion_gate, stride
+
+
+def run_count_job(job_id: str, params: dict) -> Optional[dict]:
+    """
+    Count vehicles in a stored video.
+
+    Args:
+        job_id: Job / processing identifier, used for cancellation checks
+        params: Job parameters: video_id, video_file, directions, model_name,
+            intersection_name and options (ProcessingOptions fields)
+
+    Returns:
+        Results with metadata, or None if the job was cancelled
+    """
+    directions_data = params["directions"]
+    model_name = params["model_name"]
+    intersection_name = params["intersection_name"]
+    video_id = params["video_id"]
+    options = ProcessingOptions(**params["options"])
+    video_path = str(find_video(video_id))
+
+    logger.info("Model: %s", model_name)
+    logger.info("Directions count: %d", len(directions_data))
+
+    # Get video properties
+    cap = cv2.VideoCapture(video_path)
+    ret, frame = cap.read()
+    if not ret:
+        raise RuntimeError("Cannot read video")
+    source_h, source_w = frame.shape[:2]
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+
+    # Frames are processed, counted and annotated at the decoded size
+    w, h = decoded_size(source_w, source_h, options.decode_width)
+    logger.info("Video dimensions: %dx%d, decoded at %dx%d (%s)", source_w, source_h, w, h, options.decoder)
+
+    plan = plan_segments(total_frames, options.segments, fps) if options.segments > 1 else []
+    if len(plan) > 1:
+        return _run_segmented_job(job_id, params, plan, (w, h, fps), (source_w, source_h), total_frames)
+
+    tracker, counter, roi, motion_gate, stride = create_components(params, options, w, h)
+    decoder = create_decoder(
+        video_path, options.decoder, (w, h), roi if options.decoder_crops_roi else None
+    )
+
+    # Setup video writer (none when only counts are requested)
+    annotated_filename = annotated_path = writer = None
+    if options.writes_video:
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        annotated_filename = f"annotated_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid4().hex[:8]}.mp4"
+        annotated_path = os.path.join(RESULTS_FOLDER, annotated_filename)
+        writer = cv2.VideoWriter(
+            annotated_path, fourcc, options.output_fps(fps), options.output_size(w, h)
+        )
+    logger.info("Output mode: %s", options.output_mode)
+
+    logger.info("Starting vehicle counting...")
+    start_time = datetime.now()
+
+    # Record detections so the video can be re-counted with other lines
+    trace_filename = f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid4().hex[:8]}.vct"
+    trace = DetectionTraceWriter(
+        RESULTS_FOLDER / trace_filename, w, h, fps,
+        meta={"video_id": video_id, "model": model_name},
+    )
+
+    # Process video frames
+    progress = ProgressReporter(job_id, total_frames)
+    profiler = JobProfiler() if options.profile else None
+    processor = VideoProcessor(
+        tracker=tracker,
+        counter=counter,
+        directions_data=directions_data,
+        writer=writer,
+        video_path=video_path,
+        processing_id=job_id,
+        options=options,
+        fps=fps,
+        progress=progress,
+        motion_gate=motion_gate,
+        stride=stride,
+        trace=trace,
+        decoder=decoder,
+        timeline=profiler.timeline if profiler else None,
+    )
+
+    progress.start()
+    if profiler is not None:
+        profiler.start()
+    try:
+        frame_count = processor.process_frames()
+    except BaseException:
+        trace.abort()
+        raise
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        progress.stop()
+        if writer is not None:
+            writer.release()
+
+    end_time = datetime.now()
+    processing_time = (end_time - start_time).total_seconds()
+    logger.info("Video processing complete: %d frames processed in %.2fs", frame_count, processing_time)
+
+    # Check if cancelled
+    if cancellation.is_cancelled(job_id):
+        logger.warning("Task was cancelled - skipping results save and deleting annotated video")
+        trace.abort()
+        if annotated_path and os.path.exists(annotated_path):
+            os.remove(annotated_path)
+            logger.info("Deleted annotated video: %s", annotated_path)
+        return None
+
+    trace.close()
+
+    # Generate results
+    results = counter.get_results()
+    sampling = processor.sampling_stats()
+    profile = profiler.save(RESULTS_FOLDER) if profiler else None
+
+    results_with_metadata = {
+        "results": results,
+        "metadata": {
+            "intersection_name": intersection_name,
+            "video_file": params["video_file"],
+            "video_id": video_id,
+            "model": model_name,
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(),
+            "processing_time_seconds": round(processing_time, 2),
+            "total_frames_processed": frame_count,
+            "video_dimensions": {"width": source_w, "height": source_h},
+            "directions_count": len(directions_data),
+            "annotated_video": f"/results/{annotated_filename}" if annotated_filename else None,
+            "detection_trace": trace_filename,
+            "input_fps": fps,
+            "processed_fps": sampling["processed_fps"],
+            "frames_read": sampling["frames_read"],
+            "frames_sampled": sampling["frames_processed"],
+            "adaptive_stride": sampling["adaptive_stride"],
+            "throughput": tracker.throughput_stats(options.batch_size),
+            "output": processor.output_stats(),
+            "decoder": processor.decode_stats(),
+            "stages": processor.stage_stats(),
+            "roi": _roi_stats(roi, w, h),
+            "motion_gate": motion_gate.stats(tracker.seconds_per_frame) if motion_gate else None,
+            "profile": profile,
+            "cache_hit": False,
+        }
+    }
+
+    _save_results(params, results_with_metadata, [annotated_filename, trace_filename, *_profile_files(profile)])
+    return results_with_metadata
+
+
+def _run_segmented_job(
+    job_id: str,
+    params: dict,
+    plan: list,
+    video_info: tuple,
+    source_size: tuple,
+    total_frames: int,
+) -> Optional[dict]:
+    """
+    Count vehicles in a long video by tracking its segments in parallel
+    processes, then counting the stitched detections in one pass.
+    """
+    options = ProcessingOptions(**params["options"])
+    directions_data = params["directions"]
+    w, h, fps = video_info
+
+    start_time = datetime.now()
+    trace_filename = f"trace_{start_time.strftime('%Y%m%d_%H%M%S')}_{uuid4().hex[:8]}.vct"
+    trace = DetectionTraceWriter(
+        RESULTS_FOLDER / trace_filename, w, h, fps,
+        meta={"video_id": params["video_id"], "model": params["model_name"]},
+    )
+
+    progress = ProgressReporter(job_id, total_frames)
+    profiler = JobProfiler() if options.profile else None
+    progress.start()
+    if profiler is not None:
+        profiler.start()
+    try:
+        segments = run_segments(job_id, params, plan, video_info, trace, progress, profiler)
+    except BaseException:
+        trace.abort()
+        raise
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        progress.stop()
+
+    if segments is None:
+        logger.warning("Task was cancelled - skipping results save")
+        trace.abort()
+        return None
+    trace.close()
+
+    # One counter over the stitched detections, so a vehicle crossing a
+    # segment boundary is counted exactly once
+    counter = VehicleCounter(
+        directions=directions_data,
+        frame_w=w,
+        frame_h=h,
+        max_age=YOLOVehicleTracker.DEFAULT_TRACKER_PARAMS['max_age'],
+    )
+    frame_count = DetectionTrace(RESULTS_FOLDER / trace_filename).replay(counter)
+
+    end_time = datetime.now()
+    processing_time = (end_time - start_time).total_seconds()
+    logger.info("Video processing complete: %d frames processed in %.2fs", frame_count, processing_time)
+
+    results = counter.get_results()
+    profile = profiler.save(RESULTS_FOLDER) if profiler else None
+    frames_read = sum(s["frames_read"] for s in segments["per_segment"])
+    frames_read -= sum(s["core_start"] - s["start"] for s in segments["per_segment"])
+    results_with_metadata = {
+        "results": results,
+        "metadata": {
+            "intersection_name": params["intersection_name"],
+            "video_file": params["video_file"],
+            "video_id": params["video_id"],
+            "model": params["model_name"],
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(),
+            "processing_time_seconds": round(processing_time, 2),
+            "total_frames_processed": frame_count,
+            "video_dimensions": {"width": source_size[0], "height": source_size[1]},
+            "directions_count": len(directions_data),
+            "annotated_video": None,
+            "detection_trace": trace_filename,
+            "input_fps": fps,
+            "processed_fps": round(fps * frame_count / frames_read, 2) if frames_read else fps,
+            "frames_read": frames_read,
+            "frames_sampled": frame_count,
+            "adaptive_stride": stride_stats(segments),
+            "throughput": throughput_stats(segments, options.batch_size, options.backend),
+            "output": {
+                "mode": options.output_mode,
+                "frames_written": 0,
+                "render_seconds": 0.0,
+                "estimated_full_render_seconds": None,
+                "time_saved_seconds": None,
+            },
+            "decoder": {"name": options.decoder, "frame_size": [w, h]},
+            "stages": stage_stats(segments),
+            "roi": _roi_stats(segments["per_segment"][0]["roi"], w, h),
+            "motion_gate": motion_gate_stats(segments),
+            "segments": segments,
+            "profile": profile,
+            "cache_hit": False,
+        }
+    }
+
+    _save_results(params, results_with_metadata, [trace_filename, *_profile_files(profile)])
+    return results_with_metadata
+
+
+def _roi_stats(roi: Optional[tuple], w: int, h: int) -> Optional[dict]:
+    """Detection region for the job metadata, None without one."""
+    if not roi:
+        return None
+    return {
+        "bounds": list(roi),
+        "area_fraction": round((roi[2] - roi[0]) * (roi[3] - roi[1]) / (w * h), 3),
+    }
+
+
+def _profile_files(profile: Optional[dict]) -> list:
+    """Filenames written by a job's profiler, if it was profiled."""
+    return [profile["stacks"], profile["timeline"]] if profile else []
+
+
+def _save_results(params: dict, results_with_metadata: dict, extra_files: list) -> None:
+    """Write results to a file and register them in the result cache."""
+    result_filename = f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid4().hex[:8]}.json"
+    result_path = os.path.join(RESULTS_FOLDER, result_filename)
+    with open(result_path, 'w') as f:
+        json.dump(results_with_metadata, f, indent=2)
+    result_cache.put(cache_key(params), result_filename, extra_files)
+
+    for filename in [result_filename, *extra_files]:
+        if filename:
+            kind = _RESULT_FILE_KINDS[filename.split("_", 1)[0]]
+            metrics.RESULT_FILE_BYTES[kind].observe(os.path.getsize(os.path.join(RESULTS_FOLDER, filename)))
+
+    logger.info("Final results: %s", results_with_metadata["results"])
+    logger.info("Results saved to: %s", result_path)
+
+
+def recount(result: dict, directions_data: list, intersection_name: str = "") -> dict:
+    """
+    Count vehicles again with new directions by replaying the detection
+    trace of a finished job; no decoding or inference.
+
+    Args:
+        result: Results with metadata of the finished job
+        directions_data: New directions payload
+        intersection_name: Name for the new results
+
+    Returns:
+        Results with metadata
+
+    Raises:
+        FileNotFoundError: If the job has no detection trace (any more)
+    """
+    trace_filename = result["metadata"].get("detection_trace")
+    if not trace_filename or not (RESULTS_FOLDER / trace_filename).exists():
+        raise FileNotFoundError("Detection trace not available for this job")
+
+    start_time = datetime.now()
+    trace = DetectionTrace(RESULTS_FOLDER / trace_filename)
+    counter = VehicleCounter(
+        directions=directions_data,
+        frame_w=trace.frame_w,
+        frame_h=trace.frame_h,
+        max_age=YOLOVehicleTracker.DEFAULT_TRACKER_PARAMS['max_age'],
+    )
+    frames = trace.replay(counter)
+    processing_time = (datetime.now() - start_time).total_seconds()
+    logger.info("Re-counted %d frames from %s in %.2fs", frames, trace_filename, processing_time)
+
+    metadata = result["metadata"]
+    return {
+        "results": counter.get_results(),
+        "metadata": {
+            "intersection_name": intersection_name or metadata.get("intersection_name", ""),
+            "video_file": metadata.get("video_file"),
+            "video_id": metadata.get("video_id"),
+            "model": metadata.get("model"),
+            "recount": True,
+            "detection_trace": trace_filename,
+            "processing_time_seconds": round(processing_time, 2),
+            "frames_replayed": frames,
+            "video_dimensions": {"width": trace.frame_w, "height": trace.frame_h},
+            "directions_count": len(directions_data),
+        },
+    }
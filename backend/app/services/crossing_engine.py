@@ -0,0 +1,132 @@
+"""Vectorized line-side and segment-crossing tests for VehicleCounter."""
+from typing import Dict, List, Tuple
+import numpy as np
+
+
+class CrossingEngine:
+    """
+    Compiles entry and exit lines into NumPy arrays once, then evaluates all
+    detections against all lines per frame in a few batched operations.
+
+    The arithmetic mirrors ``VehicleCounter._get_side_of_line`` and
+    ``VehicleCounter._segments_intersect`` term for term, so results match the
+    scalar implementation.
+    """
+
+    SIDE_THRESHOLD = 5
+
+    def __init__(self, directions: List[Dict]):
+        """
+        Args:
+            directions: Parsed directions with pixel 'entry_line' and 'exit_line'
+        """
+        self.num_directions = len(directions)
+
+        lines = [d['entry_line'] for d in directions] + [d['exit_line'] for d in directions]
+        coords = np.array(
+            [[l['x1'], l['y1'], l['x2'], l['y2']] for l in lines], dtype=np.float64
+        ).reshape(-1, 4)
+
+        # Row vectors (1 x L) so they broadcast against column vectors (N x 1)
+        self.x1 = coords[:, 0][None, :]
+        self.y1 = coords[:, 1][None, :]
+        self.x2 = coords[:, 2][None, :]
+        self.y2 = coords[:, 3][None, :]
+        self.dx = self.x2 - self.x1
+        self.dy = self.y2 - self.y1
+        self.min_x = np.minimum(self.x1, self.x2)
+        self.max_x = np.maximum(self.x1, self.x2)
+        self.min_y = np.minimum(self.y1, self.y2)
+        self.max_y = np.maximum(self.y1, self.y2)
+
+    def sides(self, cx: np.ndarray, cy: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Side of every entry and exit line for every point.
+
+        Args:
+            cx, cy: Point coordinates, shape (N,)
+
+        Returns:
+            (entry_sides, exit_sides): int8 arrays of shape (N, D) holding 1 or -1,
+            or 0 where the point is within the threshold of the line
+        """
+        cx = np.asarray(cx, dtype=np.float64)[:, None]
+        cy = np.asarray(cy, dtype=np.float64)[:, None]
+
+        cross = self.dx * (cy - self.y1) - self.dy * (cx - self.x1)
+        sides = np.where(cross > 0, 1, -1).astype(np.int8)
+        sides[np.abs(cross) < self.SIDE_THRESHOLD] = 0
+
+        return self._split(sides)
+
+    def distances(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        """
+        Distance from every point to the nearest entry or exit line segment.
+
+        Args:
+            cx, cy: Point coordinates, shape (N,)
+
+        Returns:
+            float64 array of shape (N,)
+        """
+        cx = np.asarray(cx, dtype=np.float64)[:, None]
+        cy = np.asarray(cy, dtype=np.float64)[:, None]
+
+        length_sq = self.dx * self.dx + self.dy * self.dy
+        t = ((cx - self.x1) * self.dx + (cy - self.y1) * self.dy) / np.where(length_sq > 0, length_sq, 1.0)
+        t = np.clip(t, 0.0, 1.0)
+        dist = np.hypot(cx - (self.x1 + t * self.dx), cy - (self.y1 + t * self.dy))
+        return dist.min(axis=1) if dist.shape[1] else np.full(len(cx), np.inf)
+
+    def intersections(
+        self,
+        px: np.ndarray,
+        py: np.ndarray,
+        cx: np.ndarray,
+        cy: np.ndarray,
+        has_prev: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Whether each movement segment (px, py) -> (cx, cy) intersects each line.
+
+        Args:
+            px, py: Previous positions, shape (N,)
+            cx, cy: Current positions, shape (N,)
+            has_prev: Boolean mask of rows that have a previous position
+
+        Returns:
+            (entry_crossed, exit_crossed): bool arrays of shape (N, D)
+        """
+        px = np.asarray(px, dtype=np.float64)[:, None]
+        py = np.asarray(py, dtype=np.float64)[:, None]
+        cx = np.asarray(cx, dtype=np.float64)[:, None]
+        cy = np.asarray(cy, dtype=np.float64)[:, None]
+
+        # orient(a, b, c) = (b.y - a.y) * (c.x - b.x) - (b.x - a.x) * (c.y - b.y)
+        o1 = (cy - py) * (self.x1 - cx) - (cx - px) * (self.y1 - cy)
+        o2 = (cy - py) * (self.x2 - cx) - (cx - px) * (self.y2 - cy)
+        o3 = self.dy * (px - self.x2) - self.dx * (py - self.y2)
+        o4 = self.dy * (cx - self.x2) - self.dx * (cy - self.y2)
+
+        crossed = (o1 * o2 < 0) & (o3 * o4 < 0)
+
+        # Collinear touching cases
+        seg_min_x, seg_max_x = np.minimum(px, cx), np.maximum(px, cx)
+        seg_min_y, seg_max_y = np.minimum(py, cy), np.maximum(py, cy)
+        crossed |= (o1 == 0) & self._within(self.x1, self.y1, seg_min_x, seg_max_x, seg_min_y, seg_max_y)
+        crossed |= (o2 == 0) & self._within(self.x2, self.y2, seg_min_x, seg_max_x, seg_min_y, seg_max_y)
+        crossed |= (o3 == 0) & self._within(px, py, self.min_x, self.max_x, self.min_y, self.max_y)
+        crossed |= (o4 == 0) & self._within(cx, cy, self.min_x, self.max_x, self.min_y, self.max_y)
+
+        crossed &= np.asarray(has_prev, dtype=bool)[:, None]
+
+        return self._split(crossed)
+
+    @staticmethod
+    def _within(x, y, min_x, max_x, min_y, max_y) -> np.ndarray:
+        """Bounding-box containment, broadcast over (N, L)."""
+        return (min_x <= x) & (x <= max_x) & (min_y <= y) & (y <= max_y)
+
+    def _split(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Split an (N, 2D) array into entry and exit halves."""
+        return values[:, :self.num_directions], values[:, self.num_directions:]
@@ -0,0 +1,320 @@
+"""Video frame decoders: OpenCV, or an ffmpeg subprocess piping raw frames."""
+import os
+import cv2
+import shutil
+import logging
+import tempfile
+import subprocess
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("app")
+
+# ffmpeg executable used by FFmpegDecoder
+FFMPEG_BIN = os.getenv("VCOUNT_FFMPEG", "ffmpeg")
+
+# Pipe capacity requested for the ffmpeg output (Linux only)
+PIPE_SIZE = 1 << 20
+
+# (frame_index, frame) pairs in source order
+Frames = Iterator[Tuple[int, np.ndarray]]
+
+
+def decoded_size(frame_w: int, frame_h: int, decode_width: int) -> Tuple[int, int]:
+    """
+    Frame size after decoder-side scaling to decode_width, keeping the
+    aspect ratio with even dimensions. Sources no wider than decode_width,
+    or decode_width 0, keep their size.
+    """
+    if not decode_width or decode_width >= frame_w:
+        return frame_w, frame_h
+    return decode_width // 2 * 2, max(2, round(frame_h * decode_width / frame_w / 2) * 2)
+
+
+def create_decoder(
+    video_path: str,
+    decoder: str,
+    frame_size: Tuple[int, int],
+    crop: Optional[Tuple[int, int, int, int]] = None,
+):
+    """
+    Build the decoder of a job.
+
+    Args:
+        video_path: Path to the video file
+        decoder: 'opencv' or 'ffmpeg'
+        frame_size: (width, height) frames are scaled to
+        crop: Optional (x1, y1, x2, y2) region of the scaled frame to decode
+            (ffmpeg only); frames then hold just that region
+
+    Returns:
+        OpenCVDecoder or FFmpegDecoder
+    """
+    if decoder == 'ffmpeg':
+        # Decoder threads follow the worker's thread budget
+        return FFmpegDecoder(video_path, frame_size, crop, threads=cv2.getNumThreads())
+    return OpenCVDecoder(video_path, frame_size)
+
+
+class OpenCVDecoder:
+    """
+    Decodes with cv2.VideoCapture. Every frame is a new array; frames are
+    resized after decoding when a smaller frame size is requested.
+    """
+
+    name = 'opencv'
+
+    def __init__(self, video_path: str, frame_size: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            video_path: Path to the video file
+            frame_size: Optional (width, height) to resize frames to
+        """
+        self.video_path = video_path
+        self.frame_size = frame_size
+
+    def frames(
+        self,
+        start: int = 0,
+        end: Optional[int] = None,
+        next_stride: Optional[Callable[[], int]] = None,
+        buffers: int = 0,
+    ) -> Frames:
+        """
+        Decode frames in order.
+
+        Skipped frames are only grabbed, not converted to BGR images.
+
+        Args:
+            start: Index of the first frame to decode
+            end: Index to stop before (None for the end of the video)
+            next_stride: Optional; called after each yielded frame, returns
+                how many source frames to advance (1 = next frame)
+            buffers: Unused; frames are never reused
+
+        Yields:
+            Tuple of (frame_index, frame)
+
+        Raises:
+            RuntimeError: If the video cannot be opened
+        """
+        cap = self._open_at(self.video_path, start)
+        size = self.frame_size
+
+        try:
+            frame_idx = start
+            while end is None or frame_idx < end:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if size is not None and (frame.shape[1], frame.shape[0]) != size:
+                    frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                yield frame_idx, frame
+
+                skip = max(1, next_stride()) - 1 if next_stride is not None else 0
+                if end is not None:
+                    skip = min(skip, end - frame_idx - 1)
+                for _ in range(skip):
+                    if not cap.grab():
+                        return
+                frame_idx += skip + 1
+        finally:
+            cap.release()
+
+    def describe(self) -> Dict:
+        return {"name": self.name, "frame_size": list(self.frame_size) if self.frame_size else None}
+
+    @staticmethod
+    def _open_at(video_path: str, start: int) -> cv2.VideoCapture:
+        """Open a video positioned at frame start."""
+        cap = cv2.VideoCapture(video_path)
+
+        if not cap.isOpened():
+            raise RuntimeError(f"Cannot open video: {video_path}")
+
+        if start > 0 and not cap.set(cv2.CAP_PROP_POS_FRAMES, start):
+            cap.release()
+            raise RuntimeError(f"Cannot seek to frame {start} in {video_path}")
+        return cap
+
+
+class FFmpegDecoder:
+    """
+    Decodes in an ffmpeg subprocess that pipes raw BGR frames.
+
+    Scaling and cropping happen inside ffmpeg, on its own decoding threads,
+    so only the pixels the job uses cross the pipe. Frames are read straight
+    into a fixed ring of preallocated arrays: a yielded frame stays valid
+    until `buffers - 1` more frames have been yielded, and no memory is
+    allocated per frame.
+    """
+
+    name = 'ffmpeg'
+
+    def __init__(
+        self,
+        video_path: str,
+        frame_size: Tuple[int, int],
+        crop: Optional[Tuple[int, int, int, int]] = None,
+        threads: int = 0,
+    ):
+        """
+        Args:
+            video_path: Path to the video file
+            frame_size: (width, height) frames are scaled to
+            crop: Optional (x1, y1, x2, y2) region of the scaled frame to
+                decode, x2/y2 exclusive
+            threads: Decoding threads (0 lets ffmpeg decide)
+
+        Raises:
+            RuntimeError: If ffmpeg is not installed or the video cannot be opened
+        """
+        self.binary = shutil.which(FFMPEG_BIN)
+        if self.binary is None:
+            raise RuntimeError(f"ffmpeg not found (VCOUNT_FFMPEG={FFMPEG_BIN})")
+
+        cap = OpenCVDecoder._open_at(video_path, 0)
+        source_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+
+        self.video_path = video_path
+        self.frame_size = frame_size
+        self.crop = crop
+        self.threads = threads
+        self.filters = self._filters(source_size, frame_size, crop)
+        if crop is not None:
+            self.shape = (crop[3] - crop[1], crop[2] - crop[0], 3)
+        else:
+            self.shape = (frame_size[1], frame_size[0], 3)
+
+    def frames(
+        self,
+        start: int = 0,
+        end: Optional[int] = None,
+        next_stride: Optional[Callable[[], int]] = None,
+        buffers: int = 2,
+    ) -> Frames:
+        """
+        Decode frames in order.
+
+        Skipped frames are still decoded by ffmpeg but read into a scratch
+        buffer and never handed out.
+
+        Args:
+            start: Index of the first frame to decode
+            end: Index to stop before (None for the end of the video)
+            next_stride: Optional; called after each yielded frame, returns
+                how many source frames to advance (1 = next frame)
+            buffers: Frames the caller may hold at once, plus one
+
+        Yields:
+            Tuple of (frame_index, frame); frames are reused, see the class
+
+        Raises:
+            RuntimeError: If ffmpeg fails before producing a frame
+        """
+        ring = [np.empty(self.shape, dtype=np.uint8) for _ in range(max(2, buffers))]
+        views = [memoryview(frame.reshape(-1)) for frame in ring]
+        scratch = memoryview(np.empty(self.shape, dtype=np.uint8).reshape(-1))
+
+        with tempfile.TemporaryFile() as errors:
+            proc = subprocess.Popen(
+                self._command(start, end), stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE, stderr=errors,
+            )
+            self._grow_pipe(proc.stdout)
+            frame_idx = start
+            slot = 0
+            decoded = False
+            try:
+                while end is None or frame_idx < end:
+                    if not self._read_into(proc.stdout, views[slot]):
+                        break
+                    decoded = True
+                    yield frame_idx, ring[slot]
+                    slot = (slot + 1) % len(ring)
+
+                    skip = max(1, next_stride()) - 1 if next_stride is not None else 0
+                    if end is not None:
+                        skip = min(skip, end - frame_idx - 1)
+                    for _ in range(skip):
+                        if not self._read_into(proc.stdout, scratch):
+                            return
+                    frame_idx += skip + 1
+            finally:
+                proc.stdout.close()
+                if proc.poll() is None:
+                    proc.terminate()
+                returncode = proc.wait()
+
+                if returncode > 0 and not decoded:
+                    errors.seek(0)
+                    message = errors.read().decode(errors="replace").strip()
+                    raise RuntimeError(f"ffmpeg cannot decode {self.video_path}: {message}")
+
+    def describe(self) -> Dict:
+        return {
+            "name": self.name,
+            "frame_size": list(self.frame_size),
+            "crop": list(self.crop) if self.crop else None,
+            "threads": self.threads,
+        }
+
+    def _command(self, start: int, end: Optional[int]) -> list:
+        cmd = [self.binary, "-nostdin", "-hide_banner", "-loglevel", "error", "-threads", str(self.threads)]
+        if start > 0:
+            # Half a frame early: frames with earlier timestamps are dropped
+            # by ffmpeg's accurate seek, so timestamp rounding cannot skip one
+            cmd += ["-ss", f"{(start - 0.5) / self.fps:.6f}"]
+        cmd += ["-i", self.video_path, "-an", "-sn", "-dn"]
+        if self.filters:
+            cmd += ["-vf", ",".join(self.filters)]
+        if end is not None:
+            cmd += ["-frames:v", str(end - start)]
+        cmd += ["-vsync", "passthrough", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        return cmd
+
+    @staticmethod
+    def _filters(
+        source_size: Tuple[int, int],
+        frame_size: Tuple[int, int],
+        crop: Optional[Tuple[int, int, int, int]],
+    ) -> list:
+        """ffmpeg filters that turn a source frame into a (cropped) frame_size frame."""
+        src_w, src_h = source_size
+        if crop is None:
+            if frame_size == (src_w, src_h):
+                return []
+            return [f"scale={frame_size[0]}:{frame_size[1]}:flags=area"]
+
+        # Crop the same region in source pixels first, then scale only it
+        sx, sy = src_w / frame_size[0], src_h / frame_size[1]
+        x1, y1 = round(crop[0] * sx), round(crop[1] * sy)
+        x2, y2 = min(src_w, round(crop[2] * sx)), min(src_h, round(crop[3] * sy))
+        out_w, out_h = crop[2] - crop[0], crop[3] - crop[1]
+        filters = [f"crop={x2 - x1}:{y2 - y1}:{x1}:{y1}:exact=1"]
+        if (x2 - x1, y2 - y1) != (out_w, out_h):
+            filters.append(f"scale={out_w}:{out_h}:flags=area")
+        return filters
+
+    @staticmethod
+    def _read_into(stream, view: memoryview) -> bool:
+        """Fill view from the pipe; False at the end of the stream."""
+        filled = 0
+        while filled < len(view):
+            n = stream.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    @staticmethod
+    def _grow_pipe(stream) -> None:
+        """Ask for a larger pipe, so a frame takes fewer reads (Linux only)."""
+        try:
+            import fcntl
+            fcntl.fcntl(stream.fileno(), fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+        except (ImportError, AttributeError, OSError):
+            pass
@@ -0,0 +1,214 @@
+"""Per-frame detection traces, stored columnar for fast re-counting."""
+import os
+import json
+import shutil
+import struct
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("app")
+
+MAGIC = b"VCTRACE1"
+# Column data offsets are aligned so every column can be memory-mapped
+ALIGNMENT = 64
+
+# name -> (dtype, values per row)
+COLUMNS = {
+    # One row per processed frame, including frames without detections
+    "frames": (np.int32, 1),
+    # One row per detection
+    "frame_idx": (np.int32, 1),
+    "track_id": (np.int32, 1),
+    "class_id": (np.int16, 1),
+    "bbox": (np.int32, 4),
+    # Centers as the counter saw them, so a recount crosses lines exactly alike
+    "cx": (np.float64, 1),
+    "cy": (np.float64, 1),
+    "confidence": (np.float32, 1),
+}
+
+
+class DetectionTraceWriter:
+    """
+    Records the detections of every processed frame while a job runs.
+
+    Rows are buffered in memory and appended to one spill file per column;
+    close() assembles the columns into a single trace file:
+
+        MAGIC | uint32 header length | JSON header | aligned column blocks
+
+    The header holds frame size, fps and, per column, its dtype, shape and
+    byte offset, so DetectionTrace can memory-map each column directly.
+    """
+
+    FLUSH_ROWS = 4096
+
+    def __init__(self, path: Path, frame_w: int, frame_h: int, fps: float, meta: Optional[Dict] = None):
+        """
+        Args:
+            path: Trace file to create
+            frame_w, frame_h: Source frame size (directions are normalized to it)
+            fps: Source frame rate
+            meta: Extra header fields (e.g. video id, model)
+        """
+        self.path = Path(path)
+        self.header = {"frame_w": frame_w, "frame_h": frame_h, "fps": fps, **(meta or {})}
+
+        self._parts_dir = self.path.with_suffix(".parts")
+        self._parts_dir.mkdir(parents=True, exist_ok=True)
+        self._buffers: Dict[str, List] = {name: [] for name in COLUMNS}
+        self._buffered = 0
+
+    def add(self, frame_idx: int, detections: List[dict]) -> None:
+        """Record one processed frame."""
+        b = self._buffers
+        b["frames"].append(frame_idx)
+        for det in detections:
+            b["frame_idx"].append(frame_idx)
+            b["track_id"].append(det["track_id"])
+            b["class_id"].append(det["class_id"])
+            b["bbox"].append(det["bbox"])
+            b["cx"].append(det["cx"])
+            b["cy"].append(det["cy"])
+            b["confidence"].append(det["confidence"])
+
+        self._buffered += 1 + len(detections)
+        if self._buffered >= self.FLUSH_ROWS:
+            self._flush()
+
+    def add_columns(self, frames: np.ndarray, detections: Dict[str, np.ndarray]) -> None:
+        """
+        Record many processed frames at once.
+
+        Args:
+            frames: Source indices of the processed frames, ascending
+            detections: One array per detection column (every COLUMNS name
+                except "frames"), rows grouped by frame in the same order
+        """
+        self._flush()
+        for name, (dtype, _) in COLUMNS.items():
+            values = frames if name == "frames" else detections[name]
+            with open(self._parts_dir / name, "ab") as part:
+                part.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+    def close(self) -> Path:
+        """Write the trace file and remove the spill files."""
+        self._flush()
+
+        columns = {}
+        offset = 0
+        for name, (dtype, width) in COLUMNS.items():
+            # No spill file for a column that never had rows (no detections)
+            part = self._parts_dir / name
+            size = part.stat().st_size if part.exists() else 0
+            rows = size // (np.dtype(dtype).itemsize * width)
+            columns[name] = {
+                "dtype": np.dtype(dtype).str,
+                "shape": [rows, width] if width > 1 else [rows],
+                "offset": offset,
+            }
+            offset += -(-size // ALIGNMENT) * ALIGNMENT
+
+        header = json.dumps({**self.header, "columns": columns}).encode()
+        data_start = -(-(len(MAGIC) + 4 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(MAGIC)
+            out.write(struct.pack("<I", len(header)))
+            out.write(header)
+            for name, column in columns.items():
+                if not column["shape"][0]:
+                    continue
+                out.seek(data_start + column["offset"])
+                with open(self._parts_dir / name, "rb") as part:
+                    shutil.copyfileobj(part, out)
+            out.truncate(data_start + offset)
+        os.replace(tmp_path, self.path)
+
+        shutil.rmtree(self._parts_dir, ignore_errors=True)
+        logger.info("Detection trace saved: %s (%d frames)", self.path, columns["frames"]["shape"][0])
+        return self.path
+
+    def abort(self) -> None:
+        """Drop a trace that will not be completed."""
+        shutil.rmtree(self._parts_dir, ignore_errors=True)
+
+    def _flush(self) -> None:
+        for name, (dtype, width) in COLUMNS.items():
+            values = self._buffers[name]
+            if not values:
+                continue
+            array = np.asarray(values, dtype=dtype)
+            with open(self._parts_dir / name, "ab") as part:
+                part.write(array.tobytes())
+            values.clear()
+        self._buffered = 0
+
+
+class DetectionTrace:
+    """
+    Read-only view of a trace file; columns are memory-mapped, not loaded.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Raises:
+            ValueError: If the file is not a detection trace
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a detection trace: {path}")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            self.header = json.loads(f.read(header_len))
+
+        data_start = -(-(len(MAGIC) + 4 + header_len) // ALIGNMENT) * ALIGNMENT
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, column in self.header["columns"].items():
+            shape = tuple(column["shape"])
+            if shape[0] == 0:
+                self.columns[name] = np.empty(shape, dtype=column["dtype"])
+                continue
+            self.columns[name] = np.memmap(
+                self.path, dtype=column["dtype"], mode="r",
+                offset=data_start + column["offset"], shape=shape,
+            )
+
+    @property
+    def frame_w(self) -> int:
+        return self.header["frame_w"]
+
+    @property
+    def frame_h(self) -> int:
+        return self.header["frame_h"]
+
+    def replay(self, counter) -> int:
+        """
+        Feed every recorded frame through a VehicleCounter, in order.
+
+        Frames are replayed with their source indices, including frames
+        without detections, so track eviction matches the original run.
+
+        Returns:
+            Number of frames replayed
+        """
+        frames = np.asarray(self.columns["frames"])
+        frame_idx = np.asarray(self.columns["frame_idx"])
+        track_id = np.asarray(self.columns["track_id"])
+        class_id = np.asarray(self.columns["class_id"])
+        cx = np.asarray(self.columns["cx"], dtype=np.float64)
+        cy = np.asarray(self.columns["cy"], dtype=np.float64)
+
+        # Detection rows are grouped by frame in recording order
+        starts = np.searchsorted(frame_idx, frames, side="left")
+        ends = np.searchsorted(frame_idx, frames, side="right")
+
+        for f, a, b in zip(frames.tolist(), starts.tolist(), ends.tolist()):
+            counter.update_arrays(
+                track_id[a:b].tolist(), cx[a:b], cy[a:b], class_id[a:b].tolist(), f
+            )
+        return len(frames)
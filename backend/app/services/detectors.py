@@ -0,0 +1,231 @@
+"""Detectors behind YOLOVehicleTracker: YOLO with ByteTrack, or scripted trajectories."""
+import abc
+import json
+import logging
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("yolo_tracker")
+
+
+class FrameTracks(NamedTuple):
+    """Tracked boxes of one frame, in the coordinates of the frame given to the detector."""
+
+    boxes: np.ndarray        # (N, 4) x1, y1, x2, y2
+    track_ids: np.ndarray    # (N,)
+    class_ids: np.ndarray    # (N,)
+    confidences: np.ndarray  # (N,)
+
+    @classmethod
+    def empty(cls) -> "FrameTracks":
+        return cls(
+            np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32),
+        )
+
+
+class Detector(abc.ABC):
+    """
+    Detection and tracking of consecutive frames.
+
+    A detector keeps its tracking state between calls (one instance per
+    job), so a vehicle keeps its track id from frame to frame.
+    """
+
+    name = ''
+
+    @abc.abstractmethod
+    def track(
+        self,
+        frames: List[np.ndarray],
+        frame_indices: Sequence[int],
+        offset: Tuple[int, int] = (0, 0),
+    ) -> List[FrameTracks]:
+        """
+        Detect and track vehicles in frames.
+
+        Args:
+            frames: Frames in playback order; may be crops of the full frame
+            frame_indices: Source frame index of each frame
+            offset: (x, y) of the frames' top-left corner in the full frame
+
+        Returns:
+            One FrameTracks per frame, in frame (crop) coordinates
+        """
+
+
+class YOLODetector(Detector):
+    """An ultralytics model tracking with ByteTrack (its state lives in the model's predictor)."""
+
+    name = 'yolo'
+
+    def __init__(self, model, conf: float, imgsz: int, device: str, max_det: int, tracker_config: str):
+        """
+        Args:
+            model: Loaded ultralytics YOLO model, private to the job
+            conf: Confidence threshold
+            imgsz: Input image size
+            device: 'cpu' or 'cuda'
+            max_det: Most detections per frame
+            tracker_config: ultralytics tracker configuration file
+        """
+        self.model = model
+        self.conf = conf
+        self.imgsz = imgsz
+        self.device = device
+        self.max_det = max_det
+        self.tracker_config = tracker_config
+
+    def track(
+        self,
+        frames: List[np.ndarray],
+        frame_indices: Sequence[int],
+        offset: Tuple[int, int] = (0, 0),
+    ) -> List[FrameTracks]:
+        results = self.model.track(
+            frames if len(frames) > 1 else frames[0],
+            persist=True,
+            conf=max(0.15, self.conf - 0.25),
+            imgsz=self.imgsz,
+            device=self.device,
+            verbose=False,
+            max_det=self.max_det,
+            tracker=self.tracker_config,
+            batch=len(frames),
+        )
+        return [self._tracks(result) for result in results]
+
+    @staticmethod
+    def _tracks(result) -> FrameTracks:
+        """Tracked boxes of one ultralytics result; boxes without a track id are dropped."""
+        if result.boxes is None or result.boxes.id is None:
+            return FrameTracks.empty()
+        return FrameTracks(
+            result.boxes.xyxy.cpu().numpy(),
+            result.boxes.id.int().cpu().numpy(),
+            result.boxes.cls.int().cpu().numpy(),
+            result.boxes.conf.cpu().numpy(),
+        )
+
+
+class Trajectories:
+    """
+    Vehicles moving at constant velocity, as in a trajectory script.
+
+    A script is a JSON object with the frame size it was made for and its
+    vehicles::
+
+        {"width": 1280, "height": 720, "vehicles": [
+            {"track_id": 1, "class_id": 2, "start": 0, "end": 240,
+             "cx": -40.0, "cy": 300.0, "vx": 6.0, "vy": 0.0, "w": 80.0, "h": 40.0},
+            ...]}
+
+    A vehicle is present from frame start to end (exclusive); (cx, cy) is
+    its box center at frame start, (vx, vy) its velocity in pixels per
+    frame, w and h its box size. Optional "confidence" defaults to 1.
+    Other keys are ignored, so benchmarks.synthetic scenarios are scripts.
+    """
+
+    def __init__(self, script: Dict):
+        vehicles = sorted(script["vehicles"], key=lambda v: v["start"])
+        self.width = int(script["width"])
+        self.height = int(script["height"])
+
+        def column(key: str, dtype, default=None) -> np.ndarray:
+            return np.array([v.get(key, default) for v in vehicles], dtype=dtype)
+
+        self.track_ids = column("track_id", np.int64)
+        self.class_ids = column("class_id", np.int64)
+        self.start = column("start", np.int64)
+        self.end = column("end", np.int64)
+        self.center = np.stack([column("cx", np.float64), column("cy", np.float64)], axis=1).reshape(-1, 2)
+        self.velocity = np.stack([column("vx", np.float64), column("vy", np.float64)], axis=1).reshape(-1, 2)
+        self.half_size = np.stack([column("w", np.float64), column("h", np.float64)], axis=1).reshape(-1, 2) / 2
+        self.confidences = column("confidence", np.float32, 1.0)
+        # Longest presence, to bound the vehicles that can be present at a frame
+        self._max_duration = int((self.end - self.start).max()) if len(vehicles) else 0
+
+    @classmethod
+    def load(cls, path: str) -> "Trajectories":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def at(self, frame_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vehicles present at a frame.
+
+        Returns:
+            (indices, boxes): vehicle indices and their unclipped (N, 4)
+            x1, y1, x2, y2 boxes in script pixels
+        """
+        # Vehicles are sorted by start, so only a window can be present
+        lo = np.searchsorted(self.start, frame_idx - self._max_duration, side="right")
+        hi = np.searchsorted(self.start, frame_idx, side="right")
+        idx = np.arange(lo, hi)
+        idx = idx[self.end[lo:hi] > frame_idx]
+
+        center = self.center[idx] + self.velocity[idx] * (frame_idx - self.start[idx])[:, None]
+        half = self.half_size[idx]
+        return idx, np.concatenate([center - half, center + half], axis=1)
+
+
+class ScriptedDetector(Detector):
+    """
+    Emits the boxes of a trajectory script instead of looking at the frames.
+
+    Boxes are scaled from the script's frame size to the job's, and clipped
+    to the frames like real detections; vehicles outside a cropped region
+    are not reported. Track ids come from the script, so they are stable
+    and counts can be checked against the script's ground truth.
+    """
+
+    name = 'scripted'
+
+    def __init__(self, trajectories: Trajectories, frame_size: Tuple[int, int]):
+        """
+        Args:
+            trajectories: Vehicles to report
+            frame_size: (width, height) of the job's full frames
+        """
+        self.trajectories = trajectories
+        self.scale = np.array([
+            frame_size[0] / trajectories.width, frame_size[1] / trajectories.height,
+        ] * 2)
+
+    @classmethod
+    def load(cls, script_path: str, frame_size: Tuple[int, int]) -> "ScriptedDetector":
+        """
+        Detector replaying a trajectory script file.
+
+        Raises:
+            ValueError: If the script cannot be read
+        """
+        try:
+            trajectories = Trajectories.load(script_path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid trajectory script {script_path}: {e}") from e
+        logger.info("Scripted detector: %d vehicles from %s", len(trajectories.track_ids), script_path)
+        return cls(trajectories, frame_size)
+
+    def track(
+        self,
+        frames: List[np.ndarray],
+        frame_indices: Sequence[int],
+        offset: Tuple[int, int] = (0, 0),
+    ) -> List[FrameTracks]:
+        return [
+            self.tracks_at(frame_idx, frame.shape[1], frame.shape[0], offset)
+            for frame, frame_idx in zip(frames, frame_indices)
+        ]
+
+    def tracks_at(self, frame_idx: int, w: int, h: int, offset: Tuple[int, int] = (0, 0)) -> FrameTracks:
+        """Boxes of a frame of size (w, h) whose top-left corner is at offset in the full frame."""
+        t = self.trajectories
+        idx, boxes = t.at(frame_idx)
+        boxes = boxes * self.scale - np.array([offset[0], offset[1]] * 2, dtype=np.float64)
+        np.clip(boxes, 0, [w, h, w, h], out=boxes)
+        # Vehicles with (almost) nothing inside the frame are not detected
+        visible = (boxes[:, 2] - boxes[:, 0] >= 1) & (boxes[:, 3] - boxes[:, 1] >= 1)
+        idx = idx[visible]
+        return FrameTracks(boxes[visible], t.track_ids[idx], t.class_ids[idx], t.confidences[idx])
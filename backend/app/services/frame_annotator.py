@@ -1,11 +1,182 @@
 """Frame annotation and overlay rendering."""
 import cv2
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
 
 class FrameAnnotator:
-    """Handles drawing overlays on video frames."""
+    """
+    Handles drawing overlays on video frames.
+
+    An instance bound to a job's directions renders frames incrementally:
+    direction lines and their labels never change, so they are drawn once
+    into a static layer and composited through its mask; the count panel is
+    only redrawn when counts change; and output goes into a reused buffer.
+    The static/class methods draw everything from scratch.
+    """
+
+    def __init__(
+        self,
+        directions: Optional[List[dict]] = None,
+        directions_data: Optional[List[dict]] = None
+    ):
+        """
+        Args:
+            directions: Direction configurations from the counter (pixel coordinates)
+            directions_data: Original direction data with color info
+        """
+        self.directions = directions or []
+        data_by_id = {dd['id']: dd for dd in (directions_data or [])}
+
+        # Per-direction lookups, resolved once instead of per frame
+        self._direction_data = [data_by_id.get(d['id']) for d in self.directions]
+        self._panel_colors = [
+            self.extract_color_from_argb(dd['color']) if dd and 'color' in dd else (50, 255, 50)
+            for dd in self._direction_data
+        ]
+        self._panel_prefixes = [f"{d['from']} -> {d['to']}: " for d in self.directions]
+
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._buffer: Optional[np.ndarray] = None
+        self._static_box: Optional[Tuple[slice, slice]] = None
+        self._static_layer: Optional[np.ndarray] = None
+        self._static_mask: Optional[np.ndarray] = None
+        self._edge_idx: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._edge_pixels: Optional[np.ndarray] = None
+        self._edge_keep: Optional[np.ndarray] = None
+        self._panel: Optional[np.ndarray] = None
+        self._panel_mask: Optional[np.ndarray] = None
+        self._panel_rects: List[Tuple[Tuple[slice, slice], np.ndarray]] = []
+        self._panel_counts: Optional[Dict[str, dict]] = None
+
+    def annotate(
+        self,
+        frame: np.ndarray,
+        detections: List[dict],
+        counts: Dict[str, dict],
+        in_place: bool = False
+    ) -> np.ndarray:
+        """
+        Annotate a frame using the cached layers.
+
+        Args:
+            frame: Original video frame
+            detections: Current frame detections
+            counts: Vehicle counts by direction
+            in_place: Draw on frame itself instead of the reused output
+                buffer (for callers that own the frame)
+
+        Returns:
+            Annotated frame; unless in_place, the buffer is overwritten by
+            the next call, so write or copy it before annotating another frame
+        """
+        if frame.shape != self._shape:
+            self._prepare(frame.shape)
+
+        if in_place:
+            out = frame
+        else:
+            out = self._buffer
+            np.copyto(out, frame)
+
+        if self._static_box is not None:
+            region = out[self._static_box]
+            # Anti-aliased edges are blended with the frame, solid pixels copied
+            edges = region[self._edge_idx].astype(np.uint16)
+            region[self._edge_idx] = self._edge_pixels + (edges * self._edge_keep + 127) // 255
+            cv2.copyTo(self._static_layer, self._static_mask, region)
+
+        self.draw_detections(out, detections)
+
+        if counts != self._panel_counts:
+            self._render_panel(counts)
+        for rect, mask in self._panel_rects:
+            cv2.copyTo(self._panel[rect], mask, out[rect])
+
+        return out
+
+    def _prepare(self, shape: Tuple[int, ...]) -> None:
+        """Allocate buffers and pre-render the static line layer for a frame size."""
+        self._shape = shape
+        self._buffer = np.empty(shape, dtype=np.uint8)
+        self._panel = np.zeros(shape, dtype=np.uint8)
+        self._panel_mask = np.zeros(shape, dtype=np.uint8)
+        self._panel_counts = None
+
+        layer = np.zeros(shape, dtype=np.uint8)
+        mask = np.zeros(shape, dtype=np.uint8)
+        white = {'color': 0xFFFFFFFF}
+        for direction, dir_data in zip(self.directions, self._direction_data):
+            self.draw_direction_lines(layer, direction, dir_data)
+            self.draw_direction_lines(mask, direction, white)
+
+        # Keep only the bounding box of the drawn pixels
+        ys, xs = np.nonzero(mask[..., 0])
+        if len(ys) == 0:
+            self._static_box = None
+            return
+        box = (slice(ys.min(), ys.max() + 1), slice(xs.min(), xs.max() + 1))
+        alpha = mask[box][..., 0]
+
+        # Drawn on black, the layer holds color * alpha; partially covered
+        # pixels need frame * (1 - alpha) added back
+        self._static_box = box
+        self._static_layer = layer[box].copy()
+        self._static_mask = (alpha == 255).astype(np.uint8)
+        self._edge_idx = np.nonzero((alpha > 0) & (alpha < 255))
+        self._edge_pixels = self._static_layer[self._edge_idx].astype(np.uint16)
+        self._edge_keep = (255 - alpha[self._edge_idx]).astype(np.uint16)[:, None]
+
+    def _render_panel(self, counts: Dict[str, dict]) -> None:
+        """Redraw the count labels and record the drawn area of each."""
+        self._panel_counts = {dir_id: dict(c) for dir_id, c in counts.items()}
+        self._panel.fill(0)
+        self._panel_mask.fill(0)
+        self._panel_rects = []
+
+        h, w = self._shape[:2]
+        y_offset = 25
+        for direction, prefix, text_color in zip(self.directions, self._panel_prefixes, self._panel_colors):
+            c = counts[direction['id']]
+            label = f"{prefix}B:{c['bikes']} C:{c['cars']} Bu:{c['buses']} T:{c['trucks']}"
+            x1, y1, x2, y2 = self._draw_label(self._panel, label, y_offset, text_color)
+            # Border plus filled background: the label box without the corners
+            cv2.rectangle(self._panel_mask, (x1, y1), (x2, y2), (255, 255, 255), 2)
+            cv2.rectangle(self._panel_mask, (x1, y1), (x2, y2), (255, 255, 255), -1)
+
+            # The 2px border reaches one pixel past the rectangle corners
+            rect = (
+                slice(max(0, y1 - 1), max(0, min(h, y2 + 2))),
+                slice(max(0, x1 - 1), max(0, min(w, x2 + 2))),
+            )
+            self._panel_rects.append((rect, self._panel_mask[rect][..., 0].copy()))
+            y_offset += 35
+
+    @staticmethod
+    def _draw_label(
+        overlay: np.ndarray, label: str, y_offset: int, text_color: tuple
+    ) -> Tuple[int, int, int, int]:
+        """Draw one boxed count label; returns the box corners (x1, y1, x2, y2)."""
+        (text_w, text_h), _ = cv2.getTextSize(
+            label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
+        )
+        cv2.rectangle(
+            overlay,
+            (15, y_offset - text_h - 5),
+            (25 + text_w, y_offset + 5),
+            (0, 0, 0), -1
+        )
+        cv2.rectangle(
+            overlay,
+            (15, y_offset - text_h - 5),
+            (25 + text_w, y_offset + 5),
+            text_color, 2
+        )
+        cv2.putText(
+            overlay, label, (20, y_offset),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.6, text_color, 2, cv2.LINE_AA
+        )
+        return 15, y_offset - text_h - 5, 25 + text_w, y_offset + 5
     
     @staticmethod
     def extract_color_from_argb(argb: int) -> tuple[int, int, int]:
@@ -130,28 +301,7 @@ class FrameAnnotator:
                 f"T:{counts[dir_id]['trucks']}"
             )
             
-            # Draw background
-            (text_w, text_h), _ = cv2.getTextSize(
-                label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-            )
-            cv2.rectangle(
-                overlay,
-                (15, y_offset - text_h - 5),
-                (25 + text_w, y_offset + 5),
-                (0, 0, 0), -1
-            )
-            cv2.rectangle(
-                overlay,
-                (15, y_offset - text_h - 5),
-                (25 + text_w, y_offset + 5),
-                text_color, 2
-            )
-            
-            # Draw text
-            cv2.putText(
-                overlay, label, (20, y_offset),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.6, text_color, 2, cv2.LINE_AA
-            )
+            FrameAnnotator._draw_label(overlay, label, y_offset, text_color)
             y_offset += 35
     
     @classmethod
@@ -0,0 +1,172 @@
+"""Process pool serving the persistent job queue."""
+import os
+import logging
+import threading
+import multiprocessing
+from typing import List, Optional, Sequence
+
+from app.services import metrics
+from app.services.count_job import cached_result
+from app.services.job_worker import available_cpus, partition_cpus, worker_main
+from app.utils import job_store
+
+logger = logging.getLogger("app")
+
+
+class JobQueue:
+    """
+    Runs queued counting jobs on a pool of worker processes.
+
+    The SQLite job store is the source of truth: each worker process claims
+    the next queued job (highest priority first), runs it and records the
+    outcome, so jobs submitted before a restart are picked up again when the
+    server comes back. Each worker gets a fixed thread budget and, where the
+    OS allows it, its own slice of CPUs, so jobs run in parallel without
+    competing for cores.
+
+    Workers record metrics into shared arrays owned by the queue, one per
+    worker slot; a restarted worker keeps adding to its slot's array, so
+    totals survive worker crashes.
+    """
+
+    MONITOR_INTERVAL = 5.0
+
+    def __init__(self, workers: int, threads_per_worker: Optional[int] = None):
+        """
+        Args:
+            workers: Number of worker processes (jobs processed concurrently)
+            threads_per_worker: Inference/OpenCV threads per worker; defaults to
+                an even share of the available CPUs
+        """
+        self.workers = workers
+        cpus = available_cpus()
+        self.threads_per_worker = threads_per_worker or max(1, len(cpus) // max(1, workers))
+        self._cpu_slices = partition_cpus(cpus, workers, self.threads_per_worker)
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._wakeup = self._ctx.Event()
+        self._stopping = self._ctx.Event()
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._metrics = [metrics.shared_array(self._ctx) for _ in range(workers)]
+        self._monitor: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Initialize the store, requeue interrupted jobs and start workers."""
+        job_store.init_db()
+        requeued = job_store.requeue_interrupted()
+        if requeued:
+            logger.warning("Requeued %d interrupted job(s)", requeued)
+
+        self._stopping.clear()
+        for index in range(self.workers):
+            self._spawn(index)
+
+        self._monitor = threading.Thread(target=self._monitor_loop, name="job-monitor", daemon=True)
+        self._monitor.start()
+        logger.info(
+            "Job queue started with %d worker process(es), %d thread(s) each",
+            self.workers, self.threads_per_worker,
+        )
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stop all workers. Jobs still running are left 'running' in the store
+        and requeued on the next start.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        for process in self._processes:
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes = [None] * self.workers
+
+    def submit(self, job_id: str, params: dict, priority: int = 0) -> str:
+        """
+        Queue a job, or complete it immediately from the result cache.
+
+        Args:
+            job_id: Unique job id
+            params: Job parameters (see run_count_job)
+            priority: Higher values are processed first
+
+        Returns:
+            Initial job status
+        """
+        cached = cached_result(params)
+        if cached is not None:
+            logger.info("Job %s served from result cache", job_id)
+            job_store.create_job(job_id, params, status=job_store.COMPLETED, result=cached)
+            return job_store.COMPLETED
+
+        job_store.create_job(job_id, params, priority=priority)
+        self._wakeup.set()
+        return job_store.QUEUED
+
+    def stats(self) -> dict:
+        """Worker pool and queue overview."""
+        alive = [p for p in self._processes if p is not None and p.is_alive()]
+        return {
+            "workers": self.workers,
+            "workers_alive": len(alive),
+            "threads_per_worker": self.threads_per_worker,
+            "jobs": job_store.count_by_status(),
+        }
+
+    def metric_arrays(self) -> List[Sequence[float]]:
+        """Metric values recorded by the workers (see app.services.metrics)."""
+        return list(self._metrics)
+
+    def _spawn(self, index: int) -> None:
+        # Not daemonic: a job may start its own child processes
+        process = self._ctx.Process(
+            target=worker_main,
+            args=(
+                index, self.threads_per_worker, self._cpu_slices[index],
+                self._wakeup, self._stopping, self._metrics[index],
+            ),
+            name=f"job-worker-{index}",
+        )
+        process.start()
+        self._processes[index] = process
+
+    def _monitor_loop(self) -> None:
+        """Replace workers that died, failing the job they were running."""
+        while not self._stopping.wait(self.MONITOR_INTERVAL):
+            for index, process in enumerate(self._processes):
+                if process is None or process.is_alive():
+                    continue
+                failed = job_store.fail_orphaned(
+                    process.pid, f"Worker process exited with code {process.exitcode}"
+                )
+                logger.error(
+                    "Worker %d (pid %d) exited with code %s, %d job(s) failed; restarting",
+                    index, process.pid, process.exitcode, failed,
+                )
+                self._spawn(index)
+
+
+def status_view(job: dict) -> dict:
+    """Public status representation of a job."""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "queue_position": job_store.queue_position(job["id"]),
+        "cancel_requested": job["cancel_requested"],
+        "progress": job["progress"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+        "result_expired": job["expired_at"] is not None,
+    }
+
+
+job_queue = JobQueue(
+    int(os.getenv("VCOUNT_JOB_WORKERS", "2")),
+    int(os.getenv("VCOUNT_WORKER_THREADS", "0")) or None,
+)
@@ -0,0 +1,115 @@
+"""Entry point of job worker processes."""
+import os
+import logging
+import logging.config
+from typing import List
+
+from app.logging.logging_config import LOGGING_CONFIG
+from app.logging.queue_logging import job_log
+from app.services import metrics
+from app.utils import cancellation, job_store
+
+logger = logging.getLogger("app")
+
+# Idle workers re-check the queue at least this often
+POLL_INTERVAL = 0.5
+
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def available_cpus() -> List[int]:
+    """CPU ids this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def partition_cpus(cpus: List[int], workers: int, threads: int) -> List[List[int]]:
+    """
+    Give each worker its own contiguous CPU slice. Pinning is skipped
+    (empty slices) when there are fewer CPUs than workers x threads.
+    """
+    if len(cpus) < workers * threads:
+        return [[] for _ in range(workers)]
+    return [cpus[i * threads:(i + 1) * threads] for i in range(workers)]
+
+
+def apply_thread_budget(threads: int, cpus: List[int]) -> None:
+    """
+    Limit torch/OpenCV/BLAS thread pools and pin the process to cpus,
+    so concurrent workers do not oversubscribe cores.
+    """
+    for name in _THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError:
+            logger.warning("Could not pin worker %d to CPUs %s", os.getpid(), cpus)
+
+    import cv2
+    import torch
+
+    cv2.setNumThreads(threads)
+    torch.set_num_threads(threads)
+
+
+def worker_main(index: int, threads: int, cpus: List[int], wakeup, stopping, metric_values) -> None:
+    """
+    Claim and run jobs from the job store until stopping is set.
+
+    Args:
+        index: Worker number, used in log messages
+        threads: Thread budget for inference and OpenCV
+        cpus: CPU ids to pin this process to (empty to skip pinning)
+        wakeup: multiprocessing.Event set when a job is submitted
+        stopping: multiprocessing.Event set on shutdown
+        metric_values: Shared array this worker records its metrics into
+    """
+    logging.config.dictConfig(LOGGING_CONFIG)
+    metrics.attach(metric_values)
+    apply_thread_budget(threads, cpus)
+
+    # Imported after the thread budget is applied
+    from app.config.model_config import ModelConfig
+    from app.services.count_job import run_count_job
+    from app.services.stream_job import run_stream_job
+    from app.services.model_registry import model_registry
+
+    pid = os.getpid()
+    logger.info("Worker %d (pid %d) started: %d thread(s), CPUs %s", index, pid, threads, cpus or "any")
+
+    if ModelConfig.PRELOAD_MODELS:
+        model_registry.preload(ModelConfig.PRELOAD_MODELS)
+
+    while not stopping.is_set():
+        job = job_store.claim_next(worker_pid=pid)
+        if job is None:
+            if wakeup.wait(POLL_INTERVAL):
+                wakeup.clear()
+            continue
+
+        job_id = job["id"]
+        with job_log(job_id):
+            logger.info("Job %s started on worker %d", job_id, index)
+            try:
+                if job["params"].get("kind") == "stream":
+                    result = run_stream_job(job_id, job["params"])
+                else:
+                    result = run_count_job(job_id, job["params"])
+            except Exception as e:
+                logger.exception("Job %s failed", job_id)
+                job_store.finish_job(job_id, job_store.FAILED, error=str(getattr(e, "detail", e)))
+                metrics.JOBS_FINISHED[job_store.FAILED].inc()
+            else:
+                if result is None:
+                    job_store.finish_job(job_id, job_store.CANCELLED)
+                    metrics.JOBS_FINISHED[job_store.CANCELLED].inc()
+                    logger.warning("Job %s cancelled", job_id)
+                else:
+                    job_store.finish_job(job_id, job_store.COMPLETED, result=result)
+                    metrics.JOBS_FINISHED[job_store.COMPLETED].inc()
+                    logger.info("Job %s completed", job_id)
+            finally:
+                cancellation.forget(job_id)
@@ -0,0 +1,232 @@
+"""
+Prometheus metrics of the API process and the job workers.
+
+Every process records into a flat array of doubles in which each metric
+owns fixed slots. Job workers record into shared memory created by the
+job queue (one array per worker), so the API process reads their values
+directly: /metrics sums its own array with the workers' arrays.
+
+Recording takes no lock. Each slot is written by a single thread (every
+pipeline stage writes its own histogram, one job runs per worker at a
+time), so an update is a plain array increment. Metrics that request
+handlers update from several threads are declared with locked=True.
+"""
+import abc
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Pipeline stages timed per frame (see VideoProcessor.stage_stats)
+STAGES = ("decode", "inference", "counting", "annotation", "encoding")
+
+# Histogram bucket upper bounds
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+LOAD_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9, 1e10)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (name, help, labels, value) of a gauge computed when metrics are scraped
+Gauge = Tuple[str, str, Dict[str, str], float]
+
+_metrics: List["_Metric"] = []
+_size = 0
+
+
+class _Metric(abc.ABC):
+    kind = ''
+
+    def __init__(self, name: str, help: str, labels: Optional[Dict[str, str]], slots: int, locked: bool):
+        global _size
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.offset = _size
+        self.slots = slots
+        self._lock = threading.Lock() if locked else None
+        _size += slots
+        _metrics.append(self)
+
+    @abc.abstractmethod
+    def samples(self, values: Sequence[float]) -> List[str]:
+        """Exposition lines of this metric, read from the summed values of all processes."""
+
+
+class Counter(_Metric):
+    """Monotonic total."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Optional[Dict[str, str]] = None, locked: bool = False):
+        super().__init__(name, help, labels, 1, locked)
+
+    def inc(self, amount: float = 1.0) -> None:
+        if self._lock is None:
+            _values[self.offset] += amount
+        else:
+            with self._lock:
+                _values[self.offset] += amount
+
+    def samples(self, values: Sequence[float]) -> List[str]:
+        return [f"{self.name}{_labels(self.labels)} {_number(values[self.offset])}"]
+
+
+class Histogram(_Metric):
+    """Observation counts per bucket, plus their sum."""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: Sequence[float],
+        labels: Optional[Dict[str, str]] = None,
+        locked: bool = False,
+    ):
+        # One slot per bucket, one for +Inf, one for the sum
+        super().__init__(name, help, labels, len(buckets) + 2, locked)
+        self.buckets = tuple(buckets)
+        self._sum = self.offset + len(buckets) + 1
+
+    def observe(self, value: float, count: int = 1) -> None:
+        """Record count observations of value."""
+        slot = self.offset + bisect.bisect_left(self.buckets, value)
+        if self._lock is None:
+            _values[slot] += count
+            _values[self._sum] += value * count
+        else:
+            with self._lock:
+                _values[slot] += count
+                _values[self._sum] += value * count
+
+    def samples(self, values: Sequence[float]) -> List[str]:
+        lines = []
+        cumulative = 0.0
+        for i, bound in enumerate(self.buckets + (float("inf"),)):
+            cumulative += values[self.offset + i]
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            lines.append(f"{self.name}_bucket{_labels({**self.labels, 'le': le})} {_number(cumulative)}")
+        lines.append(f"{self.name}_sum{_labels(self.labels)} {_number(values[self._sum])}")
+        lines.append(f"{self.name}_count{_labels(self.labels)} {_number(cumulative)}")
+        return lines
+
+
+# Pipeline (job workers and their segment processes)
+FRAMES_PROCESSED = Counter("vcount_frames_processed_total", "Frames counted by the processing pipeline")
+STAGE_SECONDS = {
+    stage: Histogram(
+        "vcount_stage_seconds", "Time a pipeline stage spent on one frame", STAGE_BUCKETS, {"stage": stage},
+    )
+    for stage in STAGES
+}
+JOBS_FINISHED = {
+    status: Counter("vcount_jobs_finished_total", "Jobs finished by the workers", {"status": status})
+    for status in ("completed", "failed", "cancelled")
+}
+RESULT_FILE_BYTES = {
+    kind: Histogram("vcount_result_file_bytes", "Size of files written for job results", SIZE_BUCKETS, {"kind": kind})
+    for kind in ("results", "annotated_video", "detection_trace", "profile", "timeline")
+}
+
+# Model registry (job workers)
+MODEL_LOAD_SECONDS = Histogram(
+    "vcount_model_load_seconds", "Time to load (and export) a model, warm-up included", LOAD_BUCKETS,
+)
+MODEL_CACHE_HITS = Counter("vcount_model_cache_hits_total", "Model requests served by loaded weights")
+
+# API process
+UPLOAD_BYTES = Counter("vcount_upload_bytes_total", "Video bytes received by uploads", locked=True)
+UPLOADS = Counter("vcount_uploads_total", "Completed video uploads", locked=True)
+RESULT_CACHE_HITS = Counter("vcount_result_cache_hits_total", "Jobs answered from the result cache", locked=True)
+RESULT_CACHE_MISSES = Counter("vcount_result_cache_misses_total", "Result cache lookups that missed", locked=True)
+
+# Slots of all metrics above
+SIZE = _size
+
+
+def _new_values() -> List[float]:
+    return [0.0] * SIZE
+
+
+# Array this process records into; see attach
+_values = _new_values()
+
+
+def shared_array(ctx):
+    """Zeroed shared memory for the metrics of one worker process."""
+    return ctx.Array("d", SIZE, lock=False)
+
+
+def attach(values) -> None:
+    """Record into values (e.g. a shared_array handed to a worker) from now on."""
+    global _values
+    _values = values
+
+
+def reset() -> None:
+    """Zero this process's metrics."""
+    for i in range(SIZE):
+        _values[i] = 0.0
+
+
+def snapshot() -> List[float]:
+    """Copy of this process's metric values, for merge in another process."""
+    return list(_values)
+
+
+def merge(values: Sequence[float]) -> None:
+    """Add a snapshot taken in another process (e.g. a segment process) to this one."""
+    for i, value in enumerate(values):
+        if value:
+            _values[i] += value
+
+
+def render(arrays: Iterable[Sequence[float]], gauges: Sequence[Gauge] = ()) -> str:
+    """
+    Prometheus text exposition of the summed metric arrays, followed by gauges.
+
+    Args:
+        arrays: Metric arrays of the processes to report (this process's
+            is not included implicitly)
+        gauges: Values computed at scrape time; gauges of one name must be
+            consecutive
+    """
+    total = _new_values()
+    for values in arrays:
+        for i, value in enumerate(values):
+            total[i] += value
+
+    lines = []
+    described = set()
+    for metric in _metrics:
+        if metric.name not in described:
+            described.add(metric.name)
+            lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+        lines += metric.samples(total)
+
+    for name, help, labels, value in gauges:
+        if name not in described:
+            described.add(name)
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def local_values() -> Sequence[float]:
+    """This process's metric array."""
+    return _values
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() and abs(value) < 1e15 else repr(float(value))
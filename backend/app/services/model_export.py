@@ -0,0 +1,100 @@
+"""Export of YOLO weights to CPU inference formats, cached next to the weights."""
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from pathlib import Path
+
+from ultralytics import YOLO
+
+from app.config.model_config import ModelConfig
+
+logger = logging.getLogger("app")
+
+# ONNX opset of exports; newer opsets are not supported by every ONNX Runtime
+ONNX_OPSET = 17
+
+_export_lock = threading.Lock()
+
+
+def ensure_exported(model_path: str, backend: str) -> str:
+    """
+    Return the export of a .pt model for a backend, exporting it first if it
+    is missing or older than the weights.
+
+    Exports are written to a temporary folder next to the weights and moved
+    into place, so a concurrent export in another process never leaves a
+    partial file behind; the first finished export wins.
+
+    Args:
+        model_path: Path to the .pt weights
+        backend: One of ModelConfig.BACKENDS other than 'torch'
+
+    Returns:
+        Path of the exported model (a file, or a folder for OpenVINO)
+
+    Raises:
+        RuntimeError: If the export fails
+    """
+    target = ModelConfig.export_path(model_path, backend)
+    with _export_lock:
+        if target.exists() and target.stat().st_mtime >= Path(model_path).stat().st_mtime:
+            return str(target)
+
+        logger.info("Exporting %s for %s...", model_path, backend)
+        start = time.perf_counter()
+        workdir = Path(tempfile.mkdtemp(prefix=".export-", dir=target.parent))
+        try:
+            weights = workdir / Path(model_path).name
+            shutil.copy2(model_path, weights)
+            exported = _export(weights, backend)
+            _replace(exported, target)
+        except Exception as e:
+            raise RuntimeError(f"Export of {model_path} for {backend} failed: {e}") from e
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        logger.info("Exported %s in %.1fs", target, time.perf_counter() - start)
+        return str(target)
+
+
+def _export(weights: Path, backend: str) -> Path:
+    """Export weights in place (in their temporary folder); returns the export."""
+    model = YOLO(str(weights))
+    imgsz = ModelConfig.EXPORT_IMGSZ
+    # Dynamic input shapes keep batching and ROI crops working
+    if backend == 'openvino':
+        return Path(model.export(format='openvino', imgsz=imgsz, dynamic=True, device='cpu', verbose=False))
+
+    onnx_path = Path(model.export(
+        format='onnx', imgsz=imgsz, dynamic=True, simplify=False, opset=ONNX_OPSET,
+        device='cpu', verbose=False,
+    ))
+    if backend == 'onnx':
+        return onnx_path
+
+    # Weights quantized to 8 bits, activations at run time; no calibration
+    # data needed. Model metadata (class names, stride) is kept.
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized = onnx_path.with_suffix('.int8.onnx')
+    quantize_dynamic(str(onnx_path), str(quantized), weight_type=QuantType.QUInt8)
+    return quantized
+
+
+def _replace(exported: Path, target: Path) -> None:
+    """Move a finished export into place, replacing a stale one."""
+    if exported.is_dir():
+        stale = target.with_name(f"{target.name}.stale-{os.getpid()}")
+        if target.exists():
+            os.replace(target, stale)
+        try:
+            os.replace(exported, target)
+        except OSError:
+            # Another process put a fresh export there first
+            logger.info("Keeping concurrent export %s", target)
+        shutil.rmtree(stale, ignore_errors=True)
+    else:
+        os.replace(exported, target)
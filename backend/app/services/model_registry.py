@@ -0,0 +1,216 @@
+"""Process-wide registry of loaded YOLO weights."""
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from ultralytics import YOLO
+
+from app.config.model_config import ModelConfig
+from app.services import metrics
+from app.services.model_export import ensure_exported
+
+logger = logging.getLogger("app")
+
+
+class _LoadedModel:
+    """Shared weights plus bookkeeping for one registry entry."""
+
+    def __init__(
+        self, name: str, backend: str, path: str, model: YOLO, size_bytes: int, load_seconds: float
+    ):
+        self.name = name
+        self.backend = backend
+        self.path = path
+        self.model = model
+        self.size_bytes = size_bytes
+        self.load_seconds = load_seconds
+        self.hits = 0
+
+
+class ModelRegistry:
+    """
+    Keeps loaded YOLO weights across requests, keyed by ``ModelConfig.MODELS`` names
+    and inference backend.
+
+    Weights are loaded and warmed once, then shared. Each job receives its own
+    ``YOLO`` view via :meth:`acquire`, so ByteTrack state (which ultralytics keeps
+    on the predictor) never leaks between concurrent jobs. Least-recently-used
+    models are evicted when the estimated size exceeds the memory budget.
+
+    Exported backends (ONNX Runtime, OpenVINO) still create an inference
+    session per job, when the job's predictor is set up; the registry makes
+    sure the export exists and loads before the first job uses it.
+    """
+
+    def __init__(self, memory_budget_mb: int, device: Optional[str] = None):
+        """
+        Args:
+            memory_budget_mb: Upper bound for the summed size of cached weights
+            device: Device used for warm-up, detected automatically if omitted
+        """
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self.device = device
+        self._models: "OrderedDict[str, _LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def acquire(self, model_name: str, backend: str = 'torch') -> YOLO:
+        """
+        Return a per-job model that shares the cached weights.
+
+        Args:
+            model_name: Key from ``ModelConfig.MODELS``
+            backend: One of ``ModelConfig.BACKENDS``
+
+        Returns:
+            YOLO: Model with its own predictor and tracker state
+        """
+        return self._job_view(self.get(model_name, backend))
+
+    def get(self, model_name: str, backend: str = 'torch') -> YOLO:
+        """Return the shared model, loading (and exporting) it on a cache miss."""
+        key = self._key(model_name, backend)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                entry.hits += 1
+                metrics.MODEL_CACHE_HITS.inc()
+                return entry.model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    entry.hits += 1
+                    metrics.MODEL_CACHE_HITS.inc()
+                    return entry.model
+
+            entry = self._load(model_name, backend)
+
+            with self._lock:
+                self._models[key] = entry
+                self._evict_over_budget(keep=key)
+            return entry.model
+
+    def preload(self, model_names: List[str]) -> None:
+        """
+        Load and warm the given models, skipping ones that fail. A name may
+        carry a backend, e.g. ``yolo11s:openvino``.
+        """
+        for model_name in model_names:
+            name, _, backend = model_name.partition(":")
+            try:
+                self.get(name, backend or 'torch')
+            except Exception:
+                logger.exception("Failed to preload model %s", model_name)
+
+    def evict(self, model_name: str, backend: str = 'torch') -> bool:
+        """Drop a model from the registry. Jobs already holding it keep working."""
+        with self._lock:
+            entry = self._models.pop(self._key(model_name, backend), None)
+        if entry is not None:
+            logger.info("Evicted model %s (%.1f MB)", model_name, entry.size_bytes / 1e6)
+        return entry is not None
+
+    def stats(self) -> List[dict]:
+        """Return a snapshot of cached models in LRU order (oldest first)."""
+        with self._lock:
+            return [
+                {
+                    "name": entry.name,
+                    "backend": entry.backend,
+                    "path": entry.path,
+                    "size_mb": round(entry.size_bytes / 1e6, 1),
+                    "load_seconds": round(entry.load_seconds, 3),
+                    "hits": entry.hits,
+                }
+                for entry in self._models.values()
+            ]
+
+    def _load(self, model_name: str, backend: str) -> _LoadedModel:
+        """Load weights (exporting them if needed) and run one warm-up inference."""
+        if backend not in ModelConfig.BACKENDS or backend == 'scripted':
+            raise ValueError(f"No model to load for backend: {backend}")
+        model_path = ModelConfig.resolve_model_path(model_name)
+
+        start = time.perf_counter()
+        if backend == 'torch':
+            model = YOLO(model_path)
+        else:
+            model_path = ensure_exported(model_path, backend)
+            model = YOLO(model_path, task='detect')
+        self._warm_up(model, backend)
+        load_seconds = time.perf_counter() - start
+        metrics.MODEL_LOAD_SECONDS.observe(load_seconds)
+
+        size_bytes = self._estimate_size(model, model_path)
+        logger.info(
+            "Model %s (%s) loaded in %.2fs (%.1f MB)",
+            model_name, backend, load_seconds, size_bytes / 1e6,
+        )
+        return _LoadedModel(model_name, backend, model_path, model, size_bytes, load_seconds)
+
+    def _warm_up(self, model: YOLO, backend: str) -> None:
+        """
+        Run a dummy prediction so layer fusion and device transfer happen once,
+        before the weights are shared between jobs.
+        """
+        device = 'cpu' if backend != 'torch' else self.device or ModelConfig.detect_device()
+        imgsz = ModelConfig.WARMUP_IMGSZ
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        model.predict(dummy, imgsz=imgsz, device=device, verbose=False)
+
+    def _evict_over_budget(self, keep: str) -> None:
+        """Evict least-recently-used models until the budget is met. Caller holds the lock."""
+        total = sum(entry.size_bytes for entry in self._models.values())
+        for name in list(self._models):
+            if total <= self.memory_budget_bytes:
+                break
+            if name == keep:
+                continue
+            entry = self._models.pop(name)
+            total -= entry.size_bytes
+            logger.info("Evicted model %s to stay within memory budget", name)
+
+    @staticmethod
+    def _key(model_name: str, backend: str) -> str:
+        return model_name if backend == 'torch' else f"{model_name}:{backend}"
+
+    @staticmethod
+    def _estimate_size(model: YOLO, model_path: str) -> int:
+        """Estimate resident size from parameters and buffers, falling back to file size."""
+        try:
+            module = model.model
+            tensors = list(module.parameters()) + list(module.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            path = Path(model_path)
+            if path.is_dir():
+                return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+            return path.stat().st_size
+
+    @staticmethod
+    def _job_view(model: YOLO) -> YOLO:
+        """
+        Shallow-copy a model so the network is shared but the predictor is not.
+
+        ultralytics stores trackers on ``model.predictor`` and registers tracking
+        callbacks on ``model.callbacks``; both must be private to each job.
+        """
+        view = copy.copy(model)
+        view.predictor = None
+        view.overrides = dict(model.overrides)
+        view.callbacks = {event: list(funcs) for event, funcs in model.callbacks.items()}
+        return view
+
+
+model_registry = ModelRegistry(ModelConfig.CACHE_BUDGET_MB)
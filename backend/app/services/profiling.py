@@ -0,0 +1,190 @@
+"""
+Opt-in job profiling: sampled call stacks and a per-frame stage timeline.
+
+A profiled job writes two files next to its results:
+
+- ``profile_*.folded``: wall-clock call stacks of every thread, sampled at a
+  fixed interval, in the collapsed format read by flamegraph.pl, speedscope
+  and most flamegraph viewers (one ``frame;frame;frame count`` per line).
+  Waiting threads are sampled too, so time lost to backpressure shows up.
+- ``timeline_*.json``: what each pipeline stage did for each frame, in the
+  Chrome trace event format (open in Perfetto, chrome://tracing or
+  speedscope); one track per stage, one process per segment.
+
+Nothing is recorded unless a job asks for it: VideoProcessor only checks
+whether it was given a timeline.
+"""
+import os
+import sys
+import json
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from app.services.metrics import STAGES
+
+# Seconds between stack samples (100 Hz)
+SAMPLE_INTERVAL = 0.01
+
+
+class StackSampler:
+    """
+    Samples the Python call stacks of all threads of this process from a
+    background thread, so the profiled code runs unmodified.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, prefix: str = ""):
+        """
+        Args:
+            interval: Seconds between samples
+            prefix: Root frame of every stack (e.g. the segment), empty for none
+        """
+        self.interval = interval
+        self.prefix = prefix
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names: Dict[int, str] = {}
+        labels: Dict[object, str] = {}
+
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                    names.setdefault(ident, f"thread-{ident}")
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = (
+                            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                        ).replace(";", ":")
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names[ident].replace(";", ":"))
+                if self.prefix:
+                    stack.append(self.prefix)
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+class FrameTimeline:
+    """
+    Per-frame work of the pipeline stages, as (stage, first frame, frames,
+    start, end) spans on the time.perf_counter clock.
+
+    Every stage appends from its own thread; list appends are atomic, so no
+    lock is needed.
+    """
+
+    def __init__(self):
+        self.spans: List[Tuple[str, int, int, float, float]] = []
+
+    def add(self, stage: str, frame_idx: int, start: float, end: float, frames: int = 1) -> None:
+        """Record that stage worked on frames frame_idx.. (frames of them) from start to end."""
+        self.spans.append((stage, frame_idx, frames, start, end))
+
+
+class JobProfiler:
+    """Stack sampler and frame timeline of one job (or one segment of it)."""
+
+    def __init__(self, segment: int = 0):
+        """
+        Args:
+            segment: 1-based segment number of a segment process, 0 for the job itself
+        """
+        self.segment = segment
+        self.sampler = StackSampler(prefix=f"segment {segment}" if segment else "")
+        self.timeline = FrameTimeline()
+        # Spans of segment processes, by segment number
+        self._segment_spans: Dict[int, list] = {}
+
+    def start(self) -> None:
+        self.sampler.start()
+
+    def stop(self) -> None:
+        self.sampler.stop()
+
+    def export(self) -> dict:
+        """Recorded data, to merge into the job's profiler in another process."""
+        return {
+            "segment": self.segment,
+            "stacks": dict(self.sampler.stacks),
+            "spans": self.timeline.spans,
+        }
+
+    def merge(self, data: dict) -> None:
+        """Add the export of a segment process."""
+        self.sampler.stacks.update(data["stacks"])
+        self._segment_spans[data["segment"]] = data["spans"]
+
+    def save(self, folder: Path) -> dict:
+        """
+        Write the stacks and the timeline to folder.
+
+        Returns:
+            Profile metadata; "stacks" and "timeline" are the filenames
+        """
+        suffix = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid4().hex[:8]}"
+        stacks_filename = f"profile_{suffix}.folded"
+        timeline_filename = f"timeline_{suffix}.json"
+
+        with open(folder / stacks_filename, "w") as f:
+            for stack, count in self.sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(folder / timeline_filename, "w") as f:
+            json.dump({"traceEvents": self._trace_events(), "displayTimeUnit": "ms"}, f)
+
+        return {
+            "stacks": stacks_filename,
+            "timeline": timeline_filename,
+            "sample_interval_ms": self.sampler.interval * 1000,
+            "stacks_sampled": sum(self.sampler.stacks.values()),
+        }
+
+    def _trace_events(self) -> List[dict]:
+        """Chrome trace events: one process per segment, one thread per stage."""
+        spans_by_pid = {self.segment: self.timeline.spans, **self._segment_spans}
+        starts = [span[3] for spans in spans_by_pid.values() for span in spans]
+        origin = min(starts) if starts else 0.0
+        tids = {stage: i for i, stage in enumerate(STAGES)}
+
+        events = []
+        for pid, spans in sorted(spans_by_pid.items()):
+            if not spans:
+                continue
+            events.append({
+                "name": "process_name", "ph": "M", "pid": pid,
+                "args": {"name": f"segment {pid}" if pid else "job"},
+            })
+            events += [
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": stage}}
+                for stage, tid in tids.items()
+            ]
+            for stage, frame_idx, frames, start, end in spans:
+                args = {"frame": frame_idx} if frames == 1 else {"first_frame": frame_idx, "frames": frames}
+                events.append({
+                    "name": stage, "ph": "X", "pid": pid, "tid": tids[stage],
+                    "ts": round((start - origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+                    "args": args,
+                })
+        return events
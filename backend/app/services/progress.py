@@ -0,0 +1,182 @@
+"""Live job progress: publishing from workers and fan-out to API subscribers."""
+import time
+import asyncio
+import logging
+import threading
+from typing import AsyncIterator, Dict, Optional, Set
+
+from app.utils import job_store
+
+logger = logging.getLogger("app")
+
+# Minimum seconds between two published progress snapshots
+PUBLISH_INTERVAL = 0.5
+
+
+class ProgressReporter:
+    """
+    Publishes the progress of a running job to the job store.
+
+    The processing loop only records the latest frame index and counts
+    snapshot (an attribute assignment); a background thread turns that into a
+    progress snapshot and writes it at most every PUBLISH_INTERVAL seconds, so
+    reporting never blocks a frame on the database.
+    """
+
+    def __init__(self, job_id: str, total_frames: int, interval: float = PUBLISH_INTERVAL):
+        """
+        Args:
+            job_id: Job whose progress is published
+            total_frames: Frame count reported by the container (0 if unknown)
+            interval: Seconds between snapshots
+        """
+        self.job_id = job_id
+        self.total_frames = max(0, int(total_frames))
+        self.interval = interval
+
+        self._latest = (0, None)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_time = 0.0
+        self._last_time = 0.0
+        self._last_frames = 0
+
+    def start(self) -> None:
+        self._start_time = self._last_time = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name=f"progress-{self.job_id}", daemon=True
+        )
+        self._thread.start()
+
+    def update(self, frames_processed: int, counts: Dict[str, Dict[str, int]]) -> None:
+        """Record the latest state; called once per frame by the counting stage."""
+        self._latest = (frames_processed, counts)
+
+    def stop(self) -> None:
+        """Stop the publisher and write a final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._publish(final=True)
+
+    def snapshot(self, final: bool = False) -> dict:
+        """
+        Progress snapshot from the latest recorded state. fps is measured
+        since the previous snapshot, or over the whole run when final.
+        """
+        frames, counts = self._latest
+        now = time.perf_counter()
+
+        if final:
+            self._last_time, self._last_frames = self._start_time, 0
+        elapsed = now - self._last_time
+        fps = (frames - self._last_frames) / elapsed if elapsed > 0 else 0.0
+        self._last_time, self._last_frames = now, frames
+
+        remaining = self.total_frames - frames if self.total_frames else None
+        eta = remaining / fps if remaining is not None and fps > 0 else None
+
+        return {
+            "frames_processed": frames,
+            "total_frames": self.total_frames or None,
+            "percent": round(100.0 * frames / self.total_frames, 1) if self.total_frames else None,
+            "fps": round(fps, 2),
+            "elapsed_seconds": round(now - self._start_time, 2),
+            "eta_seconds": round(max(0.0, eta), 1) if eta is not None else None,
+            "counts": counts or {},
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._publish()
+
+    def _publish(self, final: bool = False) -> None:
+        try:
+            job_store.set_progress(self.job_id, self.snapshot(final))
+        except Exception:
+            logger.exception("Could not publish progress of job %s", self.job_id)
+
+
+class ProgressHub:
+    """
+    Fans job progress out to any number of subscribers in the API process.
+
+    Each job with at least one subscriber has a single poller reading the job
+    store every PUBLISH_INTERVAL seconds, however many clients are listening.
+    Subscribers get only changed snapshots and, if they read slower than
+    updates arrive, only the newest one. A subscriber joining a running
+    poller starts with the last event it published.
+    """
+
+    def __init__(self, interval: float = PUBLISH_INTERVAL):
+        self.interval = interval
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        # Last event published per polled job
+        self._latest: Dict[str, dict] = {}
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[dict]:
+        """
+        Yield progress events of a job until it finishes.
+
+        Each event has status, progress and error keys (see job_store.get_progress).
+        The iteration also ends if the job disappears from the store or its
+        progress can no longer be read.
+        """
+        inbox: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(job_id, set()).add(inbox)
+        if job_id in self._pollers:
+            if job_id in self._latest:
+                inbox.put_nowait(self._latest[job_id])
+        else:
+            self._pollers[job_id] = asyncio.create_task(self._poll(job_id))
+        try:
+            while True:
+                event = await inbox.get()
+                if event is None:
+                    return
+                yield event
+                if event["status"] in job_store.FINISHED_STATUSES:
+                    return
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(inbox)
+                if not subscribers:
+                    del self._subscribers[job_id]
+                    poller = self._pollers.pop(job_id, None)
+                    if poller is not None:
+                        poller.cancel()
+
+    async def _poll(self, job_id: str) -> None:
+        last = None
+        try:
+            while self._subscribers.get(job_id):
+                try:
+                    event = await asyncio.to_thread(job_store.get_progress, job_id)
+                except Exception:
+                    logger.exception("Could not read progress of job %s", job_id)
+                    event = None
+                if event is None:
+                    # Job gone: end the subscriptions instead of leaving them waiting
+                    self._publish(job_id, None)
+                    break
+                if event != last:
+                    self._publish(job_id, event)
+                    self._latest[job_id] = last = event
+                if event["status"] in job_store.FINISHED_STATUSES:
+                    break
+                await asyncio.sleep(self.interval)
+        finally:
+            if self._pollers.get(job_id) is asyncio.current_task():
+                del self._pollers[job_id]
+                self._latest.pop(job_id, None)
+
+    def _publish(self, job_id: str, event: Optional[dict]) -> None:
+        for inbox in self._subscribers.get(job_id, ()):
+            if inbox.full():
+                inbox.get_nowait()
+            inbox.put_nowait(event)
+
+
+progress_hub = ProgressHub()
@@ -0,0 +1,196 @@
+"""Content-addressed cache of finished counting results."""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+logger = logging.getLogger("app")
+
+
+class ResultCache:
+    """
+    Maps a job fingerprint to the results JSON and annotated video it produced.
+
+    The fingerprint covers the video content hash, the normalized directions,
+    the model name and every setting that affects tracking. Entries are kept
+    in an SQLite index next to the results, shared by the API and worker
+    processes, and evicted least-recently-used first (deleting their files)
+    once their total size exceeds the budget. Files are deleted only after
+    the index change is committed, and on_delete is told about them first,
+    so jobs pointing to them can be marked as expired.
+    """
+
+    MAX_BYTES = int(os.getenv("VCOUNT_RESULT_CACHE_MB", "5120")) * 1024 * 1024
+
+    def __init__(
+        self,
+        results_folder: Path,
+        max_bytes: int = MAX_BYTES,
+        on_delete: Optional[Callable[[List[str]], object]] = None,
+    ):
+        """
+        Args:
+            results_folder: Folder holding result JSON and annotated videos
+            max_bytes: Size budget for all cached files
+            on_delete: Called with the filenames about to be deleted
+        """
+        self.results_folder = results_folder
+        self.max_bytes = max_bytes
+        self.on_delete = on_delete
+        self.index_path = results_folder / "cache_index.db"
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, result_file TEXT NOT NULL, files TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def make_key(
+        video_id: str,
+        directions: List[dict],
+        model_name: str,
+        settings: dict,
+    ) -> str:
+        """
+        Build a cache key.
+
+        Args:
+            video_id: SHA-256 of the video content
+            directions: Direction payload from the client
+            model_name: Model identifier
+            settings: Tracker and processing settings that affect the output
+        """
+        normalized = sorted(
+            (
+                {
+                    **d,
+                    "lines": sorted(
+                        (
+                            {k: round(v, 6) if isinstance(v, float) else v for k, v in line.items()}
+                            for line in d.get("lines", [])
+                        ),
+                        key=lambda line: json.dumps(line, sort_keys=True),
+                    ),
+                }
+                for d in directions
+            ),
+            key=lambda d: str(d.get("id")),
+        )
+        payload = json.dumps(
+            {
+                "video": video_id,
+                "directions": normalized,
+                "model": model_name,
+                "settings": settings,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached results JSON, or None on a miss."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            paths = [self.results_folder / name for name in json.loads(row["files"])]
+            if not all(path.exists() for path in paths):
+                logger.info("Result cache entry %s lost its files, dropping it", key[:12])
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+
+            conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+
+        with open(self.results_folder / row["result_file"]) as f:
+            return json.load(f)
+
+    def put(self, key: str, result_file: str, extra_files: List[str]) -> None:
+        """
+        Register finished outputs under a key and enforce the size budget.
+        Files of an entry already under the key are deleted unless they are
+        reused by the new one.
+
+        Args:
+            key: Key from make_key
+            result_file: Results JSON filename inside the results folder
+            extra_files: Other output filenames (e.g. the annotated video)
+        """
+        files = [result_file] + [name for name in extra_files if name]
+        size = sum(
+            (self.results_folder / name).stat().st_size
+            for name in files
+            if (self.results_folder / name).exists()
+        )
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A job that ran again under an existing key (e.g. two identical
+                # jobs queued before either finished) replaces its entry; the
+                # replaced files would otherwise be orphaned.
+                old = conn.execute("SELECT files FROM entries WHERE key = ?", (key,)).fetchone()
+                stale = sorted(set(json.loads(old["files"])) - set(files)) if old is not None else []
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, result_file, files, size, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, result_file, json.dumps(files), size, time.time()),
+                )
+                stale += self._evict(conn, keep=key)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self._delete(stale)
+
+    def _delete(self, names: List[str]) -> None:
+        """Delete files dropped from the index, after telling on_delete."""
+        if not names:
+            return
+        if self.on_delete is not None:
+            try:
+                self.on_delete(names)
+            except Exception:
+                logger.exception("Could not mark jobs using %d evicted result files", len(names))
+        for name in names:
+            (self.results_folder / name).unlink(missing_ok=True)
+
+    def _evict(self, conn: sqlite3.Connection, keep: str) -> List[str]:
+        """
+        Drop least-recently-used entries over budget, inside the caller's transaction.
+
+        Returns:
+            Filenames of the dropped entries, to delete once committed
+        """
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+
+        evicted = []
+        for row in conn.execute("SELECT * FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            if row["key"] == keep:
+                continue
+            evicted += json.loads(row["files"])
+            total -= row["size"]
+            conn.execute("DELETE FROM entries WHERE key = ?", (row["key"],))
+            logger.info("Evicted cached result %s (%.1f MB)", row["key"][:12], row["size"] / 1e6)
+        return evicted
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
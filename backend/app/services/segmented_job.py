@@ -0,0 +1,444 @@
+"""Parallel processing of one long video in overlapping segments."""
+import time
+import shutil
+import logging
+import logging.config
+import multiprocessing
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.logging.logging_config import LOGGING_CONFIG
+from app.logging.queue_logging import job_log
+from app.services.detection_trace import COLUMNS, DetectionTrace, DetectionTraceWriter
+from app.services import metrics
+from app.services.job_worker import apply_thread_budget, available_cpus, partition_cpus
+from app.utils import cancellation
+
+logger = logging.getLogger("app")
+
+# Seconds before each segment boundary that the next segment tracks as
+# warm-up, so its tracks are established and can be matched at the boundary
+OVERLAP_SECONDS = 3.0
+# Segments are never shorter than this many overlaps
+MIN_SEGMENT_OVERLAPS = 4
+# Minimum IoU for two boxes in the overlap to be the same vehicle
+MATCH_IOU = 0.5
+# How often the parent publishes combined progress
+POLL_INTERVAL = 0.5
+
+# (start, core_start, end): frames [start, core_start) are warm-up, counted
+# by the previous segment; end is exclusive, None for the end of the video
+Segment = Tuple[int, int, Optional[int]]
+
+# Core frames processed per segment, shared with the parent process
+_frames_done = None
+
+
+def plan_segments(total_frames: int, segments: int, fps: float) -> List[Segment]:
+    """
+    Split a video into up to `segments` contiguous segments, each starting
+    OVERLAP_SECONDS early. Short videos get fewer segments.
+
+    Args:
+        total_frames: Frame count of the video (0 if unknown)
+        segments: Requested number of segments
+        fps: Source frame rate
+
+    Returns:
+        (start, core_start, end) per segment; a single segment when the
+        video is too short or its length is unknown
+    """
+    overlap = max(1, round(OVERLAP_SECONDS * fps))
+    count = max(1, min(segments, total_frames // (overlap * MIN_SEGMENT_OVERLAPS)))
+    bounds = [round(i * total_frames / count) for i in range(count + 1)]
+    return [
+        (
+            max(0, bounds[i] - overlap) if i else 0,
+            bounds[i],
+            bounds[i + 1] if i < count - 1 else None,
+        )
+        for i in range(count)
+    ]
+
+
+def run_segments(
+    job_id: str,
+    params: dict,
+    plan: List[Segment],
+    video_info: Tuple[int, int, float],
+    writer: DetectionTraceWriter,
+    progress=None,
+    profiler=None,
+) -> Optional[Dict]:
+    """
+    Track every segment in its own process, then stitch the segment traces
+    into one detection trace with globally consistent track ids.
+
+    Each process gets an even share of this process's CPUs. Counting is left
+    to the caller, which replays the stitched trace through one
+    VehicleCounter, so vehicles crossing a segment boundary are counted once.
+
+    Args:
+        job_id: Job id, used for cancellation checks
+        params: Job parameters (see run_count_job)
+        plan: Segments from plan_segments
+        video_info: (frame_w, frame_h, fps) of the decoded video
+        writer: Receives the stitched detections; not closed here
+        progress: Optional ProgressReporter for the combined progress
+        profiler: Optional JobProfiler of the job; segments are profiled too
+            and their stacks and timelines merged into it
+
+    Returns:
+        Segment statistics, or None if the job was cancelled
+    """
+    ctx = multiprocessing.get_context("spawn")
+    cpus = available_cpus()
+    threads = max(1, len(cpus) // len(plan))
+    cpu_slices = partition_cpus(cpus, len(plan), threads)
+    frames_done = ctx.Array("q", len(plan), lock=False)
+    paths = [writer.path.with_suffix(f".seg{i}.vct") for i in range(len(plan))]
+
+    logger.info(
+        "Job %s split into %d segments, %d thread(s) each: %s",
+        job_id, len(plan), threads, plan,
+    )
+    start = time.perf_counter()
+    try:
+        pool = ctx.Pool(len(plan), initializer=_init_segment_worker, initargs=(frames_done,))
+        try:
+            pending = [
+                pool.apply_async(
+                    _process_segment,
+                    (job_id, params, i, segment, video_info, str(path), threads, cpu_slices[i]),
+                )
+                for i, (segment, path) in enumerate(zip(plan, paths))
+            ]
+            while not all(r.ready() for r in pending):
+                time.sleep(POLL_INTERVAL)
+                if progress is not None:
+                    progress.update(sum(frames_done), None)
+                for r in pending:
+                    if r.ready() and not r.successful():
+                        r.get()  # re-raise and stop the other segments
+            segment_stats = [r.get() for r in pending]
+            # Segment processes are short-lived: add their metrics to this worker's
+            for stats in segment_stats:
+                if stats is not None:
+                    metrics.merge(stats.pop("metrics"))
+                    profile = stats.pop("profile")
+                    if profiler is not None and profile is not None:
+                        profiler.merge(profile)
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.close()
+            pool.join()
+        parallel_seconds = time.perf_counter() - start
+
+        if cancellation.is_cancelled(job_id) or None in segment_stats:
+            return None
+
+        stitch_start = time.perf_counter()
+        stitched = stitch_segments(paths, plan, writer)
+        stitch_seconds = time.perf_counter() - stitch_start
+    finally:
+        for path in paths:
+            path.unlink(missing_ok=True)
+            shutil.rmtree(path.with_suffix(".parts"), ignore_errors=True)
+
+    logger.info(
+        "Job %s: %d segments tracked in %.2fs, %d track(s) stitched in %.2fs",
+        job_id, len(plan), parallel_seconds, stitched, stitch_seconds,
+    )
+    return {
+        "count": len(plan),
+        "overlap_frames": plan[1][1] - plan[1][0] if len(plan) > 1 else 0,
+        "threads_per_segment": threads,
+        "tracks_stitched": stitched,
+        "parallel_seconds": round(parallel_seconds, 2),
+        "stitch_seconds": round(stitch_seconds, 2),
+        "per_segment": segment_stats,
+    }
+
+
+def throughput_stats(segment_stats: Dict, batch_size: int, backend: str) -> Dict:
+    """Combined inference throughput of all segments, per process."""
+    seconds = sum(s["inference_seconds"] for s in segment_stats["per_segment"])
+    frames = sum(s["frames_tracked"] for s in segment_stats["per_segment"])
+    return {
+        "backend": backend,
+        "batch_size": batch_size,
+        "inference_seconds": round(seconds, 2),
+        "inference_fps": round(frames / seconds, 2) if seconds > 0 else 0.0,
+        "baseline_fps": None,
+        "fps_gain": None,
+    }
+
+
+def stage_stats(segment_stats: Dict) -> Dict:
+    """Pipeline stage times of all segments (see VideoProcessor.stage_stats)."""
+    per_segment = segment_stats["per_segment"]
+    frames = sum(s["frames_processed"] for s in per_segment)
+    seconds = {
+        name: round(sum(s["stage_seconds"][name] for s in per_segment), 4)
+        for name in per_segment[0]["stage_seconds"]
+    }
+    return {
+        "frames_decoded": sum(s["frames_decoded"] for s in per_segment),
+        "frames_processed": frames,
+        "frames_rendered": 0,
+        "seconds": seconds,
+        "ms_per_frame": {
+            name: round(1000 * t / frames, 4) if frames else None for name, t in seconds.items()
+        },
+    }
+
+
+def motion_gate_stats(segment_stats: Dict) -> Optional[Dict]:
+    """Motion gate skips of all segments (see MotionGate.stats), None without a gate."""
+    # Imported here: segment processes import this module before applying
+    # their thread budget, and motion_gate imports OpenCV
+    from app.services.motion_gate import MotionGate
+
+    per_segment = segment_stats["per_segment"]
+    if per_segment[0]["motion_gate"] is None:
+        return None
+    combined = MotionGate()
+    combined.frames_checked = sum(s["motion_gate"]["frames_checked"] for s in per_segment)
+    combined.frames_skipped = sum(s["motion_gate"]["frames_skipped"] for s in per_segment)
+    combined.gate_seconds = sum(s["motion_gate"]["gate_seconds"] for s in per_segment)
+    frames = sum(s["frames_tracked"] for s in per_segment)
+    seconds = sum(s["inference_seconds"] for s in per_segment)
+    return combined.stats(seconds / frames if frames else None)
+
+
+def stride_stats(segment_stats: Dict) -> Optional[Dict]:
+    """Strides used by all segments (see StrideController.stats), None without adaptive stride."""
+    per_segment = segment_stats["per_segment"]
+    if per_segment[0]["adaptive_stride"] is None:
+        return None
+    histogram: Dict[str, int] = {}
+    for s in per_segment:
+        for stride, n in s["adaptive_stride"]["stride_histogram"].items():
+            histogram[stride] = histogram.get(stride, 0) + n
+    steps = sum(histogram.values())
+    mean = sum(int(stride) * n for stride, n in histogram.items()) / steps if steps else 1.0
+    return {
+        "max_stride": per_segment[0]["adaptive_stride"]["max_stride"],
+        "mean_stride": round(mean, 2),
+        "stride_histogram": dict(sorted(histogram.items(), key=lambda item: int(item[0]))),
+    }
+
+
+def stitch_segments(paths: List[Path], plan: List[Segment], writer: DetectionTraceWriter) -> int:
+    """
+    Merge segment traces into one, in frame order.
+
+    Each segment contributes its frames from core_start on; its warm-up
+    frames are only used to match its tracks to those of the previous
+    segment, by box overlap. Matched tracks keep the previous segment's
+    global id, all others get a new one.
+
+    Returns:
+        Number of tracks continued across a segment boundary
+    """
+    next_id = 1
+    stitched = 0
+    previous = None  # (columns, segment track id -> global id)
+
+    for path, (start, core_start, _) in zip(paths, plan):
+        columns = {name: np.asarray(values) for name, values in DetectionTrace(path).columns.items()}
+        matches = _match_tracks(previous[0], columns, start, core_start) if previous else {}
+
+        unique, inverse = np.unique(columns["track_id"], return_inverse=True)
+        ids = {}
+        for track_id in unique.tolist():
+            if track_id in matches:
+                ids[track_id] = previous[1][matches[track_id]]
+                stitched += 1
+            else:
+                ids[track_id] = next_id
+                next_id += 1
+        global_ids = np.array([ids[t] for t in unique.tolist()], dtype=np.int64)[inverse]
+
+        keep = columns["frame_idx"] >= core_start
+        detections = {
+            name: columns[name][keep] for name in COLUMNS if name not in ("frames", "track_id")
+        }
+        detections["track_id"] = global_ids[keep]
+        writer.add_columns(columns["frames"][columns["frames"] >= core_start], detections)
+        previous = (columns, ids)
+
+    return stitched
+
+
+def _match_tracks(previous: Dict, current: Dict, start: int, end: int) -> Dict[int, int]:
+    """
+    Match tracks of two segments over the frames both tracked, [start, end).
+
+    Every pair of boxes with IoU >= MATCH_IOU in a common frame is a vote;
+    pairs are then assigned one-to-one, most votes (then total IoU) first.
+
+    Returns:
+        Current segment track id -> previous segment track id
+    """
+    common = np.intersect1d(
+        previous["frames"][(previous["frames"] >= start) & (previous["frames"] < end)],
+        current["frames"][(current["frames"] >= start) & (current["frames"] < end)],
+    )
+    votes: Dict[Tuple[int, int], Tuple[int, float]] = {}
+
+    for frame_idx in common.tolist():
+        a = slice(*np.searchsorted(previous["frame_idx"], [frame_idx, frame_idx + 1]))
+        b = slice(*np.searchsorted(current["frame_idx"], [frame_idx, frame_idx + 1]))
+        if a.start == a.stop or b.start == b.stop:
+            continue
+        iou = _iou(previous["bbox"][a], current["bbox"][b])
+        for i, j in zip(*np.nonzero(iou >= MATCH_IOU)):
+            key = (int(current["track_id"][b][j]), int(previous["track_id"][a][i]))
+            n, total = votes.get(key, (0, 0.0))
+            votes[key] = (n + 1, total + float(iou[i, j]))
+
+    matches: Dict[int, int] = {}
+    taken = set()
+    for (current_id, previous_id), _ in sorted(votes.items(), key=lambda kv: kv[1], reverse=True):
+        if current_id in matches or previous_id in taken:
+            continue
+        matches[current_id] = previous_id
+        taken.add(previous_id)
+    return matches
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes, shape (N, M)."""
+    a = a.astype(np.float64)[:, None, :]
+    b = b.astype(np.float64)[None, :, :]
+    w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = w * h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.where(union > 0, inter / np.where(union > 0, union, 1), 0.0)
+
+
+class _SegmentProgress:
+    """Stands in for a ProgressReporter inside a segment process."""
+
+    def __init__(self, index: int, core_start: int):
+        self.index = index
+        self.core_start = core_start
+
+    def update(self, frames_processed: int, counts) -> None:
+        _frames_done[self.index] = max(0, frames_processed - self.core_start)
+
+
+def _init_segment_worker(frames_done) -> None:
+    global _frames_done
+    _frames_done = frames_done
+    logging.config.dictConfig(LOGGING_CONFIG)
+
+
+def _process_segment(job_id: str, *args) -> Optional[Dict]:
+    """Run _track_segment, logging to the job's log file (segment process)."""
+    with job_log(job_id):
+        return _track_segment(job_id, *args)
+
+
+def _track_segment(
+    job_id: str,
+    params: dict,
+    index: int,
+    segment: Segment,
+    video_info: Tuple[int, int, float],
+    trace_path: str,
+    threads: int,
+    cpus: List[int],
+) -> Optional[Dict]:
+    """
+    Track one segment and record its detections.
+
+    Returns:
+        Segment statistics, or None if the job was cancelled
+    """
+    apply_thread_budget(threads, cpus)
+    # A pool process may run several segments; each reports only its own
+    metrics.reset()
+
+    # Imported after the thread budget is applied
+    from app.config.processing_config import ProcessingOptions
+    from app.services.count_job import create_components
+    from app.services.decoders import create_decoder
+    from app.services.profiling import JobProfiler
+    from app.services.video_processor import VideoProcessor
+    from app.utils.uploads import find_video
+
+    start, core_start, end = segment
+    frame_w, frame_h, fps = video_info
+    options = ProcessingOptions(**params["options"])
+    tracker, counter, roi, motion_gate, stride = create_components(params, options, frame_w, frame_h)
+    video_path = str(find_video(params["video_id"]))
+    decoder = create_decoder(
+        video_path, options.decoder, (frame_w, frame_h), roi if options.decoder_crops_roi else None
+    )
+
+    trace = DetectionTraceWriter(Path(trace_path), frame_w, frame_h, fps)
+    profiler = JobProfiler(segment=index + 1) if options.profile else None
+    processor = VideoProcessor(
+        tracker=tracker,
+        counter=counter,
+        directions_data=params["directions"],
+        writer=None,
+        video_path=video_path,
+        processing_id=job_id,
+        options=options,
+        fps=fps,
+        progress=_SegmentProgress(index, core_start),
+        motion_gate=motion_gate,
+        stride=stride,
+        trace=trace,
+        frame_range=(start, end),
+        decoder=decoder,
+        timeline=profiler.timeline if profiler else None,
+    )
+
+    began = time.perf_counter()
+    if profiler is not None:
+        profiler.start()
+    try:
+        processor.process_frames()
+    except BaseException:
+        trace.abort()
+        raise
+    finally:
+        if profiler is not None:
+            profiler.stop()
+    if cancellation.is_cancelled(job_id):
+        trace.abort()
+        return None
+    trace.close()
+
+    sampling = processor.sampling_stats()
+    stages = processor.stage_stats()
+    return {
+        "index": index,
+        "start": start,
+        "core_start": core_start,
+        "end": end,
+        "frames_read": sampling["frames_read"],
+        "frames_processed": sampling["frames_processed"],
+        "frames_tracked": tracker.frames_tracked,
+        "inference_seconds": round(tracker.inference_seconds, 2),
+        "decode_seconds": processor.decode_stats()["decode_seconds"],
+        "frames_decoded": stages["frames_decoded"],
+        "stage_seconds": stages["seconds"],
+        "roi": list(roi) if roi else None,
+        "motion_gate": motion_gate.stats(tracker.seconds_per_frame) if motion_gate else None,
+        "adaptive_stride": sampling["adaptive_stride"],
+        "seconds": round(time.perf_counter() - began, 2),
+        "metrics": metrics.snapshot(),
+        "profile": profiler.export() if profiler else None,
+    }
@@ -0,0 +1,382 @@
+"""Continuous counting of live streams, with per-window counts."""
+import os
+import cv2
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from app.config.processing_config import ProcessingOptions, StreamOptions
+from app.services.count_job import create_components
+from app.services.progress import ProgressReporter
+from app.services.video_processor import VideoProcessor
+from app.utils import cancellation
+
+logger = logging.getLogger("app")
+
+# Local stream sources (growing files, named pipes) must live here
+STREAM_FOLDER = Path(os.getenv("VCOUNT_STREAM_DIR", "streams"))
+
+STREAM_FOLDER.mkdir(exist_ok=True)
+
+URL_SCHEMES = ("rtsp", "rtsps", "rtmp", "http", "https", "udp", "tcp", "srt")
+
+# Stream URLs the server may connect to: host names, or URL prefixes
+# (entries with "://"). Empty allows no URLs, only local sources.
+URL_ALLOW = tuple(
+    entry.strip().lower() for entry in os.getenv("VCOUNT_STREAM_URL_ALLOW", "").split(",") if entry.strip()
+)
+
+
+def url_allowed(url: str) -> bool:
+    """Whether a stream URL matches a URL_ALLOW host or prefix."""
+    url = url.lower()
+    host = urlparse(url).hostname
+    for entry in URL_ALLOW:
+        if "://" not in entry:
+            if host == entry:
+                return True
+        # A prefix must end at a URL boundary and name the same host, so
+        # "rtsp://cam" allows neither "rtsp://camera" nor "rtsp://cam:1@elsewhere"
+        elif (
+            url.startswith(entry)
+            and (entry.endswith("/") or url[len(entry):][:1] in ("", "/", ":", "?"))
+            and host == urlparse(entry).hostname
+        ):
+            return True
+    return False
+
+
+def resolve_source(source: str) -> str:
+    """
+    Validate a stream source: a URL allowed by URL_ALLOW, or a file or named
+    pipe in STREAM_FOLDER.
+
+    Returns:
+        The URL, or the absolute path of the local source
+
+    Raises:
+        ValueError: If the source is not allowed or does not exist
+    """
+    if urlparse(source).scheme in URL_SCHEMES:
+        if not url_allowed(source):
+            raise ValueError("Stream URL is not allowed; add its host to VCOUNT_STREAM_URL_ALLOW")
+        return source
+
+    folder = STREAM_FOLDER.resolve()
+    path = (folder / source).resolve()
+    if folder not in path.parents:
+        raise ValueError(f"Local stream sources must be inside {STREAM_FOLDER}")
+    if not path.exists():
+        raise ValueError(f"Stream source not found: {source}")
+    return str(path)
+
+
+class FrameIngest:
+    """
+    Reads a live source on its own thread into a small buffer.
+
+    Ingestion never waits for the consumer: when the buffer is full, the
+    oldest frame is dropped and counted. Frames keep their source index, so
+    the counter sees the gap. A regular file is read at its frame rate, as
+    if it were live, and followed while it grows; URLs and pipes are
+    reconnected. The stream ends after idle_timeout seconds without a frame.
+    """
+
+    RETRY_INTERVAL = 0.2
+
+    def __init__(self, source: str, job_id: str, options: StreamOptions):
+        """
+        Args:
+            source: URL or local path (see resolve_source)
+            job_id: Job id; ingestion stops when it is cancelled
+            options: Stream options (buffer size, idle timeout)
+
+        Raises:
+            RuntimeError: If the source cannot be opened or has no frames
+        """
+        self.source = source
+        self.job_id = job_id
+        self.idle_timeout = options.idle_timeout
+        # Regular files are paced and followed; URLs and pipes are live already
+        self.is_file = os.path.isfile(source)
+
+        self._cap = self._open(0)
+        ret, frame = self._cap.read()
+        if not ret:
+            self._cap.release()
+            raise RuntimeError(f"Cannot read stream: {source}")
+        self.frame_h, self.frame_w = frame.shape[:2]
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        self._buffer: deque = deque([(0, frame)], maxlen=options.buffer_frames)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._done = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.frames_read = 1
+        self.frames_dropped = 0
+        self.end_reason: Optional[str] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name=f"ingest-{self.job_id}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Buffered frames as (frame_index, frame), until the stream ends."""
+        while True:
+            with self._cond:
+                while not self._buffer and not self._done:
+                    self._cond.wait(self.RETRY_INTERVAL)
+                if not self._buffer:
+                    return
+                item = self._buffer.popleft()
+            yield item
+
+    def _open(self, frame_idx: int) -> cv2.VideoCapture:
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise RuntimeError(f"Cannot open stream: {self.source}")
+        if self.is_file and frame_idx > 0:
+            # Seeking to (or past) the current end of a growing file can land
+            # on an earlier frame; only continue from the exact position
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            if cap.get(cv2.CAP_PROP_POS_FRAMES) != frame_idx:
+                cap.release()
+                raise RuntimeError(f"No frame {frame_idx} in {self.source} yet")
+        return cap
+
+    def _run(self) -> None:
+        frame_idx = 1
+        start = time.perf_counter()
+        last_frame = time.monotonic()
+        self.end_reason = "stopped"
+        try:
+            while not self._stop.is_set() and not cancellation.is_cancelled(self.job_id):
+                ret, frame = self._cap.read()
+                if not ret:
+                    if time.monotonic() - last_frame > self.idle_timeout:
+                        self.end_reason = "idle_timeout"
+                        break
+                    # End of what has been written so far, or a dropped
+                    # connection: wait, then reopen where we left off
+                    time.sleep(self.RETRY_INTERVAL)
+                    self._cap.release()
+                    try:
+                        self._cap = self._open(frame_idx)
+                    except RuntimeError:
+                        pass
+                    continue
+                last_frame = time.monotonic()
+
+                if self.is_file:
+                    delay = start + frame_idx / self.fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                with self._cond:
+                    if len(self._buffer) == self._buffer.maxlen:
+                        self.frames_dropped += 1
+                    self._buffer.append((frame_idx, frame))
+                    self._cond.notify()
+                self.frames_read += 1
+                frame_idx += 1
+        except Exception:
+            logger.exception("Ingestion of stream %s failed", self.source)
+            self.end_reason = "error"
+        finally:
+            self._cap.release()
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+
+class StreamReporter(ProgressReporter):
+    """
+    Progress of a stream job: counts per fixed window of stream time.
+
+    Windows are closed by the counting stage when the first frame past a
+    window boundary arrives, using the counts of the last frame inside it,
+    and only the last max_windows closed windows are kept.
+    """
+
+    def __init__(self, job_id: str, fps: float, options: StreamOptions, ingest: FrameIngest):
+        super().__init__(job_id, 0)
+        self.fps = fps
+        self.window_frames = max(1, round(options.window_seconds * fps))
+        self.windows: deque = deque(maxlen=options.max_windows)
+        self.windows_closed = 0
+        self.ingest = ingest
+
+        self._window_lock = threading.Lock()
+        self._window_start = 0
+        self._window_base: Dict[str, Dict[str, int]] = {}
+        self._window_frames_processed = 0
+        self._window_dropped_base = 0
+
+    def update(self, frames_processed: int, counts: Dict[str, Dict[str, int]]) -> None:
+        """
+        Record the state after a frame; frames_processed is its index + 1.
+
+        The whole update holds the window lock, so a snapshot never sees a
+        window's frame count and latest counts from different frames.
+        """
+        frame_idx = frames_processed - 1
+        with self._window_lock:
+            # Close every boundary passed; windows without frames stay empty
+            while frame_idx >= self._window_start + self.window_frames:
+                self._close_window(self._latest[1] or self._window_base)
+            self._window_frames_processed += 1
+            self._latest = (frames_processed, counts)
+
+    def finish(self) -> None:
+        """Close the last, partial window."""
+        with self._window_lock:
+            if self._window_frames_processed:
+                self._close_window(self._latest[1] or self._window_base, partial=True)
+
+    def snapshot(self, final: bool = False) -> dict:
+        with self._window_lock:
+            snapshot = super().snapshot(final)
+            windows = list(self.windows)
+            current = self._window(snapshot["counts"]) if self._window_frames_processed else None
+        snapshot.update({
+            "frames_read": self.ingest.frames_read,
+            "frames_dropped": self.ingest.frames_dropped,
+            "drop_rate": round(self.ingest.frames_dropped / max(1, self.ingest.frames_read), 4),
+            "window_seconds": round(self.window_frames / self.fps, 2),
+            "windows_closed": self.windows_closed,
+            "current_window": current,
+            "windows": windows,
+        })
+        return snapshot
+
+    def _window(self, counts: Dict[str, Dict[str, int]], partial: bool = True) -> dict:
+        return {
+            "index": self._window_start // self.window_frames,
+            "start_seconds": round(self._window_start / self.fps, 2),
+            "end_seconds": round((self._window_start + self.window_frames) / self.fps, 2),
+            "partial": partial,
+            "counts": {
+                dir_id: {cat: n - self._window_base.get(dir_id, {}).get(cat, 0) for cat, n in c.items()}
+                for dir_id, c in counts.items()
+            },
+            "frames_processed": self._window_frames_processed,
+            "frames_dropped": self.ingest.frames_dropped - self._window_dropped_base,
+        }
+
+    def _close_window(self, counts: Dict[str, Dict[str, int]], partial: bool = False) -> None:
+        window = self._window(counts, partial)
+        window["closed_at"] = datetime.now().isoformat()
+        self.windows.append(window)
+        self.windows_closed += 1
+        logger.info("Stream %s window %d closed: %s", self.job_id, window["index"], window["counts"])
+
+        self._window_start += self.window_frames
+        self._window_base = counts
+        self._window_frames_processed = 0
+        self._window_dropped_base = self.ingest.frames_dropped
+
+
+def run_stream_job(job_id: str, params: dict) -> dict:
+    """
+    Count vehicles in a live stream until it ends or the job is stopped.
+
+    One tracker and counter stay warm for the whole stream; counts are
+    published per window through the job progress. Memory stays bounded:
+    the ingestion buffer and the window history have fixed sizes, and the
+    counter evicts tracks that have not been seen for max_age frames.
+
+    Args:
+        job_id: Job id; cancelling the job stops the stream normally
+        params: Job parameters: source, directions, model_name,
+            intersection_name, options (ProcessingOptions fields) and
+            stream (StreamOptions fields)
+
+    Returns:
+        Results with metadata, including the retained windows
+    """
+    options = ProcessingOptions(**params["options"])
+    stream_options = StreamOptions(**params["stream"])
+    directions_data = params["directions"]
+
+    ingest = FrameIngest(params["source"], job_id, stream_options)
+    logger.info(
+        "Stream %s opened: %dx%d @ %.2f fps, %.0fs windows",
+        params["source"], ingest.frame_w, ingest.frame_h, ingest.fps, stream_options.window_seconds,
+    )
+
+    tracker, counter, roi, motion_gate, _ = create_components(
+        params, options, ingest.frame_w, ingest.frame_h
+    )
+    reporter = StreamReporter(job_id, ingest.fps, stream_options, ingest)
+    processor = VideoProcessor(
+        tracker=tracker,
+        counter=counter,
+        directions_data=directions_data,
+        writer=None,
+        video_path=params["source"],
+        processing_id=job_id,
+        options=options,
+        fps=ingest.fps,
+        progress=reporter,
+        motion_gate=motion_gate,
+        frame_source=ingest,
+    )
+
+    start_time = datetime.now()
+    ingest.start()
+    reporter.start()
+    try:
+        processor.process_frames()
+    finally:
+        ingest.stop()
+        reporter.finish()
+        reporter.stop()
+    end_time = datetime.now()
+
+    end_reason = "stopped" if cancellation.is_cancelled(job_id) else ingest.end_reason
+    logger.info(
+        "Stream %s ended (%s): %d frames read, %d dropped",
+        params["source"], end_reason, ingest.frames_read, ingest.frames_dropped,
+    )
+
+    return {
+        "results": counter.get_results(),
+        "metadata": {
+            "intersection_name": params["intersection_name"],
+            "source": params["source"],
+            "model": params["model_name"],
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(),
+            "processing_time_seconds": round((end_time - start_time).total_seconds(), 2),
+            "end_reason": end_reason,
+            "video_dimensions": {"width": ingest.frame_w, "height": ingest.frame_h},
+            "directions_count": len(directions_data),
+            "input_fps": ingest.fps,
+            "frames_read": ingest.frames_read,
+            "frames_dropped": ingest.frames_dropped,
+            "frames_processed": processor.sampling_stats()["frames_processed"],
+            "window_seconds": stream_options.window_seconds,
+            "windows_closed": reporter.windows_closed,
+            "windows": list(reporter.windows),
+            "throughput": tracker.throughput_stats(options.batch_size),
+            "stages": processor.stage_stats(),
+            "roi": list(roi) if roi else None,
+            "motion_gate": motion_gate.stats(tracker.seconds_per_frame) if motion_gate else None,
+        },
+    }
@@ -0,0 +1,136 @@
+"""Adaptive frame stride for sampling videos without missing line crossings."""
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class StrideController:
+    """
+    Chooses how many source frames to advance between processed frames.
+
+    After each processed frame it looks at every track's speed (pixels per
+    source frame, from its previous sampled position) and its distance to
+    the nearest entry/exit line. The stride is the largest step that keeps
+    every vehicle well short of the nearest line and within half its own box
+    size of its last position, so ByteTrack can still match it. The stride
+    falls back to 1 as soon as a vehicle approaches a line. A crossing that
+    happens between two sampled frames anyway (e.g. a vehicle speeding up)
+    is still counted: VehicleCounter tests the whole movement segment
+    between samples against each line, not just the endpoints.
+
+    The decode stage reads the stride ahead of counting: by the time a frame
+    is observed, the frames queued behind it were already sampled with the
+    strides chosen before. That lag (see set_lookahead) is subtracted from
+    every vehicle's distance to the line before SAFETY is applied. While no
+    vehicle is tracked, the next one can only enter from the frame edge, so
+    the stride is bounded by how fast the fastest vehicle so far would reach
+    a line from there.
+    """
+
+    # Fraction of the frames-to-nearest-line a single step may cover
+    SAFETY = 0.5
+    # Fraction of a vehicle's box size it may move in a single step
+    MAX_BOX_SHIFT = 0.5
+
+    def __init__(self, counter, max_stride: int = 4):
+        """
+        Args:
+            counter: VehicleCounter whose lines must not be skipped over
+            max_stride: Largest number of source frames per step
+        """
+        self.engine = counter.engine
+        self.max_stride = max_stride
+        # Start conservatively until speeds are known
+        self.stride = 1
+        # Strides the frames sampled ahead of the observed one were read with
+        self._ahead: deque = deque(maxlen=0)
+
+        # Shortest distance from the frame border to any line; lines are
+        # segments, so the point closest to the border is an endpoint
+        engine = self.engine
+        xs = np.concatenate([engine.x1.ravel(), engine.x2.ravel()])
+        ys = np.concatenate([engine.y1.ravel(), engine.y2.ravel()])
+        self._edge_distance = float(
+            np.minimum.reduce([xs, ys, counter.frame_w - xs, counter.frame_h - ys]).min()
+        ) if xs.size else float('inf')
+
+        self._last: Dict[int, tuple] = {}
+        # Fastest speed seen so far, used for tracks without a known speed
+        self._speed_prior: Optional[float] = None
+        self._histogram: Counter = Counter()
+
+    def set_lookahead(self, samples: int) -> None:
+        """
+        Set how far ahead of counting the decoder samples frames.
+
+        Args:
+            samples: Most frames the pipeline samples ahead of the one being
+                observed (queued between decoding and counting)
+        """
+        self._ahead = deque([self.stride] * samples, maxlen=samples)
+
+    def observe(self, detections: List[dict], frame_idx: int) -> int:
+        """
+        Update the stride from a processed frame's detections.
+
+        Returns:
+            Stride to use for the next step
+        """
+        self._histogram[self.stride] += 1
+        self.stride = self._next_stride(detections, frame_idx)
+        self._ahead.append(self.stride)
+        return self.stride
+
+    def _next_stride(self, detections: List[dict], frame_idx: int) -> int:
+        # Source frames the decoder may already be ahead of this frame
+        lag = sum(self._ahead)
+
+        if not detections:
+            self._last = {}
+            if self._speed_prior is None:
+                return 1
+            frames_from_edge = self._edge_distance / max(self._speed_prior, 1e-3)
+            return self._clip(self.SAFETY * (frames_from_edge - lag))
+
+        n = len(detections)
+        cx = np.fromiter((d['cx'] for d in detections), dtype=np.float64, count=n)
+        cy = np.fromiter((d['cy'] for d in detections), dtype=np.float64, count=n)
+        box = np.fromiter(
+            (min(d['bbox'][2] - d['bbox'][0], d['bbox'][3] - d['bbox'][1]) for d in detections),
+            dtype=np.float64, count=n,
+        )
+
+        speed = np.full(n, np.nan)
+        for i, d in enumerate(detections):
+            last = self._last.get(d['track_id'])
+            if last is not None and frame_idx > last[2]:
+                speed[i] = np.hypot(cx[i] - last[0], cy[i] - last[1]) / (frame_idx - last[2])
+        self._last = {d['track_id']: (cx[i], cy[i], frame_idx) for i, d in enumerate(detections)}
+
+        known = ~np.isnan(speed)
+        if known.any():
+            fastest = float(speed[known].max())
+            self._speed_prior = max(fastest, self._speed_prior or 0.0)
+        if self._speed_prior is None:
+            return 1
+        speed[~known] = self._speed_prior
+        speed = np.maximum(speed, 1e-3)
+
+        frames_to_line = self.engine.distances(cx, cy) / speed
+        frames_to_lose_track = self.MAX_BOX_SHIFT * box / speed
+        allowed = np.minimum(self.SAFETY * (frames_to_line - lag), frames_to_lose_track).min()
+        return self._clip(allowed)
+
+    def _clip(self, allowed: float) -> int:
+        return int(np.clip(np.floor(allowed), 1, self.max_stride))
+
+    def stats(self) -> Dict:
+        """Distribution of strides used, for the job metadata."""
+        steps = sum(self._histogram.values())
+        mean = sum(stride * n for stride, n in self._histogram.items()) / steps if steps else 1.0
+        return {
+            "max_stride": self.max_stride,
+            "mean_stride": round(mean, 2),
+            "stride_histogram": {str(k): v for k, v in sorted(self._histogram.items())},
+        }
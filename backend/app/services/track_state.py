@@ -0,0 +1,113 @@
+"""Array-backed per-track crossing state for VehicleCounter."""
+from typing import Dict, List
+import numpy as np
+
+
+class TrackStateStore:
+    """
+    Holds the crossing phase and last seen line sides of every live track in
+    compact NumPy columns, one row per track and one column per direction.
+
+    Rows of tracks that have not been seen for more than ``max_age`` frames are
+    recycled, so memory depends on how many tracks are alive at once rather
+    than on how many track ids the tracker has ever assigned.
+    """
+
+    PHASE_NONE = 0
+    PHASE_ENTRY = 1  # waiting to cross the entry line
+    PHASE_EXIT = 2   # crossed entry, waiting to cross the exit line
+    PHASE_DONE = 3   # counted
+
+    # How often (in frames) stale rows are looked for
+    EVICT_INTERVAL = 30
+
+    def __init__(self, num_directions: int, max_age: int, initial_capacity: int = 64):
+        """
+        Args:
+            num_directions: Number of counting directions (columns)
+            max_age: Frames a track may stay unseen before its state is dropped
+            initial_capacity: Rows allocated up front; grows by doubling
+        """
+        self.num_directions = num_directions
+        self.max_age = max_age
+
+        self.phase = np.zeros((0, num_directions), dtype=np.int8)
+        self.entry_side = np.zeros((0, num_directions), dtype=np.int8)
+        self.exit_side = np.zeros((0, num_directions), dtype=np.int8)
+        self.prev_xy = np.zeros((0, 2), dtype=np.float64)
+        self.has_prev = np.zeros(0, dtype=bool)
+        self.last_seen = np.zeros(0, dtype=np.int64)
+        self.track_ids = np.zeros(0, dtype=np.int64)
+
+        self._rows: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._last_eviction = 0
+        self._grow(initial_capacity)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.track_ids)
+
+    def rows_for(self, track_ids: List[int], frame_idx: int) -> np.ndarray:
+        """
+        Map track ids to rows, allocating cleared rows for new tracks, and mark
+        them as seen at frame_idx.
+        """
+        rows = np.empty(len(track_ids), dtype=np.intp)
+        for i, track_id in enumerate(track_ids):
+            row = self._rows.get(track_id)
+            if row is None:
+                row = self._allocate(track_id)
+            rows[i] = row
+        self.last_seen[rows] = frame_idx
+        return rows
+
+    def evict_stale(self, frame_idx: int) -> int:
+        """
+        Release rows of tracks unseen for more than max_age frames.
+        Runs at most once every EVICT_INTERVAL frames.
+
+        Returns:
+            Number of evicted tracks
+        """
+        if frame_idx - self._last_eviction < self.EVICT_INTERVAL:
+            return 0
+        self._last_eviction = frame_idx
+
+        stale = np.flatnonzero(
+            (self.track_ids >= 0) & (self.last_seen < frame_idx - self.max_age)
+        )
+        for row in stale.tolist():
+            del self._rows[int(self.track_ids[row])]
+            self.track_ids[row] = -1
+            self._free.append(row)
+        return len(stale)
+
+    def _allocate(self, track_id: int) -> int:
+        if not self._free:
+            self._grow(max(1, self.capacity))
+        row = self._free.pop()
+        self.phase[row] = self.PHASE_NONE
+        self.entry_side[row] = 0
+        self.exit_side[row] = 0
+        self.has_prev[row] = False
+        self.track_ids[row] = track_id
+        self._rows[track_id] = row
+        return row
+
+    def _grow(self, extra: int) -> None:
+        """Append extra empty rows to every column."""
+        old = self.capacity
+        d = self.num_directions
+        self.phase = np.concatenate([self.phase, np.zeros((extra, d), dtype=np.int8)])
+        self.entry_side = np.concatenate([self.entry_side, np.zeros((extra, d), dtype=np.int8)])
+        self.exit_side = np.concatenate([self.exit_side, np.zeros((extra, d), dtype=np.int8)])
+        self.prev_xy = np.concatenate([self.prev_xy, np.zeros((extra, 2), dtype=np.float64)])
+        self.has_prev = np.concatenate([self.has_prev, np.zeros(extra, dtype=bool)])
+        self.last_seen = np.concatenate([self.last_seen, np.zeros(extra, dtype=np.int64)])
+        self.track_ids = np.concatenate([self.track_ids, np.full(extra, -1, dtype=np.int64)])
+        # Pop from the end, so lower rows are handed out first
+        self._free.extend(range(old + extra - 1, old - 1, -1))
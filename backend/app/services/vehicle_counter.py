@@ -1,6 +1,10 @@
 from collections import defaultdict
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 import logging
+import numpy as np
+
+from app.services.crossing_engine import CrossingEngine
+from app.services.track_state import TrackStateStore
 
 logger = logging.getLogger("vehicle_counter")
 
@@ -18,7 +22,12 @@ class VehicleCounter:
         3: 'trucks',     
     }
     
-    def __init__(self, directions: List[Dict], frame_w: int, frame_h: int):
+    # Frames with at most this many (detection x direction) pairs are counted
+    # with plain Python; below it the fixed cost of the array operations
+    # outweighs what they save
+    SCALAR_MAX_PAIRS = 24
+    
+    def __init__(self, directions: List[Dict], frame_w: int, frame_h: int, max_age: int = 120):
         """
         Args:
             directions: List of direction configs from frontend
@@ -26,21 +35,22 @@ class VehicleCounter:
                 Each line has: x1, y1, x2, y2, isEntry (normalized 0-1)
             frame_w: Video frame width
             frame_h: Video frame height
+            max_age: Frames a track may go unseen before its state is evicted;
+                should match the tracker's max_age
         """
         self.frame_w = frame_w
         self.frame_h = frame_h
         self.directions = self._parse_directions(directions)
-        
-        self.vehicle_state: Dict[str, Dict[int, str]] = {
-            d['id']: {} for d in self.directions
-        }
+        self.engine = CrossingEngine(self.directions)
+        self.state = TrackStateStore(len(self.directions), max_age)
+        self._frame_idx = -1
         
         self.counts: Dict[str, Dict[str, int]] = {
             d['id']: {'bikes': 0, 'cars': 0, 'buses': 0, 'trucks': 0}
             for d in self.directions
         }
         
-        logger.info(f"VehicleCounter initialized with {len(self.directions)} directions")
+        logger.info("VehicleCounter initialized with %d directions", len(self.directions))
     
     def _parse_directions(self, directions: List[Dict]) -> List[Dict]:
         """Convert normalized coordinates to pixel coordinates and separate entry/exit lines."""
@@ -71,13 +81,39 @@ class VehicleCounter:
                     'entry_line': entry_line,
                     'exit_line': exit_line,
                 })
-                logger.info(f"Direction {d['from']} - {d['to']}: entry={entry_line}, exit={exit_line}")
+                logger.info("Direction %s - %s: entry=%s, exit=%s", d['from'], d['to'], entry_line, exit_line)
             else:
-                logger.warning(f"Direction {d.get('id')} missing entry or exit line, skipping")
+                logger.warning("Direction %s missing entry or exit line, skipping", d.get('id'))
         
         return parsed
     
-    def update(self, detections: List[Dict]):
+    def roi_bounds(self, padding: float) -> Tuple[int, int, int, int]:
+        """
+        Padded bounding region around all entry/exit lines, clipped to the frame.
+        
+        Args:
+            padding: Margin added on each side, as a fraction of the frame
+                width (horizontally) and height (vertically)
+            
+        Returns:
+            (x1, y1, x2, y2) in pixels, x2/y2 exclusive; the full frame if
+            there are no directions
+        """
+        xs = [line[k] for d in self.directions for line in (d['entry_line'], d['exit_line']) for k in ('x1', 'x2')]
+        ys = [line[k] for d in self.directions for line in (d['entry_line'], d['exit_line']) for k in ('y1', 'y2')]
+        if not xs:
+            return 0, 0, self.frame_w, self.frame_h
+        
+        pad_x = padding * self.frame_w
+        pad_y = padding * self.frame_h
+        return (
+            max(0, int(min(xs) - pad_x)),
+            max(0, int(min(ys) - pad_y)),
+            min(self.frame_w, int(np.ceil(max(xs) + pad_x)) + 1),
+            min(self.frame_h, int(np.ceil(max(ys) + pad_y)) + 1),
+        )
+    
+    def update(self, detections: List[Dict], frame_idx: Optional[int] = None):
         """
         Update vehicle states based on current frame detections.
         Hybrid approach: on first sighting, record initial side relative to each line.
@@ -87,71 +123,172 @@ class VehicleCounter:
         
         Args:
             detections: List of {track_id: int, cx: float, cy: float, class_id: int}
+            frame_idx: Source frame index; defaults to one past the previous update
         """
-        for detection in detections:
-            track_id = detection['track_id']
-            cx = detection['cx']
-            cy = detection['cy']
-            class_id = detection['class_id']
-            prev = getattr(self, '_prev_positions', {}).get(track_id)
-            
-            for direction in self.directions:
-                dir_id = direction['id']
-                current_state = self.vehicle_state[dir_id].get(track_id)
-                
-                if current_state is None:
-                    entry_side = self._get_side_of_line(cx, cy, direction['entry_line'])
-                    if entry_side is not None:
-                        self.vehicle_state[dir_id][track_id] = {'entry_side': entry_side, 'phase': 'tracking_entry'}
+        self.update_arrays(
+            [d['track_id'] for d in detections],
+            np.array([d['cx'] for d in detections], dtype=np.float64),
+            np.array([d['cy'] for d in detections], dtype=np.float64),
+            [d['class_id'] for d in detections],
+            frame_idx,
+        )
+    
+    def update_arrays(
+        self,
+        track_ids: List[int],
+        cx: np.ndarray,
+        cy: np.ndarray,
+        class_ids: List[int],
+        frame_idx: Optional[int] = None,
+    ):
+        """
+        Column-oriented form of update(); all state transitions for the frame
+        are applied as array operations over (detections x directions).
+        Small frames (see SCALAR_MAX_PAIRS) take the equivalent scalar path.
+        """
+        if frame_idx is None:
+            frame_idx = self._frame_idx + 1
+        self._frame_idx = frame_idx
+        self.state.evict_stale(frame_idx)
+        
+        if len(track_ids) == 0:
+            return
+        
+        st = self.state
+        rows = st.rows_for(track_ids, frame_idx)
+        if len(track_ids) * len(self.directions) <= self.SCALAR_MAX_PAIRS:
+            self._update_scalar(track_ids, cx, cy, class_ids, rows)
+            return
+        
+        phase = st.phase[rows]
+        prev_entry_side = st.entry_side[rows]
+        prev_exit_side = st.exit_side[rows]
+        
+        # All side tests and segment intersections for this frame in one pass.
+        # Side value 0 means "on the line" (None in the scalar helpers).
+        entry_side, exit_side = self.engine.sides(cx, cy)
+        entry_crossed, exit_crossed = self.engine.intersections(
+            st.prev_xy[rows, 0], st.prev_xy[rows, 1], cx, cy, st.has_prev[rows]
+        )
+        
+        first_seen = (phase == TrackStateStore.PHASE_NONE) & (entry_side != 0)
+        
+        tracking_entry = phase == TrackStateStore.PHASE_ENTRY
+        entered = tracking_entry & (
+            entry_crossed
+            | ((prev_entry_side != 0) & (entry_side != 0) & (prev_entry_side != entry_side))
+        )
+        keep_entry_side = tracking_entry & ~entered & (entry_side != 0)
+        
+        tracking_exit = phase == TrackStateStore.PHASE_EXIT
+        exited = tracking_exit & (
+            exit_crossed
+            | ((prev_exit_side != 0) & (exit_side != 0) & (prev_exit_side != exit_side))
+        )
+        keep_exit_side = tracking_exit & ~exited & (exit_side != 0)
+        
+        phase[first_seen] = TrackStateStore.PHASE_ENTRY
+        phase[entered] = TrackStateStore.PHASE_EXIT
+        phase[exited] = TrackStateStore.PHASE_DONE
+        st.phase[rows] = phase
+        st.entry_side[rows] = np.where(first_seen | keep_entry_side, entry_side, prev_entry_side)
+        st.exit_side[rows] = np.where(keep_exit_side, exit_side, np.where(entered, 0, prev_exit_side))
+        
+        st.prev_xy[rows, 0] = cx
+        st.prev_xy[rows, 1] = cy
+        st.has_prev[rows] = True
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, j in zip(*np.nonzero(entered)):
+                logger.debug("Vehicle %s crossed ENTRY for direction %s", track_ids[i], self.directions[j]['id'])
+        
+        for i, j in zip(*np.nonzero(exited)):
+            self._count(track_ids[i], class_ids[i], j)
+    
+    def _update_scalar(
+        self,
+        track_ids: List[int],
+        cx: np.ndarray,
+        cy: np.ndarray,
+        class_ids: List[int],
+        rows: np.ndarray,
+    ):
+        """
+        update_arrays for a few detections: the same state transitions, one
+        (detection, direction) pair at a time on Python lists. Phases and
+        sides are only written back when they changed, which for most
+        frames they do not.
+        """
+        st = self.state
+        phases = st.phase[rows].tolist()
+        entry_sides = st.entry_side[rows].tolist()
+        exit_sides = st.exit_side[rows].tolist()
+        prev_xy = st.prev_xy[rows].tolist()
+        has_prev = st.has_prev[rows].tolist()
+        points = list(zip(cx.tolist(), cy.tolist()))
+        
+        changed = False
+        exited = []
+        for i, point in enumerate(points):
+            prev = prev_xy[i] if has_prev[i] else None
+            phase, entry_side, exit_side = phases[i], entry_sides[i], exit_sides[i]
+            for j, direction in enumerate(self.directions):
+                if phase[j] == TrackStateStore.PHASE_NONE:
+                    side = self._get_side_of_line(point[0], point[1], direction['entry_line'])
+                    if side is not None:
+                        phase[j] = TrackStateStore.PHASE_ENTRY
+                        entry_side[j] = side
+                        changed = True
                 
-                elif isinstance(current_state, dict) and current_state.get('phase') == 'tracking_entry':
-                    crossed = False
-
-                    if prev is not None and self._segments_intersect(prev, (cx, cy), direction['entry_line']):
-                        crossed = True
-                    else:
-                        prev_side = current_state.get('entry_side')
-                        cur_side = self._get_side_of_line(cx, cy, direction['entry_line'])
-                        if prev_side is not None and cur_side is not None and prev_side != cur_side:
-                            crossed = True
-                    if crossed:
-                        self.vehicle_state[dir_id][track_id] = {'phase': 'tracking_exit', 'exit_side': None}
-                        logger.debug(f"Vehicle {track_id} crossed ENTRY for direction {dir_id}")
-                    else:
-                        entry_side = self._get_side_of_line(cx, cy, direction['entry_line'])
-                        if entry_side is not None:
-                            self.vehicle_state[dir_id][track_id]['entry_side'] = entry_side
+                elif phase[j] == TrackStateStore.PHASE_ENTRY:
+                    side = self._get_side_of_line(point[0], point[1], direction['entry_line'])
+                    crossed = prev is not None and self._segments_intersect(prev, point, direction['entry_line'])
+                    if crossed or (entry_side[j] != 0 and side is not None and entry_side[j] != side):
+                        phase[j] = TrackStateStore.PHASE_EXIT
+                        exit_side[j] = 0
+                        changed = True
+                        logger.debug("Vehicle %s crossed ENTRY for direction %s", track_ids[i], direction['id'])
+                    elif side is not None and side != entry_side[j]:
+                        entry_side[j] = side
+                        changed = True
                 
-                elif isinstance(current_state, dict) and current_state.get('phase') == 'tracking_exit':
-                    crossed = False
-                    if prev is not None and self._segments_intersect(prev, (cx, cy), direction['exit_line']):
-                        crossed = True
-                    else:
-                        prev_exit_side = current_state.get('exit_side')
-                        cur_exit_side = self._get_side_of_line(cx, cy, direction['exit_line'])
-                        if prev_exit_side is not None and cur_exit_side is not None and prev_exit_side != cur_exit_side:
-                            crossed = True
-                    if crossed:
-                        self.vehicle_state[dir_id][track_id] = 'exit'
-                        category = self.CLASS_MAPPING.get(class_id, 'cars')
-                        self.counts[dir_id][category] += 1
-                        logger.info(
-                            f"Vehicle {track_id} ({category}) counted for {direction['from']} - {direction['to']} "
-                            f"(Total {category}: {self.counts[dir_id][category]})"
-                        )
-                    else:
-                        cur_exit_side = self._get_side_of_line(cx, cy, direction['exit_line'])
-                        if cur_exit_side is not None:
-                            self.vehicle_state[dir_id][track_id]['exit_side'] = cur_exit_side
-        
-        if not hasattr(self, '_prev_positions'):
-            self._prev_positions = {}
-        for d in detections:
-            self._prev_positions[d['track_id']] = (d['cx'], d['cy'])
+                elif phase[j] == TrackStateStore.PHASE_EXIT:
+                    side = self._get_side_of_line(point[0], point[1], direction['exit_line'])
+                    crossed = prev is not None and self._segments_intersect(prev, point, direction['exit_line'])
+                    if crossed or (exit_side[j] != 0 and side is not None and exit_side[j] != side):
+                        phase[j] = TrackStateStore.PHASE_DONE
+                        changed = True
+                        exited.append((i, j))
+                    elif side is not None and side != exit_side[j]:
+                        exit_side[j] = side
+                        changed = True
+        
+        if changed:
+            st.phase[rows] = phases
+            st.entry_side[rows] = entry_sides
+            st.exit_side[rows] = exit_sides
+        st.prev_xy[rows, 0] = cx
+        st.prev_xy[rows, 1] = cy
+        st.has_prev[rows] = True
+        
+        for i, j in exited:
+            self._count(track_ids[i], class_ids[i], j)
+    
+    def _count(self, track_id: int, class_id: int, direction_index: int):
+        """Count a vehicle that crossed the exit line of a direction."""
+        direction = self.directions[direction_index]
+        dir_id = direction['id']
+        category = self.CLASS_MAPPING.get(int(class_id), 'cars')
+        self.counts[dir_id][category] += 1
+        logger.info(
+            "Vehicle %s (%s) counted for %s - %s (Total %s: %d)",
+            track_id, category, direction['from'], direction['to'], category, self.counts[dir_id][category],
+        )
     
     def _get_side_of_line(self, cx: float, cy: float, line: Dict) -> int:
         """
         Determine which side of a line a point is on using cross product.
+        Scalar counterpart of CrossingEngine.sides.
         Returns: 1 for one side, -1 for the other, None if on the line (threshold).
         """
         x1, y1 = line['x1'], line['y1']
@@ -166,7 +303,10 @@ class VehicleCounter:
         return 1 if cross > 0 else -1
     
     def _segments_intersect(self, p1: Tuple[float, float], p2: Tuple[float, float], line: Dict) -> bool:
-        """Check if segment p1->p2 intersects the line segment (x1,y1)-(x2,y2)."""
+        """
+        Check if segment p1->p2 intersects the line segment (x1,y1)-(x2,y2).
+        Scalar counterpart of CrossingEngine.intersections.
+        """
         q1 = (line['x1'], line['y1'])
         q2 = (line['x2'], line['y2'])
         
@@ -1,16 +1,47 @@
 """Video processing orchestration."""
+import cv2
 import time
+import queue
 import logging
-from typing import List, Dict
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+from app.config.processing_config import ProcessingOptions
 from app.utils.cancellation import is_cancelled
 from app.services.frame_annotator import FrameAnnotator
+from app.services.decoders import OpenCVDecoder
+from app.services import metrics
+from app.services.metrics import STAGES
 
 logger = logging.getLogger("app")
+# Per-frame messages, rate limited by the logging configuration
+pipeline_logger = logging.getLogger("app.pipeline")
+
+# Marks the end of a stage's output stream
+_END = object()
+
+# Per-frame stage latencies exported on /metrics
+_DECODE_SECONDS = metrics.STAGE_SECONDS["decode"]
+_INFERENCE_SECONDS = metrics.STAGE_SECONDS["inference"]
+_COUNTING_SECONDS = metrics.STAGE_SECONDS["counting"]
+_ANNOTATION_SECONDS = metrics.STAGE_SECONDS["annotation"]
+_ENCODING_SECONDS = metrics.STAGE_SECONDS["encoding"]
 
 
 class VideoProcessor:
-    """Handles video frame processing with tracking and annotation."""
-    
+    """
+    Handles video frame processing with tracking and annotation.
+
+    Frames flow through four stages, each on its own thread and connected by
+    bounded queues: decode -> inference -> counting -> annotation/encoding.
+    Every stage is a single consumer reading a FIFO queue, so frame order is
+    preserved end to end. A full queue blocks its producer (backpressure), and
+    a shared stop event lets cancellation or an error reach every stage.
+
+    Output modes other than 'full' skip work after counting: counts_only runs
+    without the annotation/encoding stage, every_nth only forwards every
+    output_stride-th frame to it, and preview annotates downscaled frames.
+    """
+
     def __init__(
         self,
         tracker,
@@ -18,18 +49,45 @@ class VideoProcessor:
         directions_data: List[dict],
         writer,
         video_path: str,
-        processing_id: str
+        processing_id: str,
+        options: Optional[ProcessingOptions] = None,
+        fps: float = 30.0,
+        progress=None,
+        motion_gate=None,
+        stride=None,
+        trace=None,
+        frame_range: Optional[Tuple[int, Optional[int]]] = None,
+        frame_source: Optional[Iterable[Tuple[int, Any]]] = None,
+        decoder=None,
+        timeline=None,
     ):
         """
         Initialize video processor.
-        
+
         Args:
             tracker: YOLOVehicleTracker instance
             counter: VehicleCounter instance
             directions_data: Original direction configuration
-            writer: cv2.VideoWriter instance
+            writer: cv2.VideoWriter instance (None in counts_only mode)
             video_path: Path to input video
             processing_id: Unique processing identifier
+            options: Per-job processing options
+            fps: Source frame rate, used by real-time pacing
+            progress: Optional ProgressReporter receiving per-frame updates
+            motion_gate: Optional MotionGate; frames without motion skip
+                detection and reuse the previous detections
+            stride: Optional StrideController choosing how many source frames
+                to advance between processed frames
+            trace: Optional DetectionTraceWriter recording every processed frame
+            frame_range: Optional (start, end) source frames to process, end
+                exclusive (None for the end of the video); frame indices
+                stay those of the whole video
+            frame_source: Optional iterable of (frame_index, frame) read
+                instead of video_path, e.g. a live stream
+            decoder: Optional decoder of video_path (see app.services.decoders);
+                an OpenCVDecoder at source size by default
+            timeline: Optional FrameTimeline recording when each stage worked
+                on each frame (profiled jobs)
         """
         self.tracker = tracker
         self.counter = counter
@@ -37,52 +95,449 @@ class VideoProcessor:
         self.writer = writer
         self.video_path = video_path
         self.processing_id = processing_id
-        self.annotator = FrameAnnotator()
-    
+        self.options = options or ProcessingOptions()
+        self.fps = fps or 30.0
+        self.progress = progress
+        self.motion_gate = motion_gate
+        self.stride = stride
+        self.trace = trace
+        self.frame_range = frame_range or (0, None)
+        self.frame_source = frame_source
+        self.decoder = decoder or OpenCVDecoder(video_path)
+        self.timeline = timeline
+        self.annotator = FrameAnnotator(counter.directions, directions_data)
+        if stride is not None:
+            stride.set_lookahead(self._frames_ahead_of_counting())
+
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+        self._frame_count = 0
+        self._frames_processed = 0
+        self._last_rendered = -1
+        self._frame_size: Optional[Tuple[int, int]] = None
+        self._frames_written = 0
+        self._render_seconds = 0.0
+        self._frames_rendered = 0
+        self._frames_decoded = 0
+        self._stage_seconds = dict.fromkeys(STAGES, 0.0)
+
     def process_frames(self) -> int:
         """
         Process all video frames with tracking, counting, and annotation.
-        
+
         Returns:
             int: Total number of frames processed
         """
-        frame_count = 0
+        frame_slots, batch_slots = self._queue_slots()
+
+        decoded = queue.Queue(maxsize=batch_slots)
+        tracked = queue.Queue(maxsize=frame_slots)
+        counted = queue.Queue(maxsize=frame_slots)
+
+        if self.options.writes_video:
+            stages = [
+                ("decode", self._decode_stage, (decoded,)),
+                ("inference", self._inference_stage, (decoded, tracked)),
+                ("counting", self._counting_stage, (tracked, counted)),
+                ("encode", self._encode_stage, (counted,)),
+            ]
+        else:
+            stages = [
+                ("decode", self._decode_stage, (decoded,)),
+                ("inference", self._inference_stage, (decoded, tracked)),
+                ("counting", self._counting_stage, (tracked, None)),
+            ]
+        threads = [
+            threading.Thread(
+                target=self._run_stage,
+                args=(name, target, args),
+                name=f"{name}-{self.processing_id}",
+                daemon=True,
+            )
+            for name, target, args in stages
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return self._frame_count
+
+    def output_stats(self) -> dict:
+        """
+        Annotation/encoding work of this run, with the time saved compared to
+        a full-mode render. The estimate uses this run's own cost per written
+        frame, so it is only made by modes that render frames at full size
+        (full, every_nth).
+        """
+        frames = self._frame_count + 1 - self.frame_range[0] if self._frame_size else 0
+        full_estimate = None
+        if self.options.output_mode in ('full', 'every_nth') and self._frames_written:
+            full_estimate = self._render_seconds / self._frames_written * frames
+        return {
+            "mode": self.options.output_mode,
+            "frames_written": self._frames_written,
+            "render_seconds": round(self._render_seconds, 3),
+            "estimated_full_render_seconds": (
+                round(full_estimate, 3) if full_estimate is not None else None
+            ),
+            "time_saved_seconds": (
+                round(max(0.0, full_estimate - self._render_seconds), 3)
+                if full_estimate is not None else None
+            ),
+        }
+
+    def sampling_stats(self) -> dict:
+        """
+        Source frames read versus frames actually processed, and the
+        effective processed frame rate (lower than the source rate when
+        frames are skipped by an adaptive stride).
+        """
+        frames_read = self._frame_count + 1 - self.frame_range[0] if self._frames_processed else 0
+        ratio = self._frames_processed / frames_read if frames_read else 1.0
+        return {
+            "frames_read": frames_read,
+            "frames_processed": self._frames_processed,
+            "processed_fps": round(self.fps * ratio, 2),
+            "adaptive_stride": self.stride.stats() if self.stride is not None else None,
+        }
+
+    def decode_stats(self) -> dict:
+        """
+        Decoder settings, and the time the decode stage waited for frames
+        (the decoding cost the pipeline actually sees).
+        """
+        return {
+            **self.decoder.describe(),
+            "frames_decoded": self._frames_decoded,
+            "decode_seconds": round(self._stage_seconds["decode"], 3),
+            "decode_fps": (
+                round(self._frames_decoded / self._stage_seconds["decode"], 2)
+                if self._stage_seconds["decode"] > 0 else None
+            ),
+        }
+
+    def stage_stats(self) -> dict:
+        """
+        Time spent in each stage's own work, excluding waits on other
+        stages: decoding (waiting for the decoder), detection and tracking,
+        counting, drawing overlays and writing the output video. Per-frame
+        costs are per processed frame, so stages add up to the cost of a
+        frame; stages run concurrently, so wall time can be lower.
+        """
+        frames = self._frames_processed
+        return {
+            "frames_decoded": self._frames_decoded,
+            "frames_processed": frames,
+            "frames_rendered": self._frames_rendered,
+            "seconds": {name: round(t, 4) for name, t in self._stage_seconds.items()},
+            "ms_per_frame": {
+                name: round(1000 * t / frames, 4) if frames else None
+                for name, t in self._stage_seconds.items()
+            },
+        }
+
+    def _queue_slots(self) -> Tuple[int, int]:
+        """(frames per inter-stage queue, batches in the decoded queue)"""
+        frame_slots = self.options.queue_size
+        if self.stride is not None:
+            # Frames queued ahead of counting were sampled with an old stride;
+            # keep about one batch in flight so the stride reacts quickly
+            frame_slots = min(frame_slots, self.options.batch_size)
+        return frame_slots, max(1, frame_slots // self.options.batch_size)
+
+    def _frames_in_flight(self) -> int:
+        """
+        Most decoded frames the pipeline can hold at once: full queues, the
+        batch being filled, the batch in inference and one frame in each of
+        the counting and encoding stages. Decoders that reuse frame buffers
+        need one more buffer than this.
+        """
+        frame_slots, batch_slots = self._queue_slots()
+        return (batch_slots + 2) * self.options.batch_size + 2 * frame_slots + 2
+
+    def _frames_ahead_of_counting(self) -> int:
+        """
+        Most frames decoded after the one being counted: the decoded queue,
+        the batch being filled, the batch in inference and the tracked queue.
+        """
+        frame_slots, batch_slots = self._queue_slots()
+        return (batch_slots + 2) * self.options.batch_size + frame_slots
+
+    def _render_repeats(self, frame_idx: int) -> int:
+        """
+        How many times a frame is written to the annotated video: 0 if it is
+        left out, more than 1 to fill source frames skipped before it, so
+        the video keeps the source timing.
+        """
+        if not self.options.writes_video:
+            return 0
+        if self._last_rendered < 0:
+            repeats = 1
+        elif self.options.output_mode == 'every_nth':
+            repeats = 1 if frame_idx - self._last_rendered >= self.options.output_stride else 0
+        else:
+            repeats = frame_idx - self._last_rendered
+        if repeats:
+            self._last_rendered = frame_idx
+        return repeats
+
+    def _run_stage(self, name: str, target: Callable, args: tuple) -> None:
+        """Run one stage; any failure stops the whole pipeline."""
+        try:
+            target(*args)
+        except BaseException as e:
+            logger.exception("Pipeline stage '%s' failed", name)
+            self._errors.append(e)
+            self._stop.set()
+
+    def _decode_stage(self, out_q: queue.Queue) -> None:
+        """Read frames and group them into inference batches."""
+        batch_size = self.options.batch_size
+        indices, frames = [], []
+
+        start, end = self.frame_range
+        if self.frame_source is not None:
+            source = iter(self.frame_source)
+        else:
+            source = self.decoder.frames(
+                start, end,
+                next_stride=(lambda: self.stride.stride) if self.stride is not None else None,
+                buffers=self._frames_in_flight() + 1,
+            )
+
+        waited = time.perf_counter()
+        for frame_idx, frame in source:
+            decoded = time.perf_counter()
+            self._stage_seconds["decode"] += decoded - waited
+            _DECODE_SECONDS.observe(decoded - waited)
+            if self.timeline is not None:
+                self.timeline.add("decode", frame_idx, waited, decoded)
+            self._frames_decoded += 1
+            if self._should_stop():
+                break
+            indices.append(frame_idx)
+            frames.append(frame)
+            if len(frames) == batch_size:
+                if not self._put(out_q, (indices, frames)):
+                    return
+                indices, frames = [], []
+            waited = time.perf_counter()
+
+        if frames and not self._stop.is_set():
+            self._put(out_q, (indices, frames))
+        self._put(out_q, _END)
+
+    def _inference_stage(self, in_q: queue.Queue, out_q: queue.Queue) -> None:
+        """Detect and track each batch, then emit frames one by one."""
+        last_detections: List[dict] = []
+
+        while True:
+            item = self._get(in_q)
+            if item is _END:
+                break
+            indices, frames = item
+
+            start = time.perf_counter()
+            if self.motion_gate is None:
+                batch_detections = self.tracker.track_frames(frames, indices)
+            else:
+                batch_detections, last_detections = self._track_moving(indices, frames, last_detections)
+            end = time.perf_counter()
+            self._stage_seconds["inference"] += end - start
+            _INFERENCE_SECONDS.observe((end - start) / len(frames), len(frames))
+            if self.timeline is not None:
+                self.timeline.add("inference", indices[0], start, end, len(frames))
+
+            for frame_idx, frame, detections in zip(indices, frames, batch_detections):
+                if not self._put(out_q, (frame_idx, detections, frame)):
+                    return
+        self._put(out_q, _END)
+
+    def _track_moving(
+        self, indices: List[int], frames: List, last_detections: List[dict]
+    ) -> Tuple[List[List[dict]], List[dict]]:
+        """
+        Track only the frames with motion; static frames repeat the previous
+        detections (nothing moved, so they are still valid).
+
+        The tracker never sees skipped frames. To ByteTrack the static stretch
+        looks like no time passing, which matches a scene where nothing moved,
+        and the tracks match up again when motion resumes.
+
+        Returns:
+            (detections per frame, detections of the last frame)
+        """
+        moving = [self.motion_gate.has_motion(frame) for frame in frames]
+        tracked = iter(
+            self.tracker.track_frames(
+                [f for f, m in zip(frames, moving) if m], [i for i, m in zip(indices, moving) if m]
+            )
+            if any(moving) else []
+        )
+
+        results = []
+        for m in moving:
+            if m:
+                last_detections = next(tracked)
+            results.append(last_detections)
+        return results, last_detections
+
+    def _counting_stage(self, in_q: queue.Queue, out_q: queue.Queue) -> None:
+        """Update counts in frame order and snapshot them for annotation."""
         check_frequency = 0
-        
-        for frame_idx, detections, frame in self.tracker.track_video(self.video_path):
+        pace_start = time.perf_counter()
+        frame_interval = 1.0 / self.fps
+
+        while True:
+            item = self._get(in_q)
+            if item is _END:
+                break
+            frame_idx, detections, frame = item
+
             if frame_idx % 5 == 0:
                 check_frequency += 1
-                if is_cancelled(self.processing_id):
-                    logger.warning(
-                        "CANCELLATION DETECTED at frame %d (check #%d)",
-                        frame_idx, check_frequency
-                    )
-                    break
-            elif is_cancelled(self.processing_id):
+            if is_cancelled(self.processing_id):
                 logger.warning(
-                    "CANCELLATION DETECTED at frame %d (unlogged check)", frame_idx
+                    "CANCELLATION DETECTED at frame %d (check #%d)",
+                    frame_idx, check_frequency
                 )
-                break
-            
+                self._stop.set()
+                return
+
             if frame_idx % 10 == 0:
-                logger.info(
-                    f"Processing frame {frame_idx}, detections: {len(detections)}"
-                )
-            
-            if len(detections) > 0:
-                time.sleep(0.033)  
-
-            self.counter.update(detections)
-            frame_count = frame_idx
-            
-            overlay = self.annotator.annotate_frame(
-                frame=frame,
-                detections=detections,
-                directions=self.counter.directions,
-                counts=self.counter.counts,
-                directions_data=self.directions_data
-            )
-            
-            self.writer.write(overlay)
-        
-        return frame_count
+                pipeline_logger.info("Processing frame %d, detections: %d", frame_idx, len(detections))
+
+            if self.options.realtime_pacing:
+                # Frame indices of a segment start at its first frame
+                due = pace_start + (frame_idx - self.frame_range[0]) * frame_interval
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            if self._frame_size is None:
+                self._frame_size = (frame.shape[1], frame.shape[0])
+
+            start = time.perf_counter()
+            self.counter.update(detections, frame_idx)
+            self._frame_count = frame_idx
+            self._frames_processed += 1
+            if self.stride is not None:
+                self.stride.observe(detections, frame_idx)
+            if self.trace is not None:
+                self.trace.add(frame_idx, detections)
+
+            counts = {dir_id: dict(c) for dir_id, c in self.counter.counts.items()}
+            if self.progress is not None:
+                self.progress.update(frame_idx + 1, counts)
+            end = time.perf_counter()
+            self._stage_seconds["counting"] += end - start
+            _COUNTING_SECONDS.observe(end - start)
+            metrics.FRAMES_PROCESSED.inc()
+            if self.timeline is not None:
+                self.timeline.add("counting", frame_idx, start, end)
+            repeats = self._render_repeats(frame_idx)
+            if repeats and not self._put(out_q, (frame_idx, frame, detections, counts, repeats)):
+                return
+        if out_q is not None:
+            self._put(out_q, _END)
+
+    def _encode_stage(self, in_q: queue.Queue) -> None:
+        """Draw overlays and write frames to the output video."""
+        preview_size = None
+
+        while True:
+            item = self._get(in_q)
+            if item is _END:
+                break
+            frame_idx, frame, detections, counts, repeats = item
+            start = time.perf_counter()
+
+            if self.options.output_mode == 'preview':
+                if preview_size is None:
+                    h, w = frame.shape[:2]
+                    preview_size = self.options.output_size(w, h)
+                    sx, sy = preview_size[0] / w, preview_size[1] / h
+                    self.annotator = FrameAnnotator(
+                        self._scale_directions(self.counter.directions, sx, sy),
+                        self.directions_data,
+                    )
+                frame = cv2.resize(frame, preview_size, interpolation=cv2.INTER_AREA)
+                detections = self._scale_detections(detections, sx, sy)
+
+            # The frame is not used after this stage, so draw on it directly
+            overlay = self.annotator.annotate(frame, detections, counts, in_place=True)
+            annotated = time.perf_counter()
+            for _ in range(repeats):
+                self.writer.write(overlay)
+            end = time.perf_counter()
+
+            self._stage_seconds["annotation"] += annotated - start
+            self._stage_seconds["encoding"] += end - annotated
+            _ANNOTATION_SECONDS.observe(annotated - start)
+            _ENCODING_SECONDS.observe(end - annotated)
+            if self.timeline is not None:
+                self.timeline.add("annotation", frame_idx, start, annotated)
+                self.timeline.add("encoding", frame_idx, annotated, end)
+            self._render_seconds += end - start
+            self._frames_rendered += 1
+            self._frames_written += repeats
+
+    @staticmethod
+    def _scale_directions(directions: List[dict], sx: float, sy: float) -> List[dict]:
+        """Copy of counter directions with line coordinates scaled to the preview size."""
+        def scale_line(line: dict) -> dict:
+            return {
+                'x1': line['x1'] * sx, 'y1': line['y1'] * sy,
+                'x2': line['x2'] * sx, 'y2': line['y2'] * sy,
+            }
+
+        return [
+            {**d, 'entry_line': scale_line(d['entry_line']), 'exit_line': scale_line(d['exit_line'])}
+            for d in directions
+        ]
+
+    @staticmethod
+    def _scale_detections(detections: List[dict], sx: float, sy: float) -> List[dict]:
+        """Copy of detections with boxes and centers scaled to the preview size."""
+        scaled = []
+        for det in detections:
+            x1, y1, x2, y2 = det['bbox']
+            scaled.append({
+                **det,
+                'bbox': (int(x1 * sx), int(y1 * sy), int(x2 * sx), int(y2 * sy)),
+                'cx': det['cx'] * sx,
+                'cy': det['cy'] * sy,
+            })
+        return scaled
+
+    def _should_stop(self) -> bool:
+        """Check the stop event and propagate external cancellation into it."""
+        if self._stop.is_set():
+            return True
+        if is_cancelled(self.processing_id):
+            self._stop.set()
+            return True
+        return False
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        """Put with backpressure; returns False if the pipeline was stopped."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        """Get the next item, or _END if the pipeline was stopped."""
+        while not self._should_stop():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
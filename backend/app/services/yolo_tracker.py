@@ -1,95 +1,240 @@
 from ultralytics import YOLO
-import cv2
-from typing import Generator, List, Dict, Tuple
+import time
+import numpy as np
+from typing import List, Dict, Optional, Sequence, Tuple
 import logging
 
+from app.services.detectors import Detector, FrameTracks, YOLODetector
+from app.services.model_export import ensure_exported
+
 logger = logging.getLogger("yolo_tracker")
 
 
 class YOLOVehicleTracker:
-    """YOLO-based vehicle detection and tracking."""
+    """
+    Vehicle detection and tracking: YOLO with ByteTrack, or another detector
+    (see app.services.detectors) behind the same interface.
+    """
+
+    TRACKER_CONFIG = 'bytetrack.yaml'
+
+    DEFAULT_TRACKER_PARAMS = {
+        'max_age': 120,        
+        'min_hits': 1,          
+        'iou_threshold': 0.05,  
+        'max_det': 300,         
+    }
+
+    # Frames of a batched job tracked one at a time, as its per-frame baseline
+    BASELINE_FRAMES = 8
     
-    def __init__(self, model_path: str, conf: float = 0.45, imgsz: int = 640, device: str = 'cpu'):
+    def __init__(
+        self,
+        model_path: str,
+        conf: float = 0.45,
+        imgsz: int = 640,
+        device: str = 'cpu',
+        model: Optional[YOLO] = None,
+        backend: str = 'torch',
+        detector: Optional[Detector] = None,
+    ):
         """
         Args:
             model_path: Path to YOLO model weights
             conf: Confidence threshold
             imgsz: Input image size
             device: 'cpu' or 'cuda'
+            model: Already loaded model (e.g. from the model registry); loaded from
+                model_path when omitted
+            backend: Inference backend (see ModelConfig.BACKENDS); other than
+                'torch', the weights' export for it is used
+            detector: Detector to use instead of the YOLO model (e.g. a
+                ScriptedDetector); model is then not loaded
         """
-        self.model = YOLO(model_path)
+        self.tracker_params = dict(self.DEFAULT_TRACKER_PARAMS)
+
+        if detector is None:
+            if model is None:
+                model = YOLO(model_path) if backend == 'torch' else YOLO(
+                    ensure_exported(model_path, backend), task='detect'
+                )
+            detector = YOLODetector(
+                model, conf, imgsz, device, self.tracker_params['max_det'], self.TRACKER_CONFIG
+            )
+        self.detector = detector
+        self.model_path = model_path
+        self.backend = backend
         self.conf = conf
         self.imgsz = imgsz
         self.device = device
         
-        self.tracker_params = {
-            'max_age': 120,        
-            'min_hits': 1,          
-            'iou_threshold': 0.05,  
-            'max_det': 300,         
-        }
+        self.inference_seconds = 0.0
+        self.frames_tracked = 0
+        # Per-frame and batched detector calls, timed separately (the very
+        # first call pays for warm-up and is in neither)
+        self._single_seconds = 0.0
+        self._single_frames = 0
+        self._batched_seconds = 0.0
+        self._batched_frames = 0
         
-        logger.info(f"YOLO model loaded: {model_path}, device={device}, conf={conf}")
-        logger.info(f"Tracker parameters: {self.tracker_params}")
+        # (x1, y1, x2, y2) region detection runs on; None for the full frame
+        self.roi: Optional[Tuple[int, int, int, int]] = None
+        # Frames arrive already cropped to the region (by the decoder)
+        self.roi_precropped = False
+        
+        logger.info(
+            "%s detector ready: %s, backend=%s, device=%s, conf=%s",
+            detector.name, model_path, backend, device, conf,
+        )
+        logger.info("Tracker parameters: %s", self.tracker_params)
     
-    def track_video(self, video_path: str) -> Generator[Tuple[int, List[Dict]], None, None]:
+    def set_roi(self, roi: Optional[Tuple[int, int, int, int]], precropped: bool = False) -> None:
         """
-        Track vehicles in video frame by frame.
+        Restrict detection and tracking to a region of the frame.
+        
+        Frames are cropped before inference, so the detector's input
+        resolution is spent on the region only; detections are reported in
+        full-frame coordinates. Boxes are clipped at the region border, so
+        the region should leave room around the counting lines.
         
         Args:
-            video_path: Path to video file
+            roi: (x1, y1, x2, y2) in pixels, x2/y2 exclusive; None for the full frame
+            precropped: Frames passed to track_frames are already cropped to
+                the region (e.g. by the decoder); only the offset is applied
+        """
+        self.roi = roi
+        self.roi_precropped = precropped
+        if roi is not None:
+            logger.info("Inference restricted to region %s", roi)
+
+    def track_frames(
+        self, frames: List[np.ndarray], frame_indices: Optional[Sequence[int]] = None
+    ) -> List[List[Dict]]:
+        """
+        Run detection and tracking on consecutive frames.
+        
+        Args:
+            frames: Frames in playback order
+            frame_indices: Source frame index of each frame; defaults to
+                the frames following the previously tracked ones
             
-        Yields:
-            Tuple of (frame_index, detections, frame)
-            Each detection: {track_id: int, cx: float, cy: float, class_id: int, bbox: tuple}
+        Returns:
+            One detection list per frame, in the same order
         """
-        cap = cv2.VideoCapture(video_path)
+        if frame_indices is None:
+            frame_indices = range(self.frames_tracked, self.frames_tracked + len(frames))
+
+        offset = (0, 0)
+        if self.roi is not None:
+            x1, y1, x2, y2 = self.roi
+            if not self.roi_precropped:
+                frames = [frame[y1:y2, x1:x2] for frame in frames]
+            offset = (x1, y1)
         
-        if not cap.isOpened():
-            raise RuntimeError(f"Cannot open video: {video_path}")
+        if len(frames) > 1 and self._single_frames < self.BASELINE_FRAMES:
+            # Track the first batches frame by frame to measure what batching
+            # gains; ByteTrack consumes frames in order either way
+            tracks = []
+            for i in range(len(frames)):
+                tracks += self._track(frames[i:i + 1], frame_indices[i:i + 1], offset)
+        else:
+            tracks = self._track(frames, frame_indices, offset)
         
-        frame_idx = 0
+        return [self._detections(frame_tracks, offset) for frame_tracks in tracks]
+
+    def _track(
+        self, frames: List[np.ndarray], frame_indices: Sequence[int], offset: Tuple[int, int]
+    ) -> List[FrameTracks]:
+        """One timed detector call."""
+        warm_up = self.frames_tracked == 0
+        start = time.perf_counter()
+        tracks = self.detector.track(frames, frame_indices, offset)
+        seconds = time.perf_counter() - start
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            results = self.model.track(
-                frame,
-                persist=True,
-                conf=max(0.15, self.conf - 0.25),  
-                imgsz=self.imgsz,
-                device=self.device,
-                verbose=False,
-                max_det=self.tracker_params['max_det'],
-                tracker='bytetrack.yaml', 
-            )
-            
-            detections = []
-            
-            if results and results[0].boxes is not None and results[0].boxes.id is not None:
-                boxes = results[0].boxes.xyxy.cpu().numpy()
-                track_ids = results[0].boxes.id.int().cpu().tolist()
-                class_ids = results[0].boxes.cls.int().cpu().tolist()
-                confidences = results[0].boxes.conf.cpu().numpy()
-                
-                for box, track_id, class_id, conf in zip(boxes, track_ids, class_ids, confidences):
-                    x1, y1, x2, y2 = box
-                    cx = (x1 + x2) / 2
-                    cy = (y1 + y2) / 2
-                    
-                    detections.append({
-                        'track_id': track_id,
-                        'cx': cx,
-                        'cy': cy,
-                        'class_id': class_id,
-                        'bbox': (int(x1), int(y1), int(x2), int(y2)),
-                        'confidence': float(conf),
-                    })
+        self.inference_seconds += seconds
+        self.frames_tracked += len(frames)
+        if warm_up:
+            return tracks
+        if len(frames) == 1:
+            self._single_seconds += seconds
+            self._single_frames += 1
+        else:
+            self._batched_seconds += seconds
+            self._batched_frames += len(frames)
+        return tracks
+
+    @staticmethod
+    def _detections(tracks: FrameTracks, offset: Tuple[int, int] = (0, 0)) -> List[Dict]:
+        """
+        Convert a frame's tracked boxes into detection dictionaries.
+        
+        Args:
+            tracks: Detector output for the frame
+            offset: (x, y) added to box coordinates, to map a crop back to the frame
+        """
+        boxes = tracks.boxes
+        if offset != (0, 0):
+            boxes = boxes + np.array([offset[0], offset[1], offset[0], offset[1]], dtype=boxes.dtype)
+        
+        detections = []
+        for box, track_id, class_id, conf in zip(
+            boxes, tracks.track_ids.tolist(), tracks.class_ids.tolist(), tracks.confidences
+        ):
+            x1, y1, x2, y2 = box
+            cx = (x1 + x2) / 2
+            cy = (y1 + y2) / 2
             
-            yield frame_idx, detections, frame
-            frame_idx += 1
+            detections.append({
+                'track_id': track_id,
+                'cx': cx,
+                'cy': cy,
+                'class_id': class_id,
+                'bbox': (int(x1), int(y1), int(x2), int(y2)),
+                'confidence': float(conf),
+            })
         
-        cap.release()
-        logger.info(f"Video processing complete: {frame_idx} frames")
+        return detections
+
+    @property
+    def inference_fps(self) -> float:
+        """Frames per second spent in detection and tracking so far."""
+        if self.inference_seconds <= 0:
+            return 0.0
+        return self.frames_tracked / self.inference_seconds
+
+    @property
+    def seconds_per_frame(self) -> Optional[float]:
+        """Average detection and tracking time per tracked frame, if any."""
+        if not self.frames_tracked:
+            return None
+        return self.inference_seconds / self.frames_tracked
+
+    def throughput_stats(self, batch_size: int) -> Dict:
+        """
+        Summarize inference throughput for the job metadata.
+        
+        With batch_size > 1, the first frames are tracked one at a time (see
+        track_frames); their rate is the baseline the batched calls of the
+        same job are compared with.
+        """
+        fps = self.inference_fps
+        baseline = self._single_frames / self._single_seconds if self._single_seconds > 0 else None
+        batched = self._batched_frames / self._batched_seconds if self._batched_seconds > 0 else None
+        return {
+            "backend": self.backend,
+            "batch_size": batch_size,
+            "inference_seconds": round(self.inference_seconds, 2),
+            "inference_fps": round(fps, 2),
+            "baseline_fps": round(baseline, 2) if baseline and batch_size > 1 else None,
+            "fps_gain": round(batched - baseline, 2) if baseline and batched and batch_size > 1 else None,
+        }
+
+    @classmethod
+    def settings_fingerprint(cls, conf: float, imgsz: int) -> Dict:
+        """Settings that change tracking output, for result cache keys."""
+        return {
+            'conf': conf,
+            'imgsz': imgsz,
+            'tracker': cls.TRACKER_CONFIG,
+            **cls.DEFAULT_TRACKER_PARAMS,
+        }
@@ -1,36 +1,52 @@
-"""Processing cancellation tracking."""
-from datetime import datetime
-from typing import Dict
+"""Processing cancellation tracking, backed by the persistent job store."""
+import time
+import threading
+from typing import Dict, Tuple
 
-# Global task registry
-processing_tasks: Dict[str, dict] = {}
+from app.utils import job_store
 
+# How long a cancellation lookup may be served from memory
+CHECK_INTERVAL = 0.5
 
-def register_task(processing_id: str) -> None:
-    """Register a new processing task."""
-    processing_tasks[processing_id] = {"cancelled": False}
+# processing_id -> (cancelled, checked_at); keeps per-frame checks off the database
+_cache: Dict[str, Tuple[bool, float]] = {}
+_cache_lock = threading.Lock()
 
 
 def is_cancelled(processing_id: str) -> bool:
     """Check if a task has been cancelled."""
-    return processing_tasks.get(processing_id, {}).get("cancelled", False)
+    now = time.monotonic()
+    cached = _cache.get(processing_id)
+    if cached is not None and (cached[0] or now - cached[1] < CHECK_INTERVAL):
+        return cached[0]
+
+    cancelled = job_store.is_cancel_requested(processing_id)
+    with _cache_lock:
+        _cache[processing_id] = (cancelled, now)
+    return cancelled
 
 
 def mark_cancelled(processing_id: str) -> None:
     """Mark a task as cancelled."""
-    if processing_id in processing_tasks:
-        processing_tasks[processing_id]["cancelled"] = True
+    if job_store.request_cancel(processing_id) is not None:
+        with _cache_lock:
+            _cache[processing_id] = (True, time.monotonic())
 
 
-def mark_completed(processing_id: str, error: str = None) -> None:
-    """Mark a task as completed."""
-    if processing_id in processing_tasks:
-        processing_tasks[processing_id]["completed"] = True
-        processing_tasks[processing_id]["completed_time"] = datetime.now()
-        if error:
-            processing_tasks[processing_id]["error"] = error
+def forget(processing_id: str) -> None:
+    """Drop the cached cancellation flag of a finished task."""
+    with _cache_lock:
+        _cache.pop(processing_id, None)
 
 
 def get_task_status(processing_id: str) -> dict:
     """Get current task status."""
-    return processing_tasks.get(processing_id, {})
+    job = job_store.get_job(processing_id)
+    if job is None:
+        return {}
+    return {
+        "cancelled": job["cancel_requested"],
+        "completed": job["status"] in job_store.FINISHED_STATUSES,
+        "status": job["status"],
+        "error": job["error"],
+    }
@@ -0,0 +1,317 @@
+"""SQLite-backed store for queued, running and finished counting jobs."""
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+DB_PATH = os.getenv("VCOUNT_JOBS_DB", "jobs.db")
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    progress TEXT,
+    expired_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+# Columns added after the first release, applied to existing databases
+_MIGRATIONS = {
+    "priority": "ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0",
+    "worker_pid": "ALTER TABLE jobs ADD COLUMN worker_pid INTEGER",
+    "progress": "ALTER TABLE jobs ADD COLUMN progress TEXT",
+    "expired_at": "ALTER TABLE jobs ADD COLUMN expired_at REAL",
+}
+
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """Open a short-lived connection; safe to use from any thread or process."""
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def init_db() -> None:
+    """Create tables if needed."""
+    with _connect() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, statement in _MIGRATIONS.items():
+            if column not in columns:
+                conn.execute(statement)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_claim_order ON jobs (status, priority DESC, created_at)"
+        )
+
+
+def create_job(
+    job_id: str,
+    params: dict,
+    status: str = QUEUED,
+    result: Optional[dict] = None,
+    priority: int = 0,
+) -> None:
+    """
+    Insert a new job. Higher priority jobs are claimed first.
+
+    Raises:
+        ValueError: If a job with this id already exists
+    """
+    now = time.time()
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, result, created_at, finished_at, priority) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    status,
+                    json.dumps(params),
+                    json.dumps(result) if result is not None else None,
+                    now,
+                    now if status in FINISHED_STATUSES else None,
+                    priority,
+                ),
+            )
+    except sqlite3.IntegrityError:
+        raise ValueError(f"Job already exists: {job_id}")
+
+
+def claim_next(worker_pid: Optional[int] = None) -> Optional[dict]:
+    """
+    Atomically move the next queued job to running and return it.
+    Jobs are taken by priority (highest first), then in submission order.
+    """
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? "
+                "ORDER BY priority DESC, created_at LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, worker_pid = ? WHERE id = ?",
+                (RUNNING, time.time(), worker_pid, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    job = _to_dict(row)
+    job["status"] = RUNNING
+    job["worker_pid"] = worker_pid
+    return job
+
+
+def finish_job(job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+    """Record the final status of a job."""
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (
+                status,
+                json.dumps(result) if result is not None else None,
+                error,
+                time.time(),
+                job_id,
+            ),
+        )
+
+
+def set_progress(job_id: str, progress: dict) -> None:
+    """Store the latest progress snapshot of a running job."""
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id)
+        )
+
+
+def get_progress(job_id: str) -> Optional[dict]:
+    """
+    Status and latest progress snapshot of a job, without loading its
+    parameters or result.
+
+    Returns:
+        Dict with status, progress and error, or None if the job is unknown
+    """
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT status, progress, error FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "status": row["status"],
+        "progress": json.loads(row["progress"]) if row["progress"] else None,
+        "error": row["error"],
+    }
+
+
+def request_cancel(job_id: str) -> Optional[str]:
+    """
+    Flag a job for cancellation. Queued jobs are cancelled immediately,
+    running jobs stop at their next cancellation check.
+
+    Returns:
+        The job status before the request, or None if the job is unknown
+    """
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        if row["status"] == QUEUED:
+            conn.execute(
+                "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ?",
+                (CANCELLED, time.time(), job_id),
+            )
+        elif row["status"] == RUNNING:
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        conn.execute("COMMIT")
+    return row["status"]
+
+
+def is_cancel_requested(job_id: str) -> bool:
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    return bool(row and row["cancel_requested"])
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Return a job as a dict, or None if unknown."""
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _to_dict(row) if row is not None else None
+
+
+def queue_position(job_id: str) -> Optional[int]:
+    """Number of queued jobs ahead of this one, or None if it is not queued."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT created_at, priority FROM jobs WHERE id = ? AND status = ?", (job_id, QUEUED)
+        ).fetchone()
+        if row is None:
+            return None
+        ahead = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? "
+            "AND (priority > ? OR (priority = ? AND created_at < ?))",
+            (QUEUED, row["priority"], row["priority"], row["created_at"]),
+        ).fetchone()[0]
+    return ahead
+
+
+def count_by_status() -> dict:
+    """Number of jobs in each status."""
+    with _connect() as conn:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+    return {row["status"]: row["n"] for row in rows}
+
+
+def list_jobs(statuses: tuple) -> list:
+    """Jobs in the given statuses, in the order workers would claim them."""
+    placeholders = ",".join("?" * len(statuses))
+    with _connect() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM jobs WHERE status IN ({placeholders}) "
+            "ORDER BY priority DESC, created_at",
+            statuses,
+        ).fetchall()
+    return [_to_dict(row) for row in rows]
+
+
+def expire_results(filenames: list) -> int:
+    """
+    Mark completed jobs whose results refer to any of these result files
+    (e.g. files evicted from the result cache) as expired.
+
+    Returns:
+        Number of jobs marked
+    """
+    names = [name for name in filenames if name]
+    if not names:
+        return 0
+    matches = " OR ".join("instr(result, ?) > 0" for _ in names)
+    with _connect() as conn:
+        cursor = conn.execute(
+            f"UPDATE jobs SET expired_at = ? WHERE status = ? AND expired_at IS NULL AND ({matches})",
+            (time.time(), COMPLETED, *names),
+        )
+    return cursor.rowcount
+
+
+def fail_orphaned(worker_pid: int, error: str) -> int:
+    """
+    Fail jobs still marked running by a worker process that has exited.
+
+    Returns:
+        Number of jobs failed
+    """
+    with _connect() as conn:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+            "WHERE status = ? AND worker_pid = ?",
+            (FAILED, error, time.time(), RUNNING, worker_pid),
+        )
+    return cursor.rowcount
+
+
+def requeue_interrupted() -> int:
+    """
+    Put jobs left 'running' by a previous server process back in the queue,
+    or mark them cancelled if cancellation had been requested.
+
+    Returns:
+        Number of jobs requeued
+    """
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE status = ? AND cancel_requested = 1",
+            (CANCELLED, time.time(), RUNNING),
+        )
+        cursor = conn.execute(
+            "UPDATE jobs SET status = ?, started_at = NULL, worker_pid = NULL, progress = NULL "
+            "WHERE status = ?",
+            (QUEUED, RUNNING),
+        )
+    return cursor.rowcount
+
+
+def _to_dict(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    job["progress"] = json.loads(job["progress"]) if job["progress"] else None
+    return job
@@ -0,0 +1,312 @@
+"""Content-addressed video storage with streaming and resumable uploads."""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Set, Tuple
+from uuid import uuid4
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.services import metrics
+
+logger = logging.getLogger("app")
+
+UPLOAD_FOLDER = Path("videos")
+PARTIAL_FOLDER = UPLOAD_FOLDER / "partial"
+
+UPLOAD_FOLDER.mkdir(exist_ok=True)
+PARTIAL_FOLDER.mkdir(exist_ok=True)
+
+CHUNK_SIZE = 1024 * 1024
+
+# Resumable uploads untouched for longer are purged (0 keeps them)
+PARTIAL_MAX_AGE = float(os.getenv("VCOUNT_PARTIAL_UPLOAD_HOURS", "24")) * 3600
+
+_VIDEO_ID = re.compile(r"^[0-9a-f]{64}$")
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Ids of resumable uploads being written to or completed
+_busy: Set[str] = set()
+_busy_lock = threading.Lock()
+
+
+async def save_upload(video: UploadFile) -> Tuple[str, Path]:
+    """
+    Stream an uploaded file to disk in fixed-size chunks, hashing it on the fly.
+
+    Identical content is stored once; uploading the same video again reuses
+    the existing file. Writing and hashing run in the thread pool, so large
+    uploads do not block the event loop.
+
+    Args:
+        video: Uploaded file from a multipart form
+
+    Returns:
+        Tuple of (video_id, path) where video_id is the SHA-256 of the content
+    """
+    tmp_path = PARTIAL_FOLDER / f"{uuid4().hex}.tmp"
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := await video.read(CHUNK_SIZE):
+                await run_in_threadpool(_write_chunk, f, chunk, hasher)
+                size += len(chunk)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    metrics.UPLOAD_BYTES.inc(size)
+    metrics.UPLOADS.inc()
+
+    video_id = hasher.hexdigest()
+    path = _store(tmp_path, video_id, Path(video.filename or "").suffix)
+    logger.info("Stored upload %s (%d bytes) as %s", video.filename, size, path)
+    return video_id, path
+
+
+async def resolve_video(video: Optional[UploadFile], video_id: str) -> Tuple[str, Path]:
+    """
+    Return the stored video for a request that sends either a file or the
+    video_id of an earlier upload.
+
+    Raises:
+        HTTPException: If neither is given or the video_id is unknown
+    """
+    if video_id:
+        return video_id, find_video(video_id)
+    if video is None:
+        raise HTTPException(400, "Either video or video_id is required")
+    return await save_upload(video)
+
+
+def find_video(video_id: str) -> Path:
+    """
+    Look up a stored video by its content hash.
+
+    Raises:
+        HTTPException: If the id is malformed or no such video exists
+    """
+    if not _VIDEO_ID.match(video_id):
+        raise HTTPException(400, "Invalid video_id")
+    for path in UPLOAD_FOLDER.glob(f"{video_id}*"):
+        if path.is_file():
+            return path
+    raise HTTPException(404, f"Video not found: {video_id}")
+
+
+def create_resumable(filename: str) -> str:
+    """Start a resumable upload and return its id; stale partial uploads are purged first."""
+    purge_stale_partials()
+    upload_id = uuid4().hex
+    now = time.time()
+    _partial_path(upload_id, must_exist=False).touch()
+    _meta_path(upload_id).write_text(json.dumps({"filename": filename, "created_at": now, "updated_at": now}))
+    return upload_id
+
+
+def purge_stale_partials(max_age: float = PARTIAL_MAX_AGE) -> int:
+    """
+    Delete resumable uploads not written to for max_age seconds, and temp
+    files of interrupted direct uploads. Uploads busy with a request are kept.
+
+    Returns:
+        Number of uploads and temp files deleted
+    """
+    if max_age <= 0:
+        return 0
+    cutoff = time.time() - max_age
+    purged = 0
+
+    for tmp_path in PARTIAL_FOLDER.glob("*.tmp"):
+        if _mtime(tmp_path) < cutoff:
+            tmp_path.unlink(missing_ok=True)
+            purged += 1
+
+    upload_ids = {path.stem for path in PARTIAL_FOLDER.glob("*.part")}
+    upload_ids |= {path.stem for path in PARTIAL_FOLDER.glob("*.json")}
+    for upload_id in upload_ids:
+        path, meta_path = PARTIAL_FOLDER / f"{upload_id}.part", _meta_path(upload_id)
+        with _busy_lock:
+            if upload_id in _busy:
+                continue
+            _busy.add(upload_id)
+        try:
+            try:
+                updated = json.loads(meta_path.read_text())["updated_at"]
+            except (OSError, ValueError, KeyError, TypeError):
+                # Uploads started before timestamps were recorded, or half-removed ones
+                updated = max(_mtime(path), _mtime(meta_path))
+            if updated < cutoff:
+                path.unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+                purged += 1
+                logger.info("Purged stale resumable upload %s", upload_id)
+        finally:
+            with _busy_lock:
+                _busy.discard(upload_id)
+    return purged
+
+
+def resumable_offset(upload_id: str) -> int:
+    """Return how many bytes of a resumable upload have been received."""
+    return _received(upload_id, _partial_path(upload_id))
+
+
+async def append_resumable(upload_id: str, offset: int, stream) -> int:
+    """
+    Append a chunk to a resumable upload.
+
+    The body is buffered into CHUNK_SIZE pieces that are written from the
+    thread pool. Only one request at a time may write to an upload.
+
+    Args:
+        upload_id: Id returned by create_resumable
+        offset: Byte offset the client believes it is writing at
+        stream: Async iterator of request body bytes
+
+    Returns:
+        New received size in bytes
+
+    Raises:
+        HTTPException: 409 if offset does not match the received size or
+            another request is writing to the upload
+    """
+    path = _partial_path(upload_id)
+    with _exclusive(upload_id):
+        received = _received(upload_id, path)
+        if offset != received:
+            raise HTTPException(409, f"Offset mismatch, server has {received} bytes")
+
+        appended = received
+        buffer = bytearray()
+        with open(path, "ab") as f:
+            async for chunk in stream:
+                buffer += chunk
+                if len(buffer) >= CHUNK_SIZE:
+                    await run_in_threadpool(f.write, bytes(buffer))
+                    received += len(buffer)
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(f.write, bytes(buffer))
+                received += len(buffer)
+        await run_in_threadpool(_touch_meta, upload_id)
+    metrics.UPLOAD_BYTES.inc(received - appended)
+    return received
+
+
+def complete_resumable(upload_id: str) -> Tuple[str, Path]:
+    """
+    Hash a finished resumable upload and move it into the video store.
+
+    Raises:
+        HTTPException: 409 if a chunk is still being written to the upload
+    """
+    path = _partial_path(upload_id)
+    meta_path = _meta_path(upload_id)
+
+    with _exclusive(upload_id):
+        try:
+            filename = json.loads(meta_path.read_text()).get("filename", "")
+            hasher = hashlib.sha256()
+            with open(path, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    hasher.update(chunk)
+        except FileNotFoundError:
+            raise HTTPException(404, f"Upload not found: {upload_id}")
+
+        video_id = hasher.hexdigest()
+        stored = _store(path, video_id, Path(filename).suffix)
+        meta_path.unlink(missing_ok=True)
+    metrics.UPLOADS.inc()
+    logger.info("Completed resumable upload %s as %s", upload_id, stored)
+    return video_id, stored
+
+
+def _write_chunk(f, chunk: bytes, hasher) -> None:
+    hasher.update(chunk)
+    f.write(chunk)
+
+
+def _touch_meta(upload_id: str) -> None:
+    """Record that a resumable upload was written to."""
+    meta_path = _meta_path(upload_id)
+    meta = json.loads(meta_path.read_text())
+    meta["updated_at"] = time.time()
+    meta_path.write_text(json.dumps(meta))
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _received(upload_id: str, path: Path) -> int:
+    """
+    Bytes received so far by a resumable upload.
+
+    Raises:
+        HTTPException: 404 if its data file is gone (e.g. already completed)
+    """
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        raise HTTPException(404, f"Upload not found: {upload_id}")
+
+
+@contextmanager
+def _exclusive(upload_id: str) -> Iterator[None]:
+    """
+    Hold a resumable upload for one writer.
+
+    Raises:
+        HTTPException: 409 if another request holds it
+    """
+    with _busy_lock:
+        if upload_id in _busy:
+            raise HTTPException(409, f"Upload {upload_id} is busy with another request")
+        _busy.add(upload_id)
+    try:
+        yield
+    finally:
+        with _busy_lock:
+            _busy.discard(upload_id)
+
+
+def _store(tmp_path: Path, video_id: str, suffix: str) -> Path:
+    """Move a finished temp file to its content-addressed location."""
+    for existing in UPLOAD_FOLDER.glob(f"{video_id}*"):
+        if existing.is_file():
+            tmp_path.unlink(missing_ok=True)
+            return existing
+
+    path = UPLOAD_FOLDER / f"{video_id}{suffix.lower()}"
+    os.replace(tmp_path, path)
+    return path
+
+
+def _partial_path(upload_id: str, must_exist: bool = True) -> Path:
+    """
+    Path of a resumable upload's data file.
+
+    Raises:
+        HTTPException: If the id is malformed, or unknown when must_exist is set
+    """
+    if not _UPLOAD_ID.match(upload_id):
+        raise HTTPException(400, "Invalid upload_id")
+    path = PARTIAL_FOLDER / f"{upload_id}.part"
+    if must_exist and not _meta_path(upload_id).exists():
+        raise HTTPException(404, f"Upload not found: {upload_id}")
+    return path
+
+
+def _meta_path(upload_id: str) -> Path:
+    return PARTIAL_FOLDER / f"{upload_id}.json"
@@ -0,0 +1,87 @@
+"""
+A/B benchmark of inference backends against the PyTorch path.
+
+Counts every video with the PyTorch weights and with each requested
+backend, and reports inference fps, speed-up and count agreement. Exports
+are created on first use and cached next to the weights, like in jobs.
+Exits with status 1 if any backend agrees less than --min-agreement.
+
+Usage (from the backend folder):
+    python -m benchmarks.backend_ab --directions directions.json --backends onnx,openvino video1.mp4
+"""
+import sys
+import json
+import argparse
+from dataclasses import replace
+
+from app.config.model_config import ModelConfig
+from app.config.processing_config import ProcessingOptions
+from app.services.model_registry import model_registry
+from benchmarks.common import count_agreement, count_video, load_directions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("videos", nargs="+", help="Validation videos")
+    parser.add_argument("--directions", required=True, help="JSON file with the directions payload")
+    parser.add_argument("--model", default="yolo11n-best.pt", help="Model name")
+    parser.add_argument(
+        "--backends", default="onnx,onnx-int8,openvino",
+        help=f"Comma separated backends to compare with torch ({', '.join(ModelConfig.EXPORT_BACKENDS)})",
+    )
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Lowest acceptable count agreement")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    for backend in backends:
+        if backend not in ModelConfig.EXPORT_BACKENDS:
+            parser.error(f"unknown backend: {backend}")
+
+    directions = load_directions(args.directions)
+    baseline_options = ProcessingOptions(batch_size=args.batch_size, output_mode='counts_only')
+
+    report = []
+    for video in args.videos:
+        baseline, baseline_stats = count_video(video, directions, args.model, baseline_options)
+        baseline_fps = baseline_stats["throughput"]["inference_fps"]
+        entry = {"video": video, "torch": {"results": baseline, **baseline_stats}}
+        print(f"{video}: torch {baseline_fps} inference fps, {baseline_stats['wall_seconds']:.1f}s")
+
+        for backend in backends:
+            results, stats = count_video(
+                video, directions, args.model, replace(baseline_options, backend=backend)
+            )
+            fps = stats["throughput"]["inference_fps"]
+            agreement = count_agreement(baseline, results)
+            entry[backend] = {
+                "results": results,
+                **stats,
+                "inference_speedup": round(fps / baseline_fps, 2) if baseline_fps else None,
+                "count_agreement": round(agreement, 4),
+            }
+            print(
+                f"  {backend}: {fps} inference fps ({entry[backend]['inference_speedup']}x), "
+                f"{stats['wall_seconds']:.1f}s, counts agree {agreement:.1%}"
+            )
+            if agreement < args.min_agreement:
+                print(f"    torch:   {json.dumps(baseline)}")
+                print(f"    {backend}: {json.dumps(results)}")
+        report.append(entry)
+
+    # Load time of every backend, including its export on first use
+    models = model_registry.stats()
+    for model in models:
+        print(f"{model['name']} ({model['backend']}): loaded in {model['load_seconds']}s, {model['size_mb']} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"videos": report, "models": models}, f, indent=2)
+
+    ok = all(entry[b]["count_agreement"] >= args.min_agreement for entry in report for b in backends)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
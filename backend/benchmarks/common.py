@@ -0,0 +1,160 @@
+"""Shared helpers for benchmark and A/B scripts."""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from dataclasses import replace
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+from app.config.processing_config import ProcessingOptions
+from app.services.count_job import create_components
+from app.services.decoders import create_decoder, decoded_size
+from app.services.video_processor import VideoProcessor
+from app.utils import job_store
+
+
+def load_directions(path: str) -> List[dict]:
+    """Read a directions payload (as sent by the frontend) from a JSON file."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def count_video(
+    video_path: str,
+    directions: List[dict],
+    model_name: str,
+    options: ProcessingOptions,
+    run_id: str = "benchmark",
+    output_path: Optional[str] = None,
+) -> Tuple[Dict, Dict]:
+    """
+    Count vehicles in a video without writing results.
+
+    Args:
+        output_path: Where to write the annotated video when the output mode
+            writes one; without it, the video is only counted (counts_only)
+
+    Returns:
+        (results, stats) where stats has wall time, frame count, throughput,
+        motion gate, frame sampling, decoder, output and per-stage statistics
+    """
+    job_store.init_db()
+    if output_path is None:
+        options = replace(options, output_mode='counts_only')
+
+    cap = cv2.VideoCapture(video_path)
+    ret, frame = cap.read()
+    if not ret:
+        raise RuntimeError(f"Cannot read video: {video_path}")
+    h, w = frame.shape[:2]
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    cap.release()
+
+    w, h = decoded_size(w, h, options.decode_width)
+    params = {"model_name": model_name, "directions": directions}
+    tracker, counter, roi, motion_gate, stride = create_components(params, options, w, h)
+    decoder = create_decoder(
+        video_path, options.decoder, (w, h), roi if options.decoder_crops_roi else None
+    )
+
+    writer = None
+    if options.writes_video:
+        writer = cv2.VideoWriter(
+            output_path, cv2.VideoWriter_fourcc(*'mp4v'), options.output_fps(fps), options.output_size(w, h)
+        )
+
+    processor = VideoProcessor(
+        tracker=tracker,
+        counter=counter,
+        directions_data=directions,
+        writer=writer,
+        video_path=video_path,
+        processing_id=run_id,
+        options=options,
+        fps=fps,
+        motion_gate=motion_gate,
+        stride=stride,
+        decoder=decoder,
+    )
+
+    start = time.perf_counter()
+    try:
+        frame_count = processor.process_frames()
+    finally:
+        if writer is not None:
+            writer.release()
+    wall_seconds = time.perf_counter() - start
+
+    stats = {
+        "frames": frame_count + 1,
+        "wall_seconds": round(wall_seconds, 3),
+        "fps": round((frame_count + 1) / wall_seconds, 2) if wall_seconds > 0 else None,
+        "throughput": tracker.throughput_stats(options.batch_size),
+        "motion_gate": motion_gate.stats(tracker.seconds_per_frame) if motion_gate else None,
+        "sampling": processor.sampling_stats(),
+        "decoder": processor.decode_stats(),
+        "output": processor.output_stats(),
+        "stages": processor.stage_stats(),
+    }
+    return counter.get_results(), stats
+
+
+def count_agreement(baseline: Dict, other: Dict) -> float:
+    """
+    1 minus the summed absolute count differences per direction and vehicle
+    class, relative to the baseline's total count.
+    """
+    diff = total = 0
+    for direction, counts in baseline.items():
+        for category, n in counts.items():
+            if category == 'total':
+                continue
+            diff += abs(n - other.get(direction, {}).get(category, 0))
+            total += n
+    return 1.0 - diff / total if total else float(diff == 0)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far, in MB."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1 << 20), 1)
+    except ImportError:
+        return None
+
+
+def run_metadata() -> Dict:
+    """Where and on what code a benchmark ran, for comparing reports."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+    }
+
+
+def write_report(path: str, report: Dict) -> None:
+    """Write a benchmark report as JSON."""
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,92 @@
+"""
+Compare two benchmark reports and flag regressions.
+
+Matches cases by name and prints the relative change of every metric.
+Metrics ending in _fps or _accuracy are better when higher; all others
+(times, memory) are better when lower. Exits with status 1 if any metric
+got worse by more than --threshold.
+
+Usage (from the backend folder):
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.05
+"""
+import sys
+import json
+import argparse
+from typing import Dict, List, Optional
+
+HIGHER_IS_BETTER = ("_fps", "_accuracy")
+
+
+def relative_change(old: Optional[float], new: Optional[float]) -> Optional[float]:
+    if old is None or new is None or old == 0:
+        return None
+    return (new - old) / abs(old)
+
+
+def compare(baseline: Dict, candidate: Dict, threshold: float) -> List[Dict]:
+    """
+    Per-metric changes of the cases both reports have.
+
+    Returns:
+        One row per (case, metric): old and new values, relative change and
+        whether it is a regression beyond threshold
+    """
+    old_cases = {case["name"]: case["metrics"] for case in baseline["cases"]}
+    rows = []
+    for case in candidate["cases"]:
+        old = old_cases.get(case["name"])
+        if old is None:
+            continue
+        for metric, new_value in case["metrics"].items():
+            change = relative_change(old.get(metric), new_value)
+            worse = change is not None and (
+                -change if metric.endswith(HIGHER_IS_BETTER) else change
+            ) > threshold
+            rows.append({
+                "case": case["name"],
+                "metric": metric,
+                "old": old.get(metric),
+                "new": new_value,
+                "change": round(change, 4) if change is not None else None,
+                "regression": worse,
+            })
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline", help="Report of the reference run")
+    parser.add_argument("candidate", help="Report of the run to check")
+    parser.add_argument("--threshold", type=float, default=0.05, help="Largest acceptable relative slowdown")
+    parser.add_argument("--output", help="Also write the comparison as JSON to this file")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline.get("benchmark") != candidate.get("benchmark"):
+        parser.error(f"cannot compare a {baseline.get('benchmark')} report with a {candidate.get('benchmark')} report")
+
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "n/a"
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['case']:<28} {row['metric']:<28} {row['old']!s:>10} -> {row['new']!s:>10} {change:>8}{flag}")
+
+    regressions = [row for row in rows if row["regression"]]
+    print(f"{len(rows)} metrics compared, {len(regressions)} regressions beyond {args.threshold:.0%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "baseline": baseline.get("meta"),
+                "candidate": candidate.get("meta"),
+                "threshold": args.threshold,
+                "metrics": rows,
+            }, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Micro-benchmark of VehicleCounter.update as directions and tracks grow.
+
+Every case counts a fixed set of moving tracks against a number of
+directions for a few hundred frames, once through update (per-detection
+dicts, as the pipeline calls it) and once through update_arrays (columns).
+Detections are built before timing, so only the counter is measured.
+Reports microseconds per frame and nanoseconds per (track x direction)
+pair, as JSON that benchmarks.compare can diff against another run.
+
+Usage (from the backend folder):
+    python -m benchmarks.counter_bench --directions 1,4,16,64 --tracks 10,100,1000 --output counter.json
+"""
+import sys
+import time
+import logging
+import argparse
+from typing import Dict, List
+
+import numpy as np
+
+from app.services.vehicle_counter import VehicleCounter
+from benchmarks.common import run_metadata, write_report
+
+FRAME_W, FRAME_H = 1920, 1080
+
+
+def make_directions(n: int, rng: np.random.Generator) -> List[Dict]:
+    """n directions, each a pair of parallel lines a fifth of the frame apart at a random angle."""
+    directions = []
+    for i in range(n):
+        angle = rng.uniform(0, np.pi)
+        cx, cy = rng.uniform(0.3, 0.7, size=2)
+        dx, dy = 0.25 * np.cos(angle), 0.25 * np.sin(angle)
+        nx, ny = -np.sin(angle) * 0.1, np.cos(angle) * 0.1
+        lines = [
+            {
+                "x1": cx + s * nx - dx, "y1": cy + s * ny - dy,
+                "x2": cx + s * nx + dx, "y2": cy + s * ny + dy,
+                "isEntry": s < 0,
+            }
+            for s in (-1, 1)
+        ]
+        directions.append({"id": f"d{i + 1}", "from": f"A{i}", "to": f"B{i}", "color": 0xFF00C853, "lines": lines})
+    return directions
+
+
+def make_frames(tracks: int, frames: int, rng: np.random.Generator) -> List[Dict]:
+    """Per-frame columns of tracks moving in straight lines; tracks leaving the frame are replaced."""
+    pos = rng.uniform(0, 1, size=(tracks, 2)) * (FRAME_W, FRAME_H)
+    vel = rng.normal(0, 6, size=(tracks, 2))
+    ids = np.arange(1, tracks + 1)
+    classes = rng.integers(0, 4, size=tracks)
+    next_id = tracks + 1
+
+    out = []
+    for _ in range(frames):
+        pos += vel
+        gone = (pos[:, 0] < 0) | (pos[:, 0] >= FRAME_W) | (pos[:, 1] < 0) | (pos[:, 1] >= FRAME_H)
+        n_gone = int(gone.sum())
+        if n_gone:
+            pos[gone] = rng.uniform(0, 1, size=(n_gone, 2)) * (FRAME_W, FRAME_H)
+            ids[gone] = np.arange(next_id, next_id + n_gone)
+            next_id += n_gone
+        out.append({
+            "track_ids": ids.tolist(),
+            "cx": pos[:, 0].copy(),
+            "cy": pos[:, 1].copy(),
+            "class_ids": classes.tolist(),
+        })
+    return out
+
+
+def time_counter(directions: List[Dict], frames: List[Dict], columns: bool) -> float:
+    """Seconds to count all frames with a fresh counter."""
+    counter = VehicleCounter(directions, FRAME_W, FRAME_H)
+    if columns:
+        start = time.perf_counter()
+        for idx, f in enumerate(frames):
+            counter.update_arrays(f["track_ids"], f["cx"], f["cy"], f["class_ids"], idx)
+        return time.perf_counter() - start
+
+    detections = [
+        [
+            {"track_id": t, "cx": float(x), "cy": float(y), "class_id": c}
+            for t, x, y, c in zip(f["track_ids"], f["cx"], f["cy"], f["class_ids"])
+        ]
+        for f in frames
+    ]
+    start = time.perf_counter()
+    for idx, dets in enumerate(detections):
+        counter.update(dets, idx)
+    return time.perf_counter() - start
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--directions", type=parse_ints, default=[1, 4, 16, 64], help="Comma separated direction counts")
+    parser.add_argument("--tracks", type=parse_ints, default=[10, 100, 1000], help="Comma separated track counts")
+    parser.add_argument("--frames", type=int, default=300, help="Frames counted per case")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    # Counting logs every counted vehicle
+    logging.getLogger("vehicle_counter").setLevel(logging.WARNING)
+
+    report = {"benchmark": "counter", "meta": {**run_metadata(), "frames": args.frames}, "cases": []}
+    for n_directions in args.directions:
+        for n_tracks in args.tracks:
+            rng = np.random.default_rng(args.seed)
+            directions = make_directions(n_directions, rng)
+            frames = make_frames(n_tracks, args.frames, rng)
+            metrics = {}
+            for method, columns in (("update", False), ("update_arrays", True)):
+                seconds = min(time_counter(directions, frames, columns) for _ in range(args.repeat))
+                per_frame = seconds / args.frames
+                metrics[f"{method}_us_per_frame"] = round(per_frame * 1e6, 2)
+                metrics[f"{method}_ns_per_pair"] = round(per_frame * 1e9 / (n_tracks * n_directions), 2)
+
+            name = f"{n_directions}dir/{n_tracks}tracks"
+            report["cases"].append({
+                "name": name,
+                "params": {"directions": n_directions, "tracks": n_tracks},
+                "metrics": metrics,
+            })
+            print(
+                f"{name}: update {metrics['update_us_per_frame']} us/frame, "
+                f"update_arrays {metrics['update_arrays_us_per_frame']} us/frame"
+            )
+
+    if args.output:
+        write_report(args.output, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
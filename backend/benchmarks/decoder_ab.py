@@ -0,0 +1,128 @@
+"""
+A/B benchmark of the OpenCV and ffmpeg decoders.
+
+Decodes every video with both decoders at the same frame size and reports
+decode throughput and CPU time (the ffmpeg subprocess included). With
+--directions, each video is also counted with both decoders. Exits with
+status 1 if any counts differ.
+
+Usage (from the backend folder):
+    python -m benchmarks.decoder_ab --decode-width 960 video1.mp4 video2.mp4
+    python -m benchmarks.decoder_ab --directions directions.json --decode-width 960 video1.mp4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from dataclasses import replace
+from typing import Dict
+
+import cv2
+
+from app.config.processing_config import ProcessingOptions
+from app.services.decoders import create_decoder, decoded_size
+from benchmarks.common import count_video, load_directions
+
+DECODERS = ('opencv', 'ffmpeg')
+
+
+def decode_video(video_path: str, decoder: str, decode_width: int, buffers: int) -> Dict:
+    """
+    Decode a whole video without processing the frames.
+
+    Args:
+        buffers: Frames a consumer holds at once, as in the pipeline
+
+    Returns:
+        Frame count, wall and CPU seconds, and frames per second
+    """
+    cap = cv2.VideoCapture(video_path)
+    size = decoded_size(
+        int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), decode_width
+    )
+    cap.release()
+
+    frames = 0
+    cpu_start = os.times()
+    start = time.perf_counter()
+    for _ in create_decoder(video_path, decoder, size).frames(buffers=buffers):
+        frames += 1
+    wall_seconds = time.perf_counter() - start
+    cpu_end = os.times()
+
+    # Children times include the ffmpeg process once it has been reaped
+    cpu_seconds = sum(cpu_end[:4]) - sum(cpu_start[:4])
+    return {
+        "frame_size": list(size),
+        "frames": frames,
+        "wall_seconds": round(wall_seconds, 3),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "fps": round(frames / wall_seconds, 2) if wall_seconds > 0 else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("videos", nargs="+", help="Videos to decode")
+    parser.add_argument("--decode-width", type=int, default=0, help="Scale frames to this width (0 = source size)")
+    parser.add_argument("--buffers", type=int, default=32, help="Frames held by the consumer (ffmpeg ring size)")
+    parser.add_argument("--repeat", type=int, default=2, help="Decode runs per decoder; the fastest is reported")
+    parser.add_argument("--directions", help="JSON file with the directions payload; also compare counts")
+    parser.add_argument("--model", default="yolo11n-best.pt", help="Model name")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--roi", action="store_true", help="Count with roi=true (ffmpeg then crops while decoding)")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    directions = load_directions(args.directions) if args.directions else None
+    base_options = ProcessingOptions(
+        batch_size=args.batch_size, output_mode='counts_only', roi=args.roi, decode_width=args.decode_width,
+    )
+
+    report = []
+    for video in args.videos:
+        decode = {
+            name: min(
+                (decode_video(video, name, args.decode_width, args.buffers) for _ in range(args.repeat)),
+                key=lambda run: run["wall_seconds"],
+            )
+            for name in DECODERS
+        }
+        speedup = (
+            decode["opencv"]["wall_seconds"] / decode["ffmpeg"]["wall_seconds"]
+            if decode["ffmpeg"]["wall_seconds"] else None
+        )
+        entry = {"video": video, "decode": decode, "decode_speedup": round(speedup, 2) if speedup else None}
+        print(
+            f"{video} at {decode['opencv']['frame_size'][0]}x{decode['opencv']['frame_size'][1]}: "
+            f"opencv {decode['opencv']['fps']} fps ({decode['opencv']['cpu_seconds']}s CPU), "
+            f"ffmpeg {decode['ffmpeg']['fps']} fps ({decode['ffmpeg']['cpu_seconds']}s CPU), "
+            f"{entry['decode_speedup']}x"
+        )
+
+        if directions is not None:
+            counts = {
+                name: count_video(video, directions, args.model, replace(base_options, decoder=name))
+                for name in DECODERS
+            }
+            entry["counts_match"] = counts["opencv"][0] == counts["ffmpeg"][0]
+            entry["count"] = {name: {"results": r, **stats} for name, (r, stats) in counts.items()}
+            print(
+                f"  counts {'match' if entry['counts_match'] else 'DIFFER'}, "
+                f"wall {counts['opencv'][1]['wall_seconds']:.1f}s -> {counts['ffmpeg'][1]['wall_seconds']:.1f}s"
+            )
+            if not entry["counts_match"]:
+                print(f"  opencv: {json.dumps(counts['opencv'][0])}")
+                print(f"  ffmpeg: {json.dumps(counts['ffmpeg'][0])}")
+        report.append(entry)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 0 if all(entry.get("counts_match", True) for entry in report) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+A/B check of motion-gated inference.
+
+Counts every video twice, with and without the motion gate, and reports
+counts, skip ratio and speed-up. Exits with status 1 if any counts differ.
+
+Usage (from the backend folder):
+    python -m benchmarks.motion_gate_ab --directions directions.json video1.mp4 video2.mp4
+"""
+import sys
+import json
+import argparse
+from dataclasses import replace
+
+from app.config.processing_config import ProcessingOptions
+from benchmarks.common import count_video, load_directions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("videos", nargs="+", help="Validation videos")
+    parser.add_argument("--directions", required=True, help="JSON file with the directions payload")
+    parser.add_argument("--model", default="yolo11n-best.pt", help="Model name")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    directions = load_directions(args.directions)
+    baseline_options = ProcessingOptions(batch_size=args.batch_size, output_mode='counts_only')
+    gated_options = replace(baseline_options, motion_gate=True)
+
+    report = []
+    for video in args.videos:
+        baseline, baseline_stats = count_video(video, directions, args.model, baseline_options)
+        gated, gated_stats = count_video(video, directions, args.model, gated_options)
+
+        speedup = (
+            baseline_stats["wall_seconds"] / gated_stats["wall_seconds"]
+            if gated_stats["wall_seconds"] else None
+        )
+        entry = {
+            "video": video,
+            "counts_match": baseline == gated,
+            "baseline": {"results": baseline, **baseline_stats},
+            "motion_gate": {"results": gated, **gated_stats},
+            "wall_speedup": round(speedup, 2) if speedup else None,
+        }
+        report.append(entry)
+
+        gate = gated_stats["motion_gate"]
+        print(
+            f"{video}: counts {'match' if entry['counts_match'] else 'DIFFER'}, "
+            f"skipped {gate['frames_skipped']}/{gate['frames_checked']} frames "
+            f"({gate['skip_ratio']:.1%}), {baseline_stats['wall_seconds']:.1f}s -> "
+            f"{gated_stats['wall_seconds']:.1f}s ({entry['wall_speedup']}x)"
+        )
+        if not entry["counts_match"]:
+            print(f"  baseline: {json.dumps(baseline)}")
+            print(f"  gated:    {json.dumps(gated)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 0 if all(entry["counts_match"] for entry in report) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+End-to-end benchmark of the processing pipeline on synthetic traffic videos.
+
+Every case (resolution x output mode) generates a deterministic video with
+its directions and ground truth (cached in --data-dir), then runs the full
+VideoProcessor pipeline on it in a fresh process. Reports decode,
+inference, counting, annotation and encoding time per frame, wall fps,
+peak RSS and the counts against the ground truth, as JSON that
+benchmarks.compare can diff against another run.
+
+With --backend scripted, detection replays the generated trajectories
+instead of running a model, so the rest of the pipeline is measured on its
+own and counts must match the ground truth exactly (--min-accuracy 1).
+Exits with status 1 if any case counts less accurately than --min-accuracy.
+
+Usage (from the backend folder):
+    python -m benchmarks.pipeline_bench --resolutions 1280x720,1920x1080 --output-modes counts_only,full --output run.json
+    python -m benchmarks.pipeline_bench --backend scripted --min-accuracy 1 --output scripted.json
+"""
+import os
+import sys
+import argparse
+import tempfile
+import multiprocessing
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict
+
+from app.config.model_config import ModelConfig
+from app.config.processing_config import ProcessingOptions
+from app.services.video_processor import STAGES
+from benchmarks.common import (
+    count_agreement, count_video, load_directions, peak_rss_mb, run_metadata, write_report,
+)
+from benchmarks.synthetic import Scenario, load_case, parse_size, write_case
+
+
+def run_case(case: Dict) -> Dict:
+    """
+    Count one generated video; runs in its own process so peak RSS and
+    model loading belong to this case only.
+    """
+    _, expected = load_case(case["paths"]["scenario"])
+    options = ProcessingOptions(**case["options"])
+    directions = load_directions(case["paths"]["directions"])
+
+    model = case["model"]
+    if options.backend == 'scripted':
+        # Replay the case's own trajectories
+        ModelConfig.SCRIPTED_DIR = Path(case["paths"]["scenario"]).parent
+        model = Path(case["paths"]["scenario"]).stem
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "annotated.mp4") if options.writes_video else None
+        results, stats = count_video(
+            case["paths"]["video"], directions, model, options, output_path=output_path,
+        )
+
+    stages = stats["stages"]
+    metrics = {
+        "wall_fps": stats["fps"],
+        **{f"{stage}_ms_per_frame": stages["ms_per_frame"][stage] for stage in STAGES},
+        "peak_rss_mb": peak_rss_mb(),
+        "count_accuracy": round(count_agreement(expected, results), 4),
+    }
+    return {
+        "name": case["name"],
+        "params": {**case["scenario"], "options": case["options"], "model": case["model"]},
+        "metrics": metrics,
+        "results": results,
+        "expected": expected,
+        **{key: stats[key] for key in ("frames", "wall_seconds", "throughput", "decoder", "output", "stages")},
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--resolutions", default="1280x720", help="Comma separated WIDTHxHEIGHT list")
+    parser.add_argument(
+        "--output-modes", default="counts_only,full",
+        help=f"Comma separated output modes ({', '.join(ProcessingOptions.OUTPUT_MODES)})",
+    )
+    parser.add_argument("--seconds", type=float, default=20.0, help="Video length")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--density", type=float, default=20.0, help="Vehicles per minute per lane")
+    parser.add_argument("--directions", type=int, choices=(2, 4), default=2)
+    parser.add_argument("--lanes", type=int, default=2, help="Lanes per direction")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default="yolo11n-best.pt", help="Model name")
+    parser.add_argument(
+        "--backend", default="torch", choices=ModelConfig.BACKENDS,
+        help="Inference backend; 'scripted' replays the generated trajectories instead of running --model",
+    )
+    parser.add_argument("--decoder", default="opencv", choices=ProcessingOptions.DECODERS)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--data-dir", default="benchmarks/data", help="Cache of generated videos")
+    parser.add_argument(
+        "--min-accuracy", type=float, default=0.0,
+        help="Lowest acceptable count accuracy (use 1 with --backend scripted)",
+    )
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.output_modes.split(",") if m.strip()]
+    for mode in modes:
+        if mode not in ProcessingOptions.OUTPUT_MODES:
+            parser.error(f"unknown output mode: {mode}")
+    try:
+        sizes = [parse_size(s) for s in args.resolutions.split(",") if s.strip()]
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    cases = []
+    for width, height in sizes:
+        scenario = Scenario(
+            width=width, height=height, fps=args.fps, seconds=args.seconds, density=args.density,
+            directions=args.directions, lanes=args.lanes, seed=args.seed,
+        )
+        print(f"Generating {scenario.name}...")
+        paths = write_case(scenario, args.data_dir)
+        scenario_params = {k: v for k, v in scenario.to_dict().items() if k != "vehicles"}
+        for mode in modes:
+            options = ProcessingOptions(
+                batch_size=args.batch_size, output_mode=mode, decoder=args.decoder, backend=args.backend,
+            )
+            options.validate()
+            cases.append({
+                "name": f"{width}x{height}/{mode}",
+                "paths": paths,
+                "scenario": scenario_params,
+                "options": asdict(options),
+                "model": args.model,
+            })
+
+    # A fresh process per case, as in the job workers
+    ctx = multiprocessing.get_context("spawn")
+    report = {
+        "benchmark": "pipeline",
+        "meta": {**run_metadata(), "model": args.model, "backend": args.backend},
+        "cases": [],
+    }
+    for case in cases:
+        with ctx.Pool(1) as pool:
+            result = pool.apply(run_case, (case,))
+        report["cases"].append(result)
+
+        m = result["metrics"]
+        stages = ", ".join(f"{stage} {m[f'{stage}_ms_per_frame']}" for stage in STAGES)
+        print(
+            f"{case['name']}: {m['wall_fps']} fps, ms/frame: {stages}; "
+            f"peak RSS {m['peak_rss_mb']} MB, count accuracy {m['count_accuracy']:.1%}"
+        )
+
+    if args.output:
+        write_report(args.output, report)
+    return 0 if all(c["metrics"]["count_accuracy"] >= args.min_accuracy for c in report["cases"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
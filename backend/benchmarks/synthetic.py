@@ -0,0 +1,358 @@
+"""
+Deterministic synthetic traffic videos with directions and ground truth.
+
+A scenario is a straight road (two directions, W - E above E - W) with an
+optional crossing road (N - S left of S - N), each direction with its own
+lanes. Vehicles are coloured boxes moving at a constant speed per lane;
+arrivals per lane follow a seeded Poisson process with a minimum headway,
+so the same parameters always give the same video, trajectories and
+expected counts.
+
+Usage (from the backend folder):
+    python -m benchmarks.synthetic --size 1280x720 --seconds 30 --density 20 --out-dir benchmarks/data
+"""
+import sys
+import json
+import argparse
+from dataclasses import asdict, dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.services.detectors import ScriptedDetector, Trajectories
+from app.services.vehicle_counter import VehicleCounter
+
+# Normalized band of the W - E / E - W road, and of the N - S / S - N road
+ROAD_Y = (0.30, 0.70)
+ROAD_X = (0.40, 0.60)
+
+# Entry and exit line positions along the direction of travel
+LINE_NEAR, LINE_FAR = 0.25, 0.75
+
+# (class_id, share of arrivals, length, width); sizes relative to frame height
+VEHICLE_CLASSES = (
+    (2, 0.70, 0.080, 0.045),  # cars
+    (3, 0.15, 0.140, 0.055),  # trucks
+    (1, 0.05, 0.160, 0.055),  # buses
+    (0, 0.10, 0.035, 0.020),  # bikes
+)
+
+# BGR fill per class
+CLASS_COLORS = {0: (40, 200, 230), 1: (40, 60, 200), 2: (200, 120, 40), 3: (60, 160, 60)}
+
+# Seconds a vehicle takes to cross the frame (uniform per lane)
+CROSSING_SECONDS = (5.0, 8.0)
+
+# Gap kept between consecutive vehicles of a lane, in vehicle lengths
+MIN_HEADWAY = 1.5
+
+# name, unit vector of travel, direction color (ARGB, as sent by the frontend)
+DIRECTIONS = (
+    ("W", "E", (1, 0), 0xFF00C853),
+    ("E", "W", (-1, 0), 0xFFD50000),
+    ("N", "S", (0, 1), 0xFF2962FF),
+    ("S", "N", (0, -1), 0xFFFFAB00),
+)
+
+
+@dataclass
+class Scenario:
+    """Parameters of a synthetic video; everything else is derived from them."""
+
+    width: int = 1280
+    height: int = 720
+    fps: float = 30.0
+    seconds: float = 30.0
+    density: float = 20.0
+    directions: int = 2
+    lanes: int = 2
+    seed: int = 0
+    vehicles: List[Dict] = field(default_factory=list, repr=False)
+
+    @property
+    def frames(self) -> int:
+        return int(round(self.seconds * self.fps))
+
+    @property
+    def name(self) -> str:
+        return (
+            f"synthetic_{self.width}x{self.height}_{self.seconds:g}s_d{self.density:g}"
+            f"_{self.directions}dir_{self.lanes}lanes_s{self.seed}"
+        )
+
+    def generate(self) -> "Scenario":
+        """Draw the vehicle arrivals of every lane."""
+        if self.directions not in (2, 4):
+            raise ValueError("directions must be 2 or 4")
+
+        rng = np.random.default_rng(self.seed)
+        shares = np.array([c[1] for c in VEHICLE_CLASSES])
+        vehicles = []
+        for d, (_, _, (ux, uy), _) in enumerate(DIRECTIONS[:self.directions]):
+            for lane in range(self.lanes):
+                vehicles += self._lane_vehicles(rng, shares, d, lane, ux, uy)
+
+        # Track ids in order of appearance, like a tracker would assign them
+        vehicles.sort(key=lambda v: (v["start"], v["direction"], v["lane"]))
+        for track_id, v in enumerate(vehicles, start=1):
+            v["track_id"] = track_id
+        self.vehicles = vehicles
+        self.__dict__.pop("detector", None)
+        return self
+
+    def _lane_vehicles(self, rng, shares, d: int, lane: int, ux: int, uy: int) -> List[Dict]:
+        w, h = self.width, self.height
+        horizontal = ux != 0
+        span = w if horizontal else h
+        speed = span / (self.fps * rng.uniform(*CROSSING_SECONDS))
+
+        # Lane center across the direction of travel: the first half of a
+        # road belongs to its first direction
+        lo, hi = ROAD_Y if horizontal else ROAD_X
+        half = (hi - lo) / 2
+        band_lo = lo + half * (d % 2)
+        across = (band_lo + half * (lane + 0.5) / self.lanes) * (h if horizontal else w)
+
+        # Arrivals from one crossing time before the first frame, so the
+        # video starts with traffic already on the road
+        crossing_frames = span / speed
+        rate = self.density / 60.0 / self.fps
+        t = -crossing_frames
+        last_start, last_length = -np.inf, 0.0
+        vehicles = []
+        while rate > 0:
+            t += rng.exponential(1 / rate)
+            cls = int(rng.choice(len(VEHICLE_CLASSES), p=shares))
+            class_id, _, length, width = VEHICLE_CLASSES[cls]
+            length *= h
+            width *= h
+            # Enough time for the previous vehicle to move out of the way
+            t = max(t, last_start + (last_length + MIN_HEADWAY * max(length, last_length)) / speed)
+            if t >= self.frames:
+                break
+            start = int(np.ceil(t))
+            last_start, last_length = start, length
+
+            box_w, box_h = (length, width) if horizontal else (width, length)
+            # Just outside the frame on the entry side at the start frame
+            along = -length / 2 if (ux > 0 or uy > 0) else span + length / 2
+            cx, cy = (along, across) if horizontal else (across, along)
+            vehicles.append({
+                "class_id": class_id,
+                "direction": d,
+                "lane": lane,
+                "start": start,
+                "end": start + int(np.ceil((span + length) / speed)) + 1,
+                "cx": round(cx, 3),
+                "cy": round(cy, 3),
+                "vx": round(speed * ux, 5),
+                "vy": round(speed * uy, 5),
+                "w": round(box_w, 3),
+                "h": round(box_h, 3),
+                "shade": int(rng.integers(-30, 31)),
+            })
+        return vehicles
+
+    @cached_property
+    def detector(self) -> ScriptedDetector:
+        """The scripted detector replaying this scenario at its own size."""
+        return ScriptedDetector(Trajectories(self.to_dict()), (self.width, self.height))
+
+    def boxes(self, frame_idx: int) -> List[Tuple[int, int, float, float, float, float]]:
+        """
+        Vehicles visible in a frame, as the scripted detector reports them.
+
+        Returns:
+            (track_id, class_id, x1, y1, x2, y2) per vehicle, boxes clipped to
+            the frame like detector output
+        """
+        tracks = self.detector.tracks_at(frame_idx, self.width, self.height)
+        return [
+            (track_id, class_id, *box)
+            for track_id, class_id, box in zip(
+                tracks.track_ids.tolist(), tracks.class_ids.tolist(), tracks.boxes.tolist()
+            )
+        ]
+
+    def directions_payload(self) -> List[Dict]:
+        """Directions as sent by the frontend: entry and exit lines across each direction's half road."""
+        payload = []
+        for d, (src, dst, (ux, uy), color) in enumerate(DIRECTIONS[:self.directions]):
+            lo, hi = ROAD_Y if ux else ROAD_X
+            half = (hi - lo) / 2
+            a, b = lo + half * (d % 2), lo + half * (d % 2 + 1)
+            lines = []
+            for is_entry in (True, False):
+                forward = ux > 0 or uy > 0
+                pos = LINE_NEAR if is_entry == forward else LINE_FAR
+                if ux:
+                    lines.append({"x1": pos, "y1": a, "x2": pos, "y2": b, "isEntry": is_entry})
+                else:
+                    lines.append({"x1": a, "y1": pos, "x2": b, "y2": pos, "isEntry": is_entry})
+            payload.append({"id": f"d{d + 1}", "from": src, "to": dst, "color": color, "lines": lines})
+        return payload
+
+    def expected_counts(self) -> Dict[str, Dict[str, int]]:
+        """
+        Counts a correct pipeline reports, in the get_results format.
+
+        A vehicle counts once its box center, first seen before the entry
+        line, has passed the exit line by the last frame.
+        """
+        results = {
+            f"{src} - {dst}": {"bikes": 0, "cars": 0, "buses": 0, "trucks": 0, "total": 0}
+            for src, dst, _, _ in DIRECTIONS[:self.directions]
+        }
+        first_seen, last_seen = {}, {}
+        for frame_idx in range(self.frames):
+            for track_id, _, x1, y1, x2, y2 in self.boxes(frame_idx):
+                center = ((x1 + x2) / 2, (y1 + y2) / 2)
+                first_seen.setdefault(track_id, center)
+                last_seen[track_id] = center
+
+        for v in self.vehicles:
+            if v["track_id"] not in first_seen:
+                continue
+            src, dst, (ux, uy), _ = DIRECTIONS[v["direction"]]
+            horizontal = ux != 0
+            span = self.width if horizontal else self.height
+            sign = ux or uy
+            entry = (LINE_NEAR if sign > 0 else LINE_FAR) * span
+            exit_ = (LINE_FAR if sign > 0 else LINE_NEAR) * span
+            first = first_seen[v["track_id"]][0 if horizontal else 1]
+            last = last_seen[v["track_id"]][0 if horizontal else 1]
+            if sign * (entry - first) > 1 and sign * (last - exit_) > 0:
+                category = VehicleCounter.CLASS_MAPPING[v["class_id"]]
+                results[f"{src} - {dst}"][category] += 1
+                results[f"{src} - {dst}"]["total"] += 1
+        return results
+
+    def render(self, path: str) -> None:
+        """Write the video (mp4v), one box per visible vehicle on a static road."""
+        background = self._background()
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (self.width, self.height))
+        if not writer.isOpened():
+            raise RuntimeError(f"Cannot write video: {path}")
+        shades = {v["track_id"]: v["shade"] for v in self.vehicles}
+        try:
+            for frame_idx in range(self.frames):
+                frame = background.copy()
+                for track_id, class_id, x1, y1, x2, y2 in self.boxes(frame_idx):
+                    color = tuple(int(np.clip(c + shades[track_id], 0, 255)) for c in CLASS_COLORS[class_id])
+                    p1, p2 = (int(x1), int(y1)), (int(x2) - 1, int(y2) - 1)
+                    cv2.rectangle(frame, p1, p2, color, -1)
+                    cv2.rectangle(frame, p1, p2, (20, 20, 20), max(1, self.height // 360))
+                writer.write(frame)
+        finally:
+            writer.release()
+
+    def _background(self) -> np.ndarray:
+        """Grass with seeded texture, asphalt roads and dashed lane markings."""
+        w, h = self.width, self.height
+        rng = np.random.default_rng(self.seed + 1)
+        frame = np.empty((h, w, 3), dtype=np.uint8)
+        frame[:] = (70, 110, 80)
+        noise = rng.integers(-12, 13, size=(h, w, 1), dtype=np.int16)
+        frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+        roads = [(0, int(ROAD_Y[0] * h), w, int(ROAD_Y[1] * h))]
+        if self.directions == 4:
+            roads.append((int(ROAD_X[0] * w), 0, int(ROAD_X[1] * w), h))
+        for x1, y1, x2, y2 in roads:
+            frame[y1:y2, x1:x2] = (90, 90, 90)
+
+        dash = max(4, h // 40)
+        mark = max(1, h // 360)
+        y_mid = int(sum(ROAD_Y) / 2 * h)
+        for x in range(0, w, 2 * dash):
+            cv2.line(frame, (x, y_mid), (x + dash, y_mid), (230, 230, 230), mark)
+        if self.directions == 4:
+            x_mid = int(sum(ROAD_X) / 2 * w)
+            for y in range(0, h, 2 * dash):
+                cv2.line(frame, (x_mid, y), (x_mid, y + dash), (230, 230, 230), mark)
+        return frame
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Scenario":
+        return cls(**data)
+
+
+def write_case(scenario: Scenario, out_dir: str) -> Dict[str, str]:
+    """
+    Generate a scenario's video, directions and ground truth, unless a
+    previous run already did.
+
+    Returns:
+        Paths of the video, directions.json and scenario.json (trajectories
+        and expected counts)
+    """
+    folder = Path(out_dir) / scenario.name
+    paths = {
+        "video": str(folder / "video.mp4"),
+        "directions": str(folder / "directions.json"),
+        "scenario": str(folder / "scenario.json"),
+    }
+    if all(Path(p).exists() for p in paths.values()):
+        return paths
+
+    folder.mkdir(parents=True, exist_ok=True)
+    if not scenario.vehicles:
+        scenario.generate()
+    # Video last: its presence marks a complete case
+    with open(paths["directions"], "w") as f:
+        json.dump(scenario.directions_payload(), f, indent=2)
+    with open(paths["scenario"], "w") as f:
+        json.dump({**scenario.to_dict(), "expected": scenario.expected_counts()}, f)
+    tmp = folder / "video.partial.mp4"
+    scenario.render(str(tmp))
+    tmp.replace(paths["video"])
+    return paths
+
+
+def load_case(scenario_path: str) -> Tuple[Scenario, Dict]:
+    """Read a scenario.json written by write_case; returns (scenario, expected counts)."""
+    with open(scenario_path) as f:
+        data = json.load(f)
+    expected = data.pop("expected")
+    return Scenario.from_dict(data), expected
+
+
+def parse_size(value: str) -> Tuple[int, int]:
+    """'1280x720' -> (1280, 720)"""
+    try:
+        w, h = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}")
+    return w, h
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=parse_size, default=(1280, 720), help="WIDTHxHEIGHT")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--density", type=float, default=20.0, help="Vehicles per minute per lane")
+    parser.add_argument("--directions", type=int, choices=(2, 4), default=2)
+    parser.add_argument("--lanes", type=int, default=2, help="Lanes per direction")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="benchmarks/data")
+    args = parser.parse_args(argv)
+
+    scenario = Scenario(
+        width=args.size[0], height=args.size[1], fps=args.fps, seconds=args.seconds,
+        density=args.density, directions=args.directions, lanes=args.lanes, seed=args.seed,
+    )
+    paths = write_case(scenario, args.out_dir)
+    _, expected = load_case(paths["scenario"])
+    print(json.dumps({**paths, "expected": expected}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Tests import the backend as the app does when run from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the job store of test runs out of the working directory
+os.environ.setdefault("VCOUNT_JOBS_DB", os.path.join(tempfile.mkdtemp(prefix="vcount-tests-"), "jobs.db"))
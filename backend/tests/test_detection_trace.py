@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from app.config.model_config import ModelConfig
+from app.config.processing_config import ProcessingOptions
+from app.services.count_job import create_components
+from app.services.decoders import create_decoder
+from app.services.detection_trace import DetectionTrace, DetectionTraceWriter
+from app.services.vehicle_counter import VehicleCounter
+from app.services.video_processor import VideoProcessor
+from app.utils import job_store
+from benchmarks.synthetic import Scenario, write_case
+
+
+@pytest.fixture(scope="module")
+def case(tmp_path_factory):
+    scenario = Scenario(width=640, height=360, seconds=6, density=30, directions=4, seed=3)
+    return write_case(scenario, str(tmp_path_factory.mktemp("synthetic")))
+
+
+def scripted_run(case, tmp_path, monkeypatch):
+    """Count the case's video with its own trajectories, recording a trace."""
+    job_store.init_db()
+    scenario_path = Path(case["scenario"])
+    monkeypatch.setattr(ModelConfig, "SCRIPTED_DIR", scenario_path.parent)
+
+    cap = cv2.VideoCapture(case["video"])
+    w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    cap.release()
+
+    with open(case["directions"]) as f:
+        directions = json.load(f)
+    options = ProcessingOptions(backend='scripted', output_mode='counts_only')
+    params = {"model_name": scenario_path.stem, "directions": directions}
+    tracker, counter, _, _, _ = create_components(params, options, w, h)
+    trace = DetectionTraceWriter(tmp_path / "trace.bin", w, h, fps)
+    processor = VideoProcessor(
+        tracker=tracker,
+        counter=counter,
+        directions_data=directions,
+        writer=None,
+        video_path=case["video"],
+        processing_id="trace-test",
+        options=options,
+        fps=fps,
+        trace=trace,
+        decoder=create_decoder(case["video"], options.decoder, (w, h), None),
+    )
+    processor.process_frames()
+    return directions, counter, trace.close(), tracker.tracker_params['max_age']
+
+
+def test_recount_with_same_lines_matches_run(case, tmp_path, monkeypatch):
+    directions, counter, trace_path, max_age = scripted_run(case, tmp_path, monkeypatch)
+    results = counter.get_results()
+    assert sum(c["total"] for c in results.values()) > 0
+
+    trace = DetectionTrace(trace_path)
+    recounter = VehicleCounter(
+        directions=directions, frame_w=trace.frame_w, frame_h=trace.frame_h, max_age=max_age,
+    )
+    trace.replay(recounter)
+
+    assert recounter.get_results() == results
+
+
+def test_recount_keeps_centers_exact(tmp_path):
+    # A vehicle that stops exactly on the exit line is counted; a center
+    # rounded on its way through the trace would miss the line
+    w, h = 1000, 500
+    directions = [{"id": "d1", "from": "W", "to": "E", "color": 0, "lines": [
+        {"x1": 0.05, "y1": 0.0, "x2": 0.05, "y2": 1.0, "isEntry": True},
+        {"x1": 0.1001, "y1": 0.0, "x2": 0.1001, "y2": 1.0, "isEntry": False},
+    ]}]
+    exit_x = 0.1001 * w
+    assert float(np.float32(exit_x)) != exit_x
+
+    counter = VehicleCounter(directions=directions, frame_w=w, frame_h=h)
+    writer = DetectionTraceWriter(tmp_path / "trace.bin", w, h, 30.0)
+    for frame_idx, cx in enumerate([20.0, 80.0, 90.0, exit_x]):
+        detections = [{
+            "track_id": 1, "class_id": 2, "bbox": [int(cx) - 5, 195, int(cx) + 5, 205],
+            "cx": cx, "cy": 200.0, "confidence": 0.9,
+        }]
+        counter.update(detections, frame_idx)
+        writer.add(frame_idx, detections)
+    assert counter.get_results()["W - E"]["total"] == 1
+
+    recounter = VehicleCounter(directions=directions, frame_w=w, frame_h=h)
+    DetectionTrace(writer.close()).replay(recounter)
+    assert recounter.get_results() == counter.get_results()
@@ -0,0 +1,77 @@
+import numpy as np
+
+from app.services.detection_trace import DetectionTrace, DetectionTraceWriter
+from app.services.segmented_job import OVERLAP_SECONDS, plan_segments, stitch_segments
+
+W, H = 640, 360
+
+
+def box_at(frame_idx, y):
+    x = 5 * frame_idx
+    return [x, y, x + 40, y + 30]
+
+
+def write_segment(path, frames, vehicles):
+    """
+    Trace of one segment; vehicles maps the segment's track id to
+    (first frame, last frame, lane y).
+    """
+    writer = DetectionTraceWriter(path, W, H, 30.0)
+    for f in frames:
+        detections = []
+        for track_id, (first, last, y) in vehicles.items():
+            if first <= f <= last:
+                x1, y1, x2, y2 = box_at(f, y)
+                detections.append({
+                    "track_id": track_id, "class_id": 2, "bbox": [x1, y1, x2, y2],
+                    "cx": (x1 + x2) / 2, "cy": (y1 + y2) / 2, "confidence": 0.9,
+                })
+        writer.add(f, detections)
+    return writer.close()
+
+
+def test_plan_segments_cover_the_video_once():
+    fps = 30.0
+    plan = plan_segments(3000, 4, fps)
+    overlap = round(OVERLAP_SECONDS * fps)
+
+    assert len(plan) == 4
+    assert plan[0][:2] == (0, 0)
+    assert plan[-1][2] is None
+    for (_, _, end), (start, core_start, _) in zip(plan, plan[1:]):
+        assert core_start == end
+        assert start == core_start - overlap
+
+
+def test_plan_segments_keep_short_videos_whole():
+    assert plan_segments(100, 4, 30.0) == [(0, 0, None)]
+    assert plan_segments(0, 4, 30.0) == [(0, 0, None)]
+
+
+def test_stitch_continues_tracks_across_the_boundary(tmp_path):
+    # Segment 2 tracks frames 40-49 as warm-up; its track 3 is the vehicle
+    # segment 1 calls 7, track 4 only appears after the boundary
+    plan = [(0, 0, 50), (40, 50, None)]
+    first = write_segment(tmp_path / "s1.trace", range(0, 50), {7: (0, 49, 50), 8: (0, 20, 200)})
+    second = write_segment(tmp_path / "s2.trace", range(40, 100), {3: (40, 99, 50), 4: (60, 99, 200)})
+
+    writer = DetectionTraceWriter(tmp_path / "stitched.trace", W, H, 30.0)
+    stitched = stitch_segments([first, second], plan, writer)
+    trace = DetectionTrace(writer.close())
+    columns = {name: np.asarray(values) for name, values in trace.columns.items()}
+
+    assert stitched == 1
+    # Every frame once, warm-up frames dropped
+    assert columns["frames"].tolist() == list(range(100))
+    assert np.all(np.diff(columns["frame_idx"]) >= 0)
+
+    track_id, frame_idx = columns["track_id"], columns["frame_idx"]
+    upper = set(track_id[columns["cy"] < 100].tolist())
+    lower_before = set(track_id[(columns["cy"] > 100) & (frame_idx < 50)].tolist())
+    lower_after = set(track_id[(columns["cy"] > 100) & (frame_idx >= 50)].tolist())
+    # The vehicle crossing the boundary keeps one id
+    assert len(upper) == 1
+    # The vehicle that left early and the one that arrived later stay apart
+    assert len(lower_before) == len(lower_after) == 1
+    assert lower_before != lower_after
+    assert len(upper | lower_before | lower_after) == 3
@@ -0,0 +1,209 @@
+import numpy as np
+import pytest
+
+from app.services.crossing_engine import CrossingEngine
+from app.services.track_state import TrackStateStore
+from app.services.vehicle_counter import VehicleCounter
+
+W, H = 640, 640
+
+# Horizontal line from (0, 0) to (100, 0), in pixels
+LINE = {'x1': 0.0, 'y1': 0.0, 'x2': 100.0, 'y2': 0.0}
+
+
+def random_directions(rng, n):
+    # Endpoints on multiples of 1/64 of the frame are exact pixel values, so
+    # integer points land exactly on lines and hit the collinear cases
+    directions = []
+    for d in range(n):
+        lines = []
+        for is_entry in (True, False):
+            x1, y1, x2, y2 = (rng.integers(0, 65, 4) / 64).tolist()
+            lines.append({'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'isEntry': is_entry})
+        directions.append({'id': f'd{d}', 'from': f'A{d}', 'to': f'B{d}', 'color': 0, 'lines': lines})
+    return directions
+
+
+def random_frames(rng, tracks, frames):
+    """Detections per frame of tracks walking across the frame on the integer grid."""
+    per_frame = [[] for _ in range(frames)]
+    for track_id in range(1, tracks + 1):
+        start = int(rng.integers(0, frames - 10))
+        length = int(rng.integers(5, 60))
+        x, y = rng.integers(0, W, 2).tolist()
+        vx, vy = rng.integers(-25, 26, 2).tolist()
+        class_id = int(rng.integers(0, 4))
+        for f in range(start, min(frames, start + length)):
+            # Occasional missed detections
+            if rng.random() < 0.1:
+                continue
+            x += vx + int(rng.integers(-3, 4))
+            y += vy + int(rng.integers(-3, 4))
+            per_frame[f].append({'track_id': track_id, 'cx': float(x), 'cy': float(y), 'class_id': class_id})
+    return per_frame
+
+
+def reference_counts(counter, frames):
+    """The per-vehicle dictionary algorithm the counter started out as."""
+    state = {d['id']: {} for d in counter.directions}
+    counts = {d['id']: {'bikes': 0, 'cars': 0, 'buses': 0, 'trucks': 0} for d in counter.directions}
+    prev_positions = {}
+    side, intersect = counter._get_side_of_line, counter._segments_intersect
+
+    for detections in frames:
+        for det in detections:
+            point = (det['cx'], det['cy'])
+            prev = prev_positions.get(det['track_id'])
+            for d in counter.directions:
+                current = state[d['id']].get(det['track_id'])
+                if current is None:
+                    s = side(*point, d['entry_line'])
+                    if s is not None:
+                        state[d['id']][det['track_id']] = {'phase': 'entry', 'side': s}
+                elif current == 'done':
+                    continue
+                else:
+                    line = d['entry_line'] if current['phase'] == 'entry' else d['exit_line']
+                    s = side(*point, line)
+                    crossed = prev is not None and intersect(prev, point, line)
+                    if crossed or (current['side'] is not None and s is not None and current['side'] != s):
+                        if current['phase'] == 'entry':
+                            state[d['id']][det['track_id']] = {'phase': 'exit', 'side': None}
+                        else:
+                            state[d['id']][det['track_id']] = 'done'
+                            counts[d['id']][VehicleCounter.CLASS_MAPPING[det['class_id']]] += 1
+                    elif s is not None:
+                        current['side'] = s
+        for det in detections:
+            prev_positions[det['track_id']] = (det['cx'], det['cy'])
+    return counts
+
+
+def run(directions, frames, scalar_max_pairs):
+    counter = VehicleCounter(directions, W, H, max_age=10 ** 6)
+    counter.SCALAR_MAX_PAIRS = scalar_max_pairs
+    for frame_idx, detections in enumerate(frames):
+        counter.update(detections, frame_idx)
+    return counter
+
+
+def track_state(counter):
+    st = counter.state
+    return {
+        track_id: (st.phase[row].tolist(), st.entry_side[row].tolist(), st.exit_side[row].tolist())
+        for track_id, row in st._rows.items()
+    }
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_vectorized_and_scalar_paths_count_alike(seed):
+    rng = np.random.default_rng(seed)
+    directions = random_directions(rng, int(rng.integers(1, 5)))
+    frames = random_frames(rng, tracks=40, frames=150)
+
+    vectorized = run(directions, frames, scalar_max_pairs=0)
+    scalar = run(directions, frames, scalar_max_pairs=10 ** 9)
+    mixed = run(directions, frames, scalar_max_pairs=VehicleCounter.SCALAR_MAX_PAIRS)
+
+    assert vectorized.counts == scalar.counts == mixed.counts
+    assert vectorized.counts == reference_counts(vectorized, frames)
+    assert track_state(vectorized) == track_state(scalar) == track_state(mixed)
+    assert sum(sum(c.values()) for c in vectorized.counts.values()) > 0
+
+
+@pytest.mark.parametrize("cy, expected", [
+    (0.0, None),
+    (0.049, None),  # cross = 4.9, within the threshold
+    (-0.049, None),
+    (0.05, 1),      # cross = 5, the threshold itself is a side
+    (-0.05, -1),
+    (30.0, 1),
+])
+def test_side_of_line_threshold(cy, expected):
+    counter = VehicleCounter([], W, H)
+    assert counter._get_side_of_line(50.0, cy, LINE) == expected
+
+    engine = CrossingEngine([{'entry_line': LINE, 'exit_line': LINE}])
+    entry, exit_ = engine.sides(np.array([50.0]), np.array([cy]))
+    assert entry[0, 0] == exit_[0, 0] == (expected or 0)
+
+
+@pytest.mark.parametrize("p1, p2, expected", [
+    ((50, -10), (50, 10), True),     # proper crossing
+    ((50, -10), (50, 0), True),      # ends on the line
+    ((50, 0), (50, 10), True),       # starts on the line
+    ((100, -10), (100, 10), True),   # through an endpoint of the line
+    ((0, 0), (-10, 0), True),        # collinear, touching an endpoint
+    ((20, 0), (80, 0), True),        # collinear, inside the line
+    ((-50, 0), (150, 0), True),      # collinear, covering the line
+    ((110, 0), (150, 0), False),     # collinear, beyond the line
+    ((101, -10), (101, 10), False),  # just past the end of the line
+    ((20, 5), (80, 5), False),       # parallel
+    ((50, -10), (50, -1), False),    # stops short
+    ((50, 5), (50, 5), False),       # not moving, off the line
+    ((50, 0), (50, 0), True),        # not moving, on the line
+])
+def test_segments_intersect_edge_cases(p1, p2, expected):
+    counter = VehicleCounter([], W, H)
+    p1, p2 = tuple(map(float, p1)), tuple(map(float, p2))
+    assert counter._segments_intersect(p1, p2, LINE) is expected
+
+    engine = CrossingEngine([{'entry_line': LINE, 'exit_line': LINE}])
+    entry, exit_ = engine.intersections(
+        np.array([p1[0]]), np.array([p1[1]]), np.array([p2[0]]), np.array([p2[1]]), np.array([True]),
+    )
+    assert entry[0, 0] == exit_[0, 0] == expected
+
+
+def test_intersections_need_a_previous_position():
+    engine = CrossingEngine([{'entry_line': LINE, 'exit_line': LINE}])
+    entry, _ = engine.intersections(
+        np.array([50.0]), np.array([-10.0]), np.array([50.0]), np.array([10.0]), np.array([False]),
+    )
+    assert not entry[0, 0]
+
+
+def test_stale_tracks_are_evicted_and_rows_reused():
+    store = TrackStateStore(num_directions=2, max_age=10, initial_capacity=2)
+    rows = store.rows_for([1, 2], frame_idx=0).tolist()
+    store.phase[rows] = TrackStateStore.PHASE_EXIT
+
+    # Track 2 stays, track 1 goes unseen for longer than max_age
+    for f in range(1, TrackStateStore.EVICT_INTERVAL + 1):
+        store.rows_for([2], f)
+        store.evict_stale(f)
+    assert len(store) == 1
+    assert store.track_ids[rows[0]] == -1
+
+    # A new track gets the released row, with its state cleared
+    (row,) = store.rows_for([3], TrackStateStore.EVICT_INTERVAL + 1).tolist()
+    assert row == rows[0]
+    assert store.capacity == 2
+    assert store.phase[row].tolist() == [TrackStateStore.PHASE_NONE] * 2
+    assert not store.has_prev[row]
+
+
+def test_eviction_runs_once_per_interval():
+    store = TrackStateStore(num_directions=1, max_age=0)
+    store.rows_for([1], frame_idx=0)
+    assert store.evict_stale(TrackStateStore.EVICT_INTERVAL - 1) == 0
+    assert store.evict_stale(TrackStateStore.EVICT_INTERVAL) == 1
+    assert store.evict_stale(TrackStateStore.EVICT_INTERVAL + 1) == 0
+
+
+def test_counter_forgets_tracks_after_max_age():
+    directions = [{'id': 'd1', 'from': 'W', 'to': 'E', 'color': 0, 'lines': [
+        {'x1': 0.25, 'y1': 0.0, 'x2': 0.25, 'y2': 1.0, 'isEntry': True},
+        {'x1': 0.75, 'y1': 0.0, 'x2': 0.75, 'y2': 1.0, 'isEntry': False},
+    ]}]
+    counter = VehicleCounter(directions, W, H, max_age=5)
+    counter.update([{'track_id': 1, 'cx': 10.0, 'cy': 100.0, 'class_id': 2}], 0)
+    counter.update([{'track_id': 1, 'cx': 300.0, 'cy': 100.0, 'class_id': 2}], 1)
+    assert len(counter.state) == 1
+
+    counter.update([], TrackStateStore.EVICT_INTERVAL)
+    assert len(counter.state) == 0
+
+    # Back after eviction, the track starts over and is not counted on the exit line alone
+    counter.update([{'track_id': 1, 'cx': 600.0, 'cy': 100.0, 'class_id': 2}], TrackStateStore.EVICT_INTERVAL + 1)
+    assert counter.get_results()['W - E']['total'] == 0
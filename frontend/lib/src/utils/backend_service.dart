@@ -10,6 +10,7 @@ class BackendService {
   static http.Client? _httpClient;
   static CancelToken _cancelToken = CancelToken();
   static String? _currentProcessingId;
+  static final Map<String, String> _uploadedVideoIds = {};
 
   static void cancelProcessing() {
     debugPrint('Cancelling processing request...');
@@ -75,6 +76,9 @@ class BackendService {
     if (response.statusCode == 200) {
       final body = await response.stream.bytesToString();
       final json = jsonDecode(body);
+      if (json['video_id'] is String) {
+        _uploadedVideoIds[videoPath] = json['video_id'];
+      }
       final thumbnailUrl = '$backendUrl${json['thumbnail_url']}';
       return thumbnailUrl;
     } else {
@@ -128,9 +132,14 @@ class BackendService {
         Uri.parse('$backendUrl/count_vehicles'),
       );
 
-      request.files.add(
-        await http.MultipartFile.fromPath('video', videoPath),
-      );
+      final videoId = _uploadedVideoIds[videoPath];
+      if (videoId != null) {
+        request.fields['video_id'] = videoId;
+      } else {
+        request.files.add(
+          await http.MultipartFile.fromPath('video', videoPath),
+        );
+      }
 
       request.fields['directions'] = directionsJson;
       request.fields['model_name'] = modelName;